@@ -1,610 +1,47 @@
-# This file was auto-generated by audio_sync_generator.py. DO NOT EDIT MANUALLY.
-# It defines bird personalities, colors, and audio-synced light patterns.
+# Runtime loader for the bird parameters generated by scripts/audio_sync_generator.py.
+# - bird_params.json   : personalities, colors and sound files (edit config_structure.py, then regenerate)
+# - chirp_patterns.npz : audio-synced light patterns as float32 (N, 2) arrays of [time, brightness],
+#                        plus dense uint8 per-frame envelope / spectral-centroid tracks at ENVELOPE_FPS
 # Hardware settings and simulation cast are in 'settings.yaml'.
+import os
+import json
 import numpy as np
 
-BIRD_PARAMS = {
-        'ooluri': {
-            'name_jp': 'オオルリ',
-            'base_color': [
-                48,
-                46,
-                90
-            ],
-            'accent_color': [
-                0,
-                5,
-                196
-            ],
-            'base_pixel_count': 4,
-            'size': 1.0,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 1],
-                ['a', 2],
-                ['b', 1]
-            ],
-            'chirp_color_pattern': [
-                ['b', 1],
-                ['a', 3],
-                ['b', 1]
-            ],
-            'movement_speed': 0.2,
-            'approach_speed': 0.1,
-            'curiosity': 0.5,
-            'caution_distance': 1.5,
-            'flee_distance': 1.0,
-            'sound_files': {
-                'default': 'assets/sounds/oruri.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.16253968253968254), 1.2),
-                    (np.float64(0.23753968253968255), 0.0),
-                    (np.float64(0.301859410430839), 1.2),
-                    (np.float64(0.37685941043083904), 0.0),
-                    (np.float64(0.4876190476190476), 1.2),
-                    (np.float64(0.5626190476190476), 0.0),
-                    (np.float64(0.6501587301587302), 1.2),
-                    (np.float64(0.7251587301587301), 0.0),
-                    (np.float64(0.7894784580498866), 1.2),
-                    (np.float64(0.8644784580498865), 0.0),
-                    (np.float64(0.9984580498866213), 1.2),
-                    (np.float64(1.0734580498866213), 0.0),
-                    (np.float64(1.230657596371882), 1.2),
-                    (np.float64(1.305657596371882), 0.0),
-                    (np.float64(1.4628571428571429), 1.2),
-                    (np.float64(1.5378571428571428), 0.0),
-                    (np.float64(1.7647165532879818), 1.2),
-                    (np.float64(1.8397165532879818), 0.0),
-                    (np.float64(2.066575963718821), 1.2),
-                    (np.float64(2.141575963718821), 0.0),
-                    (np.float64(2.2755555555555556), 1.2),
-                    (np.float64(2.3505555555555557), 0.0),
-                    (np.float64(2.6006349206349206), 1.2),
-                    (np.float64(2.675634920634921), 0.0),
-                    (np.float64(2.8328344671201813), 1.2),
-                    (np.float64(2.9078344671201815), 0.0),
-                    (np.float64(3.1346938775510202), 1.2),
-                    (np.float64(3.2096938775510204), 0.0),
-                    (np.float64(3.320453514739229), 1.2),
-                    (np.float64(3.3954535147392293), 0.0),
-                    (np.float64(3.622312925170068), 1.2),
-                    (np.float64(3.6973129251700683), 0.0),
-                    (3.966666666666667, 0.0)
-                ]
-            }
-        },
-        'oohakucho': {
-            'name_jp': 'オオハクチョウ',
-            'base_color': [
-                255,
-                229,
-                53
-            ],
-            'accent_color': [
-                255,
-                200,
-                0
-            ],
-            'base_pixel_count': 6,
-            'size': 4.0,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 2],
-                ['a', 2],
-                ['b', 2]
-            ],
-            'chirp_color_pattern': [
-                ['a', 2],
-                ['b', 4],
-                ['a', 2]
-            ],
-            'movement_speed': 0.08,
-            'approach_speed': 0.02,
-            'curiosity': 0.1,
-            'caution_distance': 2.2,
-            'flee_distance': 1.8,
-            'sound_files': {
-                'default': 'assets/sounds/ohakucho.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.23219954648526078), 1.2),
-                    (np.float64(0.30719954648526077), 0.0),
-                    (np.float64(0.4876190476190476), 1.2),
-                    (np.float64(0.5626190476190476), 0.0),
-                    (np.float64(0.8591383219954648), 1.2),
-                    (np.float64(0.9341383219954648), 0.0),
-                    (np.float64(1.207437641723356), 1.2),
-                    (np.float64(1.282437641723356), 0.0),
-                    (np.float64(1.4628571428571429), 1.2),
-                    (np.float64(1.5378571428571428), 0.0),
-                    (np.float64(1.9272562358276644), 1.2),
-                    (np.float64(2.0022562358276645), 0.0),
-                    (np.float64(2.345215419501134), 1.2),
-                    (np.float64(2.420215419501134), 0.0),
-                    (np.float64(2.8792743764172335), 1.2),
-                    (np.float64(2.9542743764172337), 0.0),
-                    (np.float64(3.1346938775510202), 1.2),
-                    (np.float64(3.2096938775510204), 0.0),
-                    (np.float64(3.4829931972789114), 1.2),
-                    (np.float64(3.5579931972789116), 0.0),
-                    (np.float64(3.6687528344671203), 1.2),
-                    (np.float64(3.7437528344671205), 0.0),
-                    (np.float64(3.877732426303855), 1.2),
-                    (np.float64(3.952732426303855), 0.0),
-                    (np.float64(4.2260317460317465), 1.2),
-                    (np.float64(4.301031746031747), 0.0),
-                    (np.float64(4.527891156462585), 1.2),
-                    (np.float64(4.602891156462586), 0.0),
-                    (4.862675736961451, 0.0)
-                ]
-            }
-        },
-        'ojirowasi': {
-            'name_jp': 'オジロワシ',
-            'base_color': [
-                16,
-                156,
-                145
-            ],
-            'accent_color': [
-                221,
-                134,
-                7
-            ],
-            'base_pixel_count': 6,
-            'size': 5.0,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 2],
-                ['a', 2],
-                ['b', 2]
-            ],
-            'chirp_color_pattern': [
-                ['a', 2],
-                ['b', 4],
-                ['a', 2]
-            ],
-            'movement_speed': 0.05,
-            'approach_speed': 0.0,
-            'curiosity': 0.0,
-            'caution_distance': 3.0,
-            'flee_distance': 1.2,
-            'sound_files': {
-                'default': 'assets/sounds/ojirowasi.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.09287981859410431), 1.2),
-                    (np.float64(0.1678798185941043), 0.0),
-                    (np.float64(0.3250793650793651), 1.2),
-                    (np.float64(0.4000793650793651), 0.0),
-                    (np.float64(0.4876190476190476), 1.2),
-                    (np.float64(0.5626190476190476), 0.0),
-                    (np.float64(0.626938775510204), 1.2),
-                    (np.float64(0.701938775510204), 0.0),
-                    (np.float64(0.8359183673469388), 1.2),
-                    (np.float64(0.9109183673469388), 0.0),
-                    (np.float64(1.0913378684807256), 1.2),
-                    (np.float64(1.1663378684807255), 0.0),
-                    (np.float64(1.3235374149659864), 1.2),
-                    (np.float64(1.3985374149659864), 0.0),
-                    (np.float64(1.6021768707482993), 1.2),
-                    (np.float64(1.6771768707482992), 0.0),
-                    (np.float64(1.787936507936508), 1.2),
-                    (np.float64(1.862936507936508), 0.0),
-                    (np.float64(2.066575963718821), 1.2),
-                    (np.float64(2.141575963718821), 0.0),
-                    (np.float64(2.2987755102040817), 1.2),
-                    (np.float64(2.373775510204082), 0.0),
-                    (np.float64(2.5309750566893423), 1.2),
-                    (np.float64(2.6059750566893425), 0.0),
-                    (np.float64(2.786394557823129), 1.2),
-                    (np.float64(2.8613945578231292), 0.0),
-                    (np.float64(2.948934240362812), 1.2),
-                    (np.float64(3.023934240362812), 0.0),
-                    (np.float64(3.297233560090703), 1.2),
-                    (np.float64(3.372233560090703), 0.0),
-                    (np.float64(3.5294331065759637), 1.2),
-                    (np.float64(3.604433106575964), 0.0),
-                    (np.float64(3.8312925170068026), 1.2),
-                    (np.float64(3.906292517006803), 0.0),
-                    (np.float64(3.9938321995464854), 1.2),
-                    (np.float64(4.068832199546486), 0.0),
-                    (np.float64(4.365351473922902), 1.2),
-                    (np.float64(4.440351473922902), 0.0),
-                    (np.float64(4.574331065759637), 1.2),
-                    (np.float64(4.649331065759637), 0.0),
-                    (np.float64(4.73687074829932), 1.2),
-                    (np.float64(4.81187074829932), 0.0),
-                    (np.float64(4.899410430839002), 1.2),
-                    (np.float64(4.9744104308390025), 0.0),
-                    (5.161360544217687, 0.0)
-                ]
-            }
-        },
-        'shimafukuro': {
-            'name_jp': 'シマフクロウ',
-            'base_color': [
-                4,
-                4,
-                15
-            ],
-            'accent_color': [
-                57,
-                255,
-                62
-            ],
-            'base_pixel_count': 5,
-            'size': 4.5,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 2],
-                ['a', 2],
-                ['b', 2]
-            ],
-            'chirp_color_pattern': [
-                ['a', 3],
-                ['b', 3],
-                ['a', 3]
-            ],
-            'movement_speed': 0.1,
-            'approach_speed': 0.0,
-            'curiosity': 0.01,
-            'caution_distance': 3.5,
-            'flee_distance': 2.8,
-            'sound_files': {
-                'default': 'assets/sounds/simafukuro.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.06965986394557823), 1.2),
-                    (np.float64(0.14465986394557823), 0.0),
-                    (np.float64(0.23219954648526078), 1.2),
-                    (np.float64(0.30719954648526077), 0.0),
-                    (np.float64(0.8359183673469388), 1.2),
-                    (np.float64(0.9109183673469388), 0.0),
-                    (np.float64(1.3931972789115645), 1.2),
-                    (np.float64(1.4681972789115645), 0.0),
-                    (np.float64(2.716734693877551), 1.2),
-                    (np.float64(2.7917346938775514), 0.0),
-                    (np.float64(3.924172335600907), 1.2),
-                    (np.float64(3.9991723356009072), 0.0),
-                    (np.float64(4.504671201814059), 1.2),
-                    (np.float64(4.579671201814059), 0.0),
-                    (5.57687074829932, 0.0)
-                ]
-            }
-        },
-        'kumagera': {
-            'name_jp': 'クマゲラ',
-            'base_color': [
-                3,
-                8,
-                2
-            ],
-            'accent_color': [
-                157,
-                1,
-                0
-            ],
-            'base_pixel_count': 3,
-            'size': 1.5,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['a', 1],
-                ['b', 2],
-                ['a', 1]
-            ],
-            'chirp_color_pattern': [
-                ['a', 1],
-                ['b', 3],
-                ['a', 1]
-            ],
-            'movement_speed': 0.3,
-            'approach_speed': 0.1,
-            'curiosity': 0.2,
-            'caution_distance': 1.8,
-            'flee_distance': 1.2,
-            'sound_files': {
-                'call': 'assets/sounds/kumagera.mp3',
-                'drumming': 'assets/sounds/kumagera_drum.mp3'
-            },
-            'chirp_pattern': {
-                'call': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.09287981859410431), 1.2),
-                    (np.float64(0.1678798185941043), 0.0),
-                    (np.float64(0.3947392290249433), 1.2),
-                    (np.float64(0.4697392290249433), 0.0),
-                    (np.float64(0.5340589569160997), 1.2),
-                    (np.float64(0.6090589569160997), 0.0),
-                    (np.float64(0.7662585034013606), 1.2),
-                    (np.float64(0.8412585034013605), 0.0),
-                    (np.float64(0.905578231292517), 1.2),
-                    (np.float64(0.980578231292517), 0.0),
-                    (np.float64(1.1609977324263039), 1.2),
-                    (np.float64(1.2359977324263038), 0.0),
-                    (np.float64(1.3467573696145125), 1.2),
-                    (np.float64(1.4217573696145125), 0.0),
-                    (np.float64(1.486077097505669), 1.2),
-                    (np.float64(1.561077097505669), 0.0),
-                    (np.float64(1.787936507936508), 1.2),
-                    (np.float64(1.862936507936508), 0.0),
-                    (np.float64(1.9736961451247166), 1.2),
-                    (np.float64(2.0486961451247168), 0.0),
-                    (np.float64(2.2291156462585033), 1.2),
-                    (np.float64(2.3041156462585035), 0.0),
-                    (np.float64(2.4380952380952383), 1.2),
-                    (np.float64(2.5130952380952385), 0.0),
-                    (np.float64(2.6006349206349206), 1.2),
-                    (np.float64(2.675634920634921), 0.0),
-                    (np.float64(2.8328344671201813), 1.2),
-                    (np.float64(2.9078344671201815), 0.0),
-                    (np.float64(2.972154195011338), 1.2),
-                    (np.float64(3.047154195011338), 0.0),
-                    (np.float64(3.1811337868480725), 1.2),
-                    (np.float64(3.2561337868480726), 0.0),
-                    (np.float64(3.320453514739229), 1.2),
-                    (np.float64(3.3954535147392293), 0.0),
-                    (np.float64(3.599092970521542), 1.2),
-                    (np.float64(3.674092970521542), 0.0),
-                    (np.float64(3.7616326530612243), 1.2),
-                    (np.float64(3.8366326530612245), 0.0),
-                    (np.float64(3.9706122448979593), 1.2),
-                    (np.float64(4.045612244897959), 0.0),
-                    (np.float64(4.1099319727891155), 1.2),
-                    (np.float64(4.184931972789116), 0.0),
-                    (np.float64(4.31891156462585), 1.2),
-                    (np.float64(4.39391156462585), 0.0)
-                ],
-                'drumming': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.06965986394557823), 1.2),
-                    (np.float64(0.14465986394557823), 0.0),
-                    (np.float64(0.25541950113378686), 1.2),
-                    (np.float64(0.3304195011337869), 0.0),
-                    (np.float64(0.44117913832199546), 1.2),
-                    (np.float64(0.5161791383219955), 0.0),
-                    (np.float64(0.6733786848072563), 1.2),
-                    (np.float64(0.7483786848072562), 0.0),
-                    (np.float64(0.8359183673469388), 1.2),
-                    (np.float64(0.9109183673469388), 0.0),
-                    (np.float64(1.0681179138321995), 1.2),
-                    (np.float64(1.1431179138321994), 0.0),
-                    (np.float64(1.253877551020408), 1.2),
-                    (np.float64(1.328877551020408), 0.0),
-                    (2.601360544217687, 0.0)
-                ]
-            }
-        },
-        'tancho': {
-            'name_jp': 'タンチョウ',
-            'base_color': [
-                255,
-                255,
-                255
-            ],
-            'accent_color': [
-                255,
-                0,
-                0
-            ],
-            'base_pixel_count': 5,
-            'size': 3.5,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 1],
-                ['a', 2],
-                ['b', 1]
-            ],
-            'chirp_color_pattern': [
-                ['a', 2],
-                ['b', 3],
-                ['a', 2]
-            ],
-            'movement_speed': 0.1,
-            'approach_speed': 0.05,
-            'curiosity': 0.3,
-            'caution_distance': 2.5,
-            'flee_distance': 2.0,
-            'sound_files': {
-                'default': 'assets/sounds/tancho.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.13931972789115646), 1.2),
-                    (np.float64(0.21431972789115644), 0.0),
-                    (np.float64(0.301859410430839), 1.2),
-                    (np.float64(0.37685941043083904), 0.0),
-                    (np.float64(0.5804988662131519), 1.2),
-                    (np.float64(0.6554988662131519), 0.0),
-                    (np.float64(0.8126984126984127), 1.2),
-                    (np.float64(0.8876984126984127), 0.0),
-                    (np.float64(1.0448979591836736), 1.2),
-                    (np.float64(1.1198979591836735), 0.0),
-                    (np.float64(1.253877551020408), 1.2),
-                    (np.float64(1.328877551020408), 0.0),
-                    (np.float64(1.486077097505669), 1.2),
-                    (np.float64(1.561077097505669), 0.0),
-                    (np.float64(1.6253968253968254), 1.2),
-                    (np.float64(1.7003968253968254), 0.0),
-                    (np.float64(1.811156462585034), 1.2),
-                    (np.float64(1.886156462585034), 0.0),
-                    (np.float64(1.9969160997732427), 1.2),
-                    (np.float64(2.071916099773243), 0.0),
-                    (np.float64(2.2291156462585033), 1.2),
-                    (np.float64(2.3041156462585035), 0.0),
-                    (np.float64(2.461315192743764), 1.2),
-                    (np.float64(2.536315192743764), 0.0),
-                    (np.float64(2.693514739229025), 1.2),
-                    (np.float64(2.7685147392290252), 0.0),
-                    (np.float64(3.0882539682539685), 1.2),
-                    (np.float64(3.1632539682539687), 0.0),
-                    (np.float64(3.297233560090703), 1.2),
-                    (np.float64(3.372233560090703), 0.0),
-                    (np.float64(3.5062131519274375), 1.2),
-                    (np.float64(3.5812131519274377), 0.0),
-                    (np.float64(3.9938321995464854), 1.2),
-                    (np.float64(4.068832199546486), 0.0),
-                    (np.float64(4.156371882086168), 1.2),
-                    (np.float64(4.231371882086168), 0.0),
-                    (np.float64(4.922630385487528), 1.2),
-                    (np.float64(4.997630385487528), 0.0),
-                    (5.14, 0.0)
-                ]
-            }
-        },
-        'nogoma': {
-            'name_jp': 'ノゴマ',
-            'base_color': [
-                21,
-                9,
-                0
-            ],
-            'accent_color': [
-                164,
-                37,
-                0
-            ],
-            'base_pixel_count': 3,
-            'size': 0.8,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['b', 1],
-                ['a', 2],
-                ['b', 1]
-            ],
-            'chirp_color_pattern': [
-                ['a', 1],
-                ['b', 3],
-                ['a', 1]
-            ],
-            'movement_speed': 0.4,
-            'approach_speed': 0.2,
-            'curiosity': 0.8,
-            'caution_distance': 2.0,
-            'flee_distance': 1.5,
-            'sound_files': {
-                'default': 'assets/sounds/nogoma.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.11609977324263039), 1.2),
-                    (np.float64(0.1910997732426304), 0.0),
-                    (np.float64(0.3250793650793651), 1.2),
-                    (np.float64(0.4000793650793651), 0.0),
-                    (np.float64(0.5108390022675737), 1.2),
-                    (np.float64(0.5858390022675737), 0.0),
-                    (np.float64(0.6965986394557823), 1.2),
-                    (np.float64(0.7715986394557822), 0.0),
-                    (np.float64(1.0216780045351475), 1.2),
-                    (np.float64(1.0966780045351474), 0.0),
-                    (np.float64(1.207437641723356), 1.2),
-                    (np.float64(1.282437641723356), 0.0),
-                    (np.float64(1.3931972789115645), 1.2),
-                    (np.float64(1.4681972789115645), 0.0),
-                    (np.float64(1.6253968253968254), 1.2),
-                    (np.float64(1.7003968253968254), 0.0),
-                    (np.float64(1.7647165532879818), 1.2),
-                    (np.float64(1.8397165532879818), 0.0),
-                    (np.float64(1.9504761904761905), 1.2),
-                    (np.float64(2.0254761904761907), 0.0),
-                    (np.float64(2.2058956916099772), 1.2),
-                    (np.float64(2.2808956916099774), 0.0),
-                    (np.float64(2.391655328798186), 1.2),
-                    (np.float64(2.4666553287981863), 0.0),
-                    (2.6653514739229025, 0.0)
-                ]
-            }
-        },
-        'benimashiko': {
-            'name_jp': 'ベニマシコ',
-            'base_color': [
-                25,
-                9,
-                5
-            ],
-            'accent_color': [
-                230,
-                0,
-                13
-            ],
-            'base_pixel_count': 3,
-            'size': 0.9,
-            'pixel_personal_space': 5,
-            'color_pattern': [
-                ['a', 1],
-                ['b', 2],
-                ['a', 1]
-            ],
-            'chirp_color_pattern': [
-                ['a', 1],
-                ['b', 3],
-                ['a', 1]
-            ],
-            'movement_speed': 0.35,
-            'approach_speed': 0.15,
-            'curiosity': 0.7,
-            'caution_distance': 2.2,
-            'flee_distance': 2.0,
-            'sound_files': {
-                'default': 'assets/sounds/benimasiko.mp3'
-            },
-            'chirp_pattern': {
-                'default': [
-                    (0.0, 0.0),
-                    (np.float64(0.0), 0.0),
-                    (np.float64(0.09287981859410431), 1.2),
-                    (np.float64(0.1678798185941043), 0.0),
-                    (np.float64(0.25541950113378686), 1.2),
-                    (np.float64(0.3304195011337869), 0.0),
-                    (np.float64(0.4876190476190476), 1.2),
-                    (np.float64(0.5626190476190476), 0.0),
-                    (np.float64(0.6501587301587302), 1.2),
-                    (np.float64(0.7251587301587301), 0.0),
-                    (np.float64(0.8126984126984127), 1.2),
-                    (np.float64(0.8876984126984127), 0.0),
-                    (np.float64(0.9520181405895691), 1.2),
-                    (np.float64(1.027018140589569), 0.0),
-                    (np.float64(1.207437641723356), 1.2),
-                    (np.float64(1.282437641723356), 0.0),
-                    (np.float64(1.486077097505669), 1.2),
-                    (np.float64(1.561077097505669), 0.0),
-                    (np.float64(1.6950566893424037), 1.2),
-                    (np.float64(1.7700566893424037), 0.0),
-                    (np.float64(1.9504761904761905), 1.2),
-                    (np.float64(2.0254761904761907), 0.0),
-                    (np.float64(2.159455782312925), 1.2),
-                    (np.float64(2.234455782312925), 0.0),
-                    (np.float64(2.670294784580499), 1.2),
-                    (np.float64(2.745294784580499), 0.0),
-                    (np.float64(2.809614512471655), 1.2),
-                    (np.float64(2.8846145124716553), 0.0),
-                    (np.float64(2.995374149659864), 1.2),
-                    (np.float64(3.070374149659864), 0.0),
-                    (np.float64(3.320453514739229), 1.2),
-                    (np.float64(3.3954535147392293), 0.0),
-                    (np.float64(3.5294331065759637), 1.2),
-                    (np.float64(3.604433106575964), 0.0),
-                    (3.689342403628118, 0.0)
-                ]
-            }
-        }
-    }
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+PARAMS_PATH = os.path.join(CONFIG_DIR, "bird_params.json")
+PATTERNS_PATH = os.path.join(CONFIG_DIR, "chirp_patterns.npz")
+ENVELOPE_FPS = 60
+
+def pattern_key(bird_id, sound_name):
+    """Name of a chirp pattern inside chirp_patterns.npz."""
+    return f"{bird_id}/{sound_name}"
+
+def envelope_key(bird_id, sound_name, track):
+    """Name of a dense per-frame track ('envelope' or 'centroid') inside chirp_patterns.npz."""
+    return f"{bird_id}/{sound_name}/{track}"
+
+def load_bird_params():
+    """Reads the generated files and returns a fresh BIRD_PARAMS dictionary."""
+    with open(PARAMS_PATH, 'r', encoding='utf-8') as f:
+        bird_params = json.load(f)
+    with np.load(PATTERNS_PATH) as patterns:
+        for bird_id, params in bird_params.items():
+            sound_names = params.get('sound_files', {})
+            params['chirp_pattern'] = {
+                name: patterns[pattern_key(bird_id, name)] for name in sound_names if pattern_key(bird_id, name) in patterns.files
+            }
+            params['chirp_envelope'] = {
+                name: patterns[envelope_key(bird_id, name, 'envelope')] for name in sound_names if envelope_key(bird_id, name, 'envelope') in patterns.files
+            }
+            params['chirp_centroid'] = {
+                name: patterns[envelope_key(bird_id, name, 'centroid')] for name in sound_names if envelope_key(bird_id, name, 'centroid') in patterns.files
+            }
+    return bird_params
+
+def __getattr__(name):
+    # BIRD_PARAMS は最初にアクセスされた時に一度だけ読み込む
+    if name == 'BIRD_PARAMS':
+        global BIRD_PARAMS
+        BIRD_PARAMS = load_bird_params()
+        return BIRD_PARAMS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,12 +3,18 @@ import pygame
 import numpy as np
 import os
 import yaml
+import argparse
 from config.config import BIRD_PARAMS
 from src.objects import Bird
+from src.sound_bank import get_sound_bank
+from src.audio_scheduler import AudioScheduler
 from src.input_source import MouseInputSource # MouseInputSourceをインポート
-from src.simulation import World
+from src.simulation import World, FrameClock
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
 from src.renderer import Renderer
 from src.coordinates import CoordinateSystem
+from src.frame_timing import create_frame_timer
 
 # --- Load all settings from settings.yaml ---
 try:
@@ -23,6 +29,8 @@ try:
     BIRDS_TO_SIMULATE = settings.get('birds_to_simulate', [])
     AI_TUNING = settings.get('ai_tuning', {})
     CHIRP_PROBABILITY_PER_FRAME = AI_TUNING.get('chirp_probability_per_frame', 0.001)
+    RANDOM_SEED = settings.get('random_seed')
+    FRAME_TIMING_SETTINGS = settings.get('frame_timing', {'enabled': False})
     
     NUM_PIXELS = NUM_LEDS // 3
     MODEL_WIDTH = settings['model_width']
@@ -36,7 +44,7 @@ except Exception as e:
     print(f"FATAL: Error loading settings from 'settings.yaml'. Please check the file. Error: {e}")
     exit()
 
-def main():
+def main(seed=RANDOM_SEED, timing=False):
     pygame.init()
     pygame.mixer.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -58,30 +66,58 @@ def main():
     # Input Source
     input_source = MouseInputSource(coord_system.view_to_model)
 
-    bird_objects = [Bird(bird_id, BIRD_PARAMS[bird_id], CHIRP_PROBABILITY_PER_FRAME) for bird_id in BIRDS_TO_SIMULATE if bird_id in BIRD_PARAMS]
-    world = World(model_size=(MODEL_WIDTH, MODEL_HEIGHT), birds=bird_objects)
+    # World と全ての鳥が同じ乱数ジェネレーターを共有する (シード指定時は完全に再現可能)
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        print(f"Using random seed {seed}")
+    bird_objects = [Bird(bird_id, BIRD_PARAMS[bird_id], CHIRP_PROBABILITY_PER_FRAME, rng=rng) for bird_id in BIRDS_TO_SIMULATE if bird_id in BIRD_PARAMS]
+    world = World(model_size=(MODEL_WIDTH, MODEL_HEIGHT), birds=bird_objects, rng=rng,
+                  audio_scheduler=AudioScheduler(settings.get('audio', {})),
+                  clock=FrameClock() if seed is not None else None, # シード指定時はフレーム単位の時計で完全に再現する
+                  flocking=Flocking((MODEL_WIDTH, MODEL_HEIGHT), settings.get('flocking', {})),
+                  strip_avoidance=StripAvoidance(settings.get('strip_avoidance', {})))
+    if seed is not None:
+        # 再現性のため、全ての鳴き声が揃ってからシミュレーションを始める
+        get_sound_bank().wait_until_loaded()
     
     # The renderer now handles all drawing surfaces and logic
     renderer = Renderer(settings, pixel_model_positions, coord_system)
 
+    # 段階ごとの処理時間の計測 (無効時は何もしない NullFrameTimer)
+    frame_timer = create_frame_timer(dict(FRAME_TIMING_SETTINGS, enabled=True) if timing else FRAME_TIMING_SETTINGS, fps=60, project_root=PROJECT_ROOT)
+
     # --- Main Simulation Loop ---
     running = True
     while running:
+        frame_timer.start_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
         # Update simulation state
         detected_objects = input_source.get_detected_objects()
+        frame_timer.lap('input')
         world.update_humans(detected_objects)
+        frame_timer.lap('humans')
         world.update(pixel_model_positions)
+        frame_timer.lap('world')
 
         # Render the current state to the screen
-        renderer.render(screen, world)
+        renderer.calculate_pixel_colors(world.snapshot)
+        frame_timer.lap('colors')
+        renderer.draw(screen, world.snapshot, frame_timer.overlay_lines())
+        frame_timer.lap('draw')
 
         clock.tick(60)
+        frame_timer.lap('tick')
+        frame_timer.end_frame()
         
+    frame_timer.close()
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED, help="Random seed for a reproducible simulation (overrides random_seed in settings.yaml).")
+    parser.add_argument('--timing', action='store_true', help="Enable per-stage frame timing (overlay and log) regardless of settings.yaml.")
+    args = parser.parse_args()
+    main(seed=args.seed, timing=args.timing)
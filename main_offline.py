@@ -0,0 +1,195 @@
+import os
+import time
+import argparse
+import datetime
+
+# 画面も音声も使わずに、一晩分のショーを実時間より速く描画する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import numpy as np
+import yaml
+from config.config import BIRD_PARAMS
+from src.objects import Bird
+from src.audio_scheduler import AudioScheduler
+from src.simulation import World, FrameClock
+from src.renderer import Renderer
+from src.coordinates import CoordinateSystem
+from src.input_source import ReplayInputSource
+from src.crowd_simulator import CrowdSimulator
+from src.recording import FrameRecorder
+from src.frame_pipeline import FramePipeline
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
+
+# --- Load all settings from settings.yaml ---
+try:
+    PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+    SETTINGS_PATH = os.path.join(PROJECT_ROOT, "settings.yaml")
+    with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+        settings = yaml.safe_load(f)
+
+    LED_FILE_NAME = settings['led_layout_file']
+    LED_FILE_PATH = os.path.join(PROJECT_ROOT, "assets", "data", LED_FILE_NAME)
+    NUM_LEDS = settings['num_leds']
+    NUM_PIXELS = NUM_LEDS // 3
+    MODEL_WIDTH = settings['model_width']
+    MODEL_HEIGHT = settings['model_height']
+    VIEW_WIDTH = settings.get('view_width', 800)
+    VIEW_HEIGHT = settings.get('view_height', 800)
+    BIRDS_TO_SIMULATE = settings.get('birds_to_simulate', [])
+    AI_TUNING = settings.get('ai_tuning', {})
+    CHIRP_PROBABILITY_PER_FRAME = AI_TUNING.get('chirp_probability_per_frame', 0.001)
+    RANDOM_SEED = settings.get('random_seed')
+    OFFLINE_SETTINGS = settings.get('offline', {})
+    PIPELINE_SETTINGS = settings.get('pipeline', {'enabled': False})
+
+    FPS = 60
+
+except Exception as e:
+    print(f"FATAL: Error loading settings from 'settings.yaml'. Please check the file. Error: {e}")
+    exit()
+
+class TimelineWriter:
+    """
+    Collects a downsampled LED strip timeline (x: pixel, y: time) and saves one PNG per segment.
+    Each row is the per-channel maximum over its frames, so short chirp flashes stay visible.
+    """
+    def __init__(self, directory, num_pixels, frames_per_row, rows_per_segment):
+        self.directory = directory
+        self.frames_per_row = frames_per_row
+        self.rows = np.zeros((rows_per_segment, num_pixels, 3), dtype=np.uint8)
+        self.row_index = 0
+        self.frame_in_row = 0
+        self.segment_index = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def add_frame(self, colors):
+        np.maximum(self.rows[self.row_index], colors, out=self.rows[self.row_index], casting='unsafe')
+        self.frame_in_row += 1
+        if self.frame_in_row == self.frames_per_row:
+            self.frame_in_row = 0
+            self.row_index += 1
+            if self.row_index == len(self.rows):
+                self.flush()
+
+    def flush(self):
+        rows = self.row_index + (1 if self.frame_in_row else 0)
+        if rows == 0:
+            return
+        # surfarray は (幅, 高さ, 3) なので、ピクセルを横、時間を縦に並べる
+        surface = pygame.surfarray.make_surface(self.rows[:rows].transpose(1, 0, 2))
+        path = os.path.join(self.directory, f"timeline_{self.segment_index:03d}.png")
+        pygame.image.save(surface, path)
+        print(f"  Timeline segment {self.segment_index} saved to '{path}'")
+        self.rows.fill(0)
+        self.row_index = self.frame_in_row = 0
+        self.segment_index += 1
+
+def main_offline(input_path=None, duration=None, seed=RANDOM_SEED, out_dir=None, timeline=False,
+                 pipelined=PIPELINE_SETTINGS.get('enabled', False)):
+    pygame.init() # 表示もミキサーも初期化しない (鳥は音なしで光だけ鳴く)
+
+    try:
+        all_led_positions = np.loadtxt(LED_FILE_PATH, delimiter=',', skiprows=1)[:NUM_LEDS]
+        pixel_model_positions = np.array([np.mean(all_led_positions[i*3:(i+1)*3], axis=0) for i in range(NUM_PIXELS)])
+    except Exception as e:
+        print(f"FATAL: Could not load LED data from '{LED_FILE_PATH}'. Error: {e}")
+        return
+
+    # --- Input trace: a recorded log, or a synthetic crowd ---
+    crowd = None
+    if input_path:
+        try:
+            input_source = ReplayInputSource(input_path, speed=0) # 記録された1フレームを1フレームとして進める
+        except (OSError, ValueError) as e:
+            print(f"FATAL: Could not open replay log: {e}")
+            return
+        if duration is None:
+            duration = input_source.log.duration
+    else:
+        crowd = CrowdSimulator((MODEL_WIDTH, MODEL_HEIGHT), OFFLINE_SETTINGS.get('crowd', {}), seed=seed)
+        if duration is None:
+            duration = OFFLINE_SETTINGS.get('duration_minutes', 60) * 60.0
+        print(f"Using a synthetic crowd (seed={seed}).")
+
+    # 時計はフレーム単位で進める: 出力はCPUの速さに関係なく同じになる
+    rng = np.random.default_rng(seed)
+    bird_objects = [Bird(bird_id, BIRD_PARAMS[bird_id], CHIRP_PROBABILITY_PER_FRAME, rng=rng) for bird_id in BIRDS_TO_SIMULATE if bird_id in BIRD_PARAMS]
+    world = World(model_size=(MODEL_WIDTH, MODEL_HEIGHT), birds=bird_objects, rng=rng,
+                  audio_scheduler=AudioScheduler(settings.get('audio', {})), clock=FrameClock(FPS),
+                  flocking=Flocking((MODEL_WIDTH, MODEL_HEIGHT), settings.get('flocking', {})),
+                  strip_avoidance=StripAvoidance(settings.get('strip_avoidance', {})))
+    coord_system = CoordinateSystem(view_size=(VIEW_WIDTH, VIEW_HEIGHT), model_size=(MODEL_WIDTH, MODEL_HEIGHT))
+    renderer = Renderer(settings, pixel_model_positions, coord_system)
+
+    # --- Outputs ---
+    out_dir = out_dir or os.path.join(PROJECT_ROOT, OFFLINE_SETTINGS.get('output_directory', 'recordings/offline'),
+                                      datetime.datetime.now().strftime("show_%Y%m%d_%H%M%S"))
+    recorder = FrameRecorder(os.path.join(out_dir, "show.tklog"), clock=world.clock.now)
+    timeline_writer = None
+    if timeline:
+        rows_per_second = OFFLINE_SETTINGS.get('timeline_rows_per_second', 2)
+        timeline_writer = TimelineWriter(out_dir, NUM_PIXELS, frames_per_row=max(int(FPS / rows_per_second), 1),
+                                         rows_per_segment=int(OFFLINE_SETTINGS.get('segment_minutes', 10) * 60 * rows_per_second))
+
+    # フレーム N の色計算は、フレーム N+1 のシミュレーションと並行して行う (記録はメインスレッドだけで行う)
+    pipeline = FramePipeline(renderer.calculate_pixel_colors, enabled=pipelined)
+    def record_output():
+        shown = pipeline.wait()
+        if shown is not None:
+            colors = renderer.get_final_colors()
+            recorder.record_leds(colors, now=shown.time)
+            if timeline_writer:
+                timeline_writer.add_frame(colors)
+
+    total_frames = int(duration * FPS)
+    print(f"Rendering {duration / 60.0:.1f} minutes ({total_frames} frames) to '{out_dir}'...")
+    wall_start = time.perf_counter()
+    next_report = 60 * FPS
+    for frame in range(total_frames):
+        if crowd is not None:
+            detected_objects = crowd.step(1.0 / FPS)
+        else:
+            if input_source.finished:
+                break
+            detected_objects = input_source.get_detected_objects()
+
+        world.update_humans(detected_objects)
+        world.update(pixel_model_positions)
+        recorder.record_input(detected_objects)
+        record_output()
+        pipeline.submit(world.snapshot)
+
+        if frame + 1 >= next_report:
+            elapsed = time.perf_counter() - wall_start
+            simulated = (frame + 1) / FPS
+            print(f"  {simulated / 60.0:6.1f} min simulated in {elapsed:6.1f}s ({simulated / elapsed:5.1f}x realtime), "
+                  f"{len(world.humans)} visitors")
+            next_report += 60 * FPS
+
+    record_output()
+    pipeline.close()
+    elapsed = time.perf_counter() - wall_start
+    simulated = world.clock.now()
+    if timeline_writer:
+        timeline_writer.flush()
+    recorder.close()
+    if input_path:
+        input_source.shutdown()
+    pygame.quit()
+    print(f"Done: {simulated / 60.0:.1f} minutes in {elapsed:.1f}s ({simulated / max(elapsed, 1e-9):.1f}x realtime).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Renders a show offline, faster than real time, to an LED frame log.")
+    parser.add_argument('--input', default=None, help="Recorded .tklog to replay. Without it a synthetic crowd is used.")
+    parser.add_argument('--minutes', type=float, default=None, help="Length to render (default: the whole log, or offline.duration_minutes).")
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED if RANDOM_SEED is not None else 0)
+    parser.add_argument('--out', default=None, help="Output directory (default: under offline.output_directory).")
+    parser.add_argument('--timeline', action='store_true', help="Also save a downsampled strip timeline PNG per segment.")
+    parser.add_argument('--sequential', action='store_true', help="Do not overlap the color calculation with the next simulation step.")
+    args = parser.parse_args()
+    main_offline(input_path=args.input, duration=args.minutes * 60.0 if args.minutes else None,
+                 seed=args.seed, out_dir=args.out, timeline=args.timeline,
+                 pipelined=PIPELINE_SETTINGS.get('enabled', False) and not args.sequential)
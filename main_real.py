@@ -1,15 +1,32 @@
 
+from src.startup import startup_report # 起動時間の計測の起点 (最初に読み込む)
 import pygame
 import numpy as np
 import os
 import yaml
-from config.config import BIRD_PARAMS
+import argparse
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import config.config as bird_config
 from src.objects import Bird
-from src.simulation import World
+from src.sound_bank import get_sound_bank
+from src.audio_scheduler import AudioScheduler
+from src.simulation import World, FrameClock
 from src.renderer import Renderer
-from src.input_source import MouseInputSource, UdpInputSource, AutomaticInputSource
-from src.serial_handler import SerialWriterThread
+from src.input_source import MouseInputSource, UdpInputSource, AsyncUdpInputSource, AutomaticInputSource, ReplayInputSource, RecordingInputSource
+from src.recording import FrameRecorder
+from src.serial_handler import SerialWriterThread, AsyncSerialWriter
 from src.coordinates import CoordinateSystem
+from src.frame_timing import create_frame_timer
+from src.preview_ipc import SnapshotRing
+from src.preview_process import PreviewProcess
+from src.frame_pipeline import FramePipeline
+from src.async_runtime import AsyncRuntime
+from src.hot_reload import HotReloader
+from src.checkpoint import Checkpointer, load_checkpoint
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
 
 # --- Load all settings from settings.yaml ---
 try:
@@ -37,6 +54,7 @@ try:
     BIRDS_TO_SIMULATE = settings.get('birds_to_simulate', [])
     AI_TUNING = settings.get('ai_tuning', {})
     CHIRP_PROBABILITY_PER_FRAME = AI_TUNING.get('chirp_probability_per_frame', 0.001)
+    RANDOM_SEED = settings.get('random_seed')
 
     # Visuals
     VIEW_WIDTH = settings.get('view_width', 800)
@@ -50,6 +68,15 @@ try:
     INPUT_SOURCE_TYPE = settings.get('input_source_type', 'mouse')
     UDP_SETTINGS = settings.get('udp_settings', {})
     AUTO_HUMAN_SETTINGS = settings.get('auto_human_movement', {'enabled': False})
+    REPLAY_SETTINGS = settings.get('replay_settings', {})
+    RECORDING_SETTINGS = settings.get('recording', {'enabled': False})
+    FRAME_TIMING_SETTINGS = settings.get('frame_timing', {'enabled': False})
+    PREVIEW_SETTINGS = settings.get('preview', {'mode': 'window'})
+    PIPELINE_SETTINGS = settings.get('pipeline', {'enabled': False})
+    RUNTIME_MODE = settings.get('runtime', 'loop')
+    HOT_RELOAD_SETTINGS = settings.get('hot_reload', {'enabled': False})
+    CHECKPOINT_SETTINGS = settings.get('checkpoint', {'enabled': False})
+    STARTUP_SETTINGS = settings.get('startup', {})
     
     print("Loaded runtime settings from 'settings.yaml'")
     if ENABLE_TEST_MODE:
@@ -60,43 +87,121 @@ except Exception as e:
     print(f"FATAL: Error loading settings from 'settings.yaml'. Error: {e}")
     exit()
 
-def main_realtime():
-    pygame.init()
-    pygame.mixer.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Left: Debug View | Right: Artistic View (Synced to Physical Pixels)")
+def load_pixel_positions():
+    """Reads the LED layout; each pixel is the centre of its 3 LEDs."""
+    with startup_report.step("LED layout"):
+        all_led_positions = np.loadtxt(LED_FILE_PATH, delimiter=',', skiprows=1)
+        return all_led_positions[:NUM_ACTIVE_PIXELS * 3].reshape(NUM_ACTIVE_PIXELS, 3, 2).mean(axis=1)
+
+def load_bird_params():
+    with startup_report.step("bird params"):
+        return bird_config.BIRD_PARAMS
+
+def main_realtime(seed=RANDOM_SEED, timing=False, preview_mode=None, runtime_mode=None, resume=False):
+    # プレビューの方式: "window" = 同じプロセスで描画, "process" = 別プロセスで描画 (LEDのループを止めない), "none" = 描画しない
+    preview_mode = preview_mode or PREVIEW_SETTINGS.get('mode', 'window')
+    if preview_mode != 'window' and INPUT_SOURCE_TYPE == 'mouse' and not AUTO_HUMAN_SETTINGS.get('enabled', False):
+        print(f"WARNING: preview mode '{preview_mode}' has no window for mouse input. Using 'window'.")
+        preview_mode = 'window'
+    # 実行方式: "loop" = 従来の pygame のループ + スレッド, "asyncio" = AsyncRuntime のタスク
+    runtime_mode = runtime_mode or RUNTIME_MODE
+    use_asyncio = runtime_mode == 'asyncio'
+
+    # --- 起動: シリアル接続 (Arduinoのリセット待ち)・LEDレイアウト・鳥のパラメーターを並行して進める ---
+    # ポートを最初に開き、リセットを待つ間に残りを準備する。レイアウトが揃ったらアイドルフレームを渡しておき、
+    # ポートの準備ができた時点でLEDに出す。鳴き声はバックグラウンドで読み込まれ、揃った順に鳴き始める
+    with startup_report.step("serial start"):
+        if use_asyncio:
+            serial_writer = AsyncSerialWriter(SERIAL_PORT, BAUD_RATE, MAGIC_BYTE, NUM_ACTIVE_PIXELS)
+            serial_writer.begin_connect() # リセット待ちの残りは AsyncRuntime のタスクで待つ
+        else:
+            serial_writer = SerialWriterThread(SERIAL_PORT, BAUD_RATE, MAGIC_BYTE, NUM_ACTIVE_PIXELS)
+            serial_writer.start()
+    loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+    layout_future = loader.submit(load_pixel_positions)
+    params_future = loader.submit(load_bird_params)
+
+    with startup_report.step("pygame init"):
+        pygame.init()
+        pygame.mixer.init()
+    screen = None
+    if preview_mode == 'window':
+        with startup_report.step("display"):
+            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Left: Debug View | Right: Artistic View (Synced to Physical Pixels)")
     clock = pygame.time.Clock()
-    
-    serial_thread = SerialWriterThread(SERIAL_PORT, BAUD_RATE, MAGIC_BYTE, NUM_ACTIVE_PIXELS)
-    serial_thread.start()
 
     # --- Coordinate System ---
     coord_system = CoordinateSystem(view_size=(VIEW_WIDTH, VIEW_HEIGHT), model_size=(MODEL_WIDTH, MODEL_HEIGHT))
 
     # --- Data and Object Initialization ---
     try:
-        all_led_positions = np.loadtxt(LED_FILE_PATH, delimiter=',', skiprows=1)
-        pixel_model_positions = np.array([np.mean(all_led_positions[i*3:(i+1)*3], axis=0) for i in range(NUM_ACTIVE_PIXELS)])
-
+        pixel_model_positions = layout_future.result()
     except Exception as e:
         print(f"FATAL: Could not load LED data from '{LED_FILE_PATH}'. Error: {e}")
-        serial_thread.close()
+        loader.shutdown()
+        serial_writer.close()
         return
+    idle_color = np.array(STARTUP_SETTINGS.get('idle_color', [0, 0, 0]), dtype=np.uint8)
+    serial_writer.set_idle_frame(np.broadcast_to(idle_color, (NUM_ACTIVE_PIXELS, 3)))
     
     # --- Input Source Selection ---
     if AUTO_HUMAN_SETTINGS.get('enabled', False):
         input_source = AutomaticInputSource(AUTO_HUMAN_SETTINGS)
     elif INPUT_SOURCE_TYPE == 'udp':
-        input_source = UdpInputSource(host=UDP_SETTINGS.get('host', '0.0.0.0'), port=UDP_SETTINGS.get('port', 9999))
+        udp_source_class = AsyncUdpInputSource if use_asyncio else UdpInputSource
+        input_source = udp_source_class(host=UDP_SETTINGS.get('host', '0.0.0.0'), port=UDP_SETTINGS.get('port', 9999))
     elif INPUT_SOURCE_TYPE == 'mouse':
         input_source = MouseInputSource(coord_system.view_to_model)
+    elif INPUT_SOURCE_TYPE == 'replay':
+        try:
+            input_source = ReplayInputSource(os.path.join(PROJECT_ROOT, REPLAY_SETTINGS.get('path', '')),
+                                             speed=REPLAY_SETTINGS.get('speed', 1.0), loop=REPLAY_SETTINGS.get('loop', False))
+        except (OSError, ValueError) as e:
+            print(f"FATAL: Could not open replay log: {e}")
+            loader.shutdown()
+            serial_writer.close()
+            return
     else:
         print(f"FATAL: Unknown input_source_type '{INPUT_SOURCE_TYPE}' in settings.yaml. Exiting.")
-        serial_thread.close()
+        loader.shutdown()
+        serial_writer.close()
         return
 
-    bird_objects = [Bird(bird_id, BIRD_PARAMS[bird_id], CHIRP_PROBABILITY_PER_FRAME) for bird_id in BIRDS_TO_SIMULATE if bird_id in BIRD_PARAMS]
-    world = World(model_size=(MODEL_WIDTH, MODEL_HEIGHT), birds=bird_objects)
+    # --- Recording ---
+    recorder = None
+    if RECORDING_SETTINGS.get('enabled', False):
+        file_name = datetime.datetime.now().strftime("session_%Y%m%d_%H%M%S.tklog")
+        recorder = FrameRecorder(os.path.join(PROJECT_ROOT, RECORDING_SETTINGS.get('directory', 'recordings'), file_name))
+        input_source = RecordingInputSource(input_source, recorder)
+
+    bird_params = params_future.result()
+    loader.shutdown()
+
+    # World と全ての鳥が同じ乱数ジェネレーターを共有する (シード指定時は完全に再現可能)
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        print(f"Using random seed {seed}")
+    with startup_report.step("birds and world"):
+        bird_objects = [Bird(bird_id, bird_params[bird_id], CHIRP_PROBABILITY_PER_FRAME, rng=rng) for bird_id in BIRDS_TO_SIMULATE if bird_id in bird_params]
+        world = World(model_size=(MODEL_WIDTH, MODEL_HEIGHT), birds=bird_objects, rng=rng,
+                      audio_scheduler=AudioScheduler(settings.get('audio', {})),
+                      clock=FrameClock() if seed is not None else None, # シード指定時はフレーム単位の時計で完全に再現する
+                      flocking=Flocking((MODEL_WIDTH, MODEL_HEIGHT), settings.get('flocking', {})),
+                      strip_avoidance=StripAvoidance(settings.get('strip_avoidance', {})))
+    if seed is not None:
+        # 再現性のため、全ての鳴き声が揃ってからシミュレーションを始める
+        with startup_report.step("sounds (seeded run)"):
+            get_sound_bank().wait_until_loaded()
+
+    # --- Checkpoint: 前回の状態から続ける (鳥の位置・状態・来場者の追跡・乱数) ---
+    checkpointer = None
+    if CHECKPOINT_SETTINGS.get('enabled', False) or resume:
+        checkpoint_path = os.path.join(PROJECT_ROOT, CHECKPOINT_SETTINGS.get('path', 'state/world_checkpoint.npz'))
+        if resume or CHECKPOINT_SETTINGS.get('resume', False):
+            max_age = CHECKPOINT_SETTINGS.get('max_age_minutes', 30)
+            load_checkpoint(world, checkpoint_path, max_age_seconds=max_age * 60.0 if max_age is not None else None)
+        checkpointer = Checkpointer(world, checkpoint_path, CHECKPOINT_SETTINGS.get('interval_seconds', 10.0))
     
     # --- Load LiDAR pose data ---
     LIDAR_POSE_WORLD = None
@@ -142,39 +247,135 @@ def main_realtime():
 
 
     # Rendererの初期化時に、LiDARの姿勢情報を渡す
-    renderer = Renderer(settings, pixel_model_positions, coord_system, lidar_pose=LIDAR_POSE_WORLD)
+    with startup_report.step("renderer"):
+        renderer = Renderer(settings, pixel_model_positions, coord_system, lidar_pose=LIDAR_POSE_WORLD)
     
-    print("Starting real-time simulation and LED output...")
-    running = True
-    while running:
-        pygame.event.pump()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+    # 別プロセスのプレビュー: 共有メモリのリングに毎フレームのスナップショットを書き込むだけで、待つことはない
+    snapshot_ring, preview_process = None, None
+    if preview_mode == 'process':
+        # hot reload で鳥が増えても載るよう、preview.max_birds 羽分の場所を取っておく
+        snapshot_ring = SnapshotRing.create(NUM_ACTIVE_PIXELS, max_birds=max(len(bird_objects), PREVIEW_SETTINGS.get('max_birds', 64), 1),
+                                            max_humans=PREVIEW_SETTINGS.get('max_humans', 64))
+        preview_process = PreviewProcess(snapshot_ring, settings, pixel_model_positions,
+                                         (MODEL_WIDTH, MODEL_HEIGHT), lidar_pose=LIDAR_POSE_WORLD)
+        with startup_report.step("preview process"):
+            preview_process.start()
+
+    # settings.yaml と鳥のパラメーターの変更を、再起動せずにフレームの合間で反映する
+    hot_reloader = None
+    if HOT_RELOAD_SETTINGS.get('enabled', False):
+        hot_reloader = HotReloader(SETTINGS_PATH, settings, world, renderer,
+                                   lambda bird_id, params, chirp_probability: Bird(bird_id, params, chirp_probability, rng=rng),
+                                   poll_interval=HOT_RELOAD_SETTINGS.get('poll_interval_seconds', 1.0))
+
+    # 段階ごとの処理時間の計測 (無効時は何もしない NullFrameTimer)
+    frame_timer = create_frame_timer(dict(FRAME_TIMING_SETTINGS, enabled=True) if timing else FRAME_TIMING_SETTINGS, fps=60, project_root=PROJECT_ROOT)
+
+    if use_asyncio:
+        print("Starting real-time simulation and LED output (asyncio runtime)...")
+        runtime = AsyncRuntime(world, renderer, input_source, serial_writer, pixel_model_positions, fps=60, screen=screen,
+                               preview_fps=PREVIEW_SETTINGS.get('fps', 30), snapshot_ring=snapshot_ring,
+                               preview_process=preview_process, recorder=recorder, frame_timer=frame_timer,
+                               hot_reloader=hot_reloader, checkpointer=checkpointer,
+                               startup_report=startup_report if STARTUP_SETTINGS.get('report', True) else None)
+        try:
+            asyncio.run(runtime.run())
+        except KeyboardInterrupt:
+            print("Interrupted.")
+    else:
+        # --- 出力段: 色の計算 → シリアル → プレビュー共有 ---
+        # World のスナップショットだけを読むので、次のフレームのシミュレーションと並行して実行できる
+        # (パイプライン有効時はワーカースレッドで動くので、段階の時間は lap() ではなく record() で記録する)
+        def output_stage(snapshot):
+            start = frame_timer.clock()
+            renderer.calculate_pixel_colors(snapshot)
+            start = frame_timer.record('colors', start)
+            serial_writer.send(renderer.get_final_colors())
+            frame_timer.record('serial', start)
+            if snapshot_ring is not None:
+                snapshot_ring.publish(snapshot, renderer)
+        pipeline = FramePipeline(output_stage, enabled=PIPELINE_SETTINGS.get('enabled', False))
+
+        print(f"Starting real-time simulation and LED output{' (pipelined output stage)' if pipeline.enabled else ''}...")
+        running = True
+        frame = 0
+        try:
+            while running:
+                frame_timer.start_frame()
+                pygame.event.pump()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
         
-        # Get raw detected objects from the selected input source
-        detected_objects = input_source.get_detected_objects()
+                # Get raw detected objects from the selected input source
+                detected_objects = input_source.get_detected_objects()
+                frame_timer.lap('input')
 
-        # Update the world with the raw data, which will handle object tracking
-        world.update_humans(detected_objects)
+                # Update the world with the raw data, which will handle object tracking
+                world.update_humans(detected_objects)
+                frame_timer.lap('humans')
         
-        # Update the main world simulation
-        world.update(pixel_model_positions)
+                # Update the main world simulation (frame N+1 の出力段はこの間も動いている)
+                world.update(pixel_model_positions)
+                frame_timer.lap('world')
 
-        # Render the views
-        renderer.render(screen, world)
+                # 前のフレームの出力段を待ってから、そのフレームを記録・描画する
+                shown = pipeline.wait()
+                frame_timer.lap('output_wait')
+                if hot_reloader is not None:
+                    hot_reloader.apply_pending() # 出力段が止まっている間だけ設定を書き換える
+                if checkpointer is not None:
+                    checkpointer.maybe_save()
+                if shown is not None:
+                    if recorder:
+                        recorder.record_leds(renderer.get_final_colors())
+                    if screen is not None:
+                        renderer.draw(screen, shown, frame_timer.overlay_lines())
+                        frame_timer.lap('draw')
 
-        # Send the latest colors to the hardware
-        final_colors = renderer.get_final_colors()
-        serial_thread.send(final_colors)
+                # このフレームの色計算とシリアル出力 (pipeline 無効時はここで実行する)
+                pipeline.submit(world.snapshot)
+                frame_timer.lap('output')
+                if preview_process is not None and frame % 60 == 0:
+                    preview_process.check()
+                if frame == 0 and STARTUP_SETTINGS.get('report', True):
+                    startup_report.mark("first frame")
+                    startup_report.print_report()
         
-        clock.tick(60)
+                clock.tick(60)
+                frame_timer.lap('tick')
+                frame_timer.end_frame()
+                frame += 1
+        except KeyboardInterrupt:
+            print("Interrupted.")
 
+        pipeline.close()
+    if hot_reloader is not None:
+        hot_reloader.close()
+    if checkpointer is not None:
+        checkpointer.close()
+    frame_timer.close()
+    if snapshot_ring is not None:
+        snapshot_ring.mark_closed()
+        preview_process.stop()
+        snapshot_ring.close()
     input_source.shutdown()
-    serial_thread.close()
-    serial_thread.join()
+    if recorder:
+        recorder.close()
+    if not use_asyncio: # asyncio の場合は AsyncRuntime が閉じている
+        serial_writer.close()
+        serial_writer.join()
     pygame.quit()
     print("Simulation finished.")
 
 if __name__ == '__main__':
-    main_realtime()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED, help="Random seed for a reproducible simulation (overrides random_seed in settings.yaml).")
+    parser.add_argument('--timing', action='store_true', help="Enable per-stage frame timing (overlay and log) regardless of settings.yaml.")
+    parser.add_argument('--preview', choices=['window', 'process', 'none'], default=None,
+                        help="Where to draw the preview (overrides preview.mode in settings.yaml).")
+    parser.add_argument('--runtime', choices=['loop', 'asyncio'], default=None,
+                        help="Main loop implementation (overrides runtime in settings.yaml).")
+    parser.add_argument('--resume', action='store_true', help="Continue from the last world checkpoint (see checkpoint in settings.yaml).")
+    args = parser.parse_args()
+    main_realtime(seed=args.seed, timing=args.timing, preview_mode=args.preview, runtime_mode=args.runtime, resume=args.resume)
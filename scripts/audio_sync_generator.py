@@ -1,90 +1,224 @@
 import os
 import sys
-import numpy as np
-import librosa
-from config.config_structure import get_base_config
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, PROJECT_ROOT)
-CONFIG_PATH = os.path.join(PROJECT_ROOT, "config", "config.py")
+import numpy as np
+from config.config_structure import get_base_config
+from config.config import PARAMS_PATH, PATTERNS_PATH, ENVELOPE_FPS, pattern_key, envelope_key
 
-def analyze_chirp(file_path):
-    try:
-        y, sr = librosa.load(file_path)
-        # By adding a 'delta' parameter, we set a minimum threshold for onset strength.
-        # This should be a more precise way to ignore noise without silencing actual chirps.
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units='frames', hop_length=512, backtrack=True, energy=y**2, delta=0.1)
-        onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=512)
-        
-        if not onset_times.any():
-            return [(0.0, 0.0), (librosa.get_duration(y=y, sr=sr), 0.0)]
-            
-        events = [(0.0, 0.0)]
-        last_time = 0.0
+ANALYSIS_CACHE_PATH = os.path.join(PROJECT_ROOT, "assets", "sounds", ".analysis_cache.json")
+
+# 解析パラメータ。ここを変えると全ての音声が再解析される (キャッシュのキーに含まれる)
+ANALYSIS_PARAMS = {
+    'hop_length': 512,
+    'delta': 0.1,            # オンセット強度の最小しきい値 (ノイズを無視する)
+    'backtrack': True,
+    'min_gap': 0.05,         # 前の光から次のオンセットまでの最小間隔 [s]
+    'pulse_width': 0.075,    # 1回の光の長さ [s]
+    'pulse_brightness': 1.2,
+}
+
+# 密なエンベロープ (フレームごとの明るさ) の解析パラメータ。これもキャッシュのキーに含まれる
+ENVELOPE_PARAMS = {
+    'fps': ENVELOPE_FPS,      # 1秒あたりのサンプル数 (シミュレーションのフレームレート)
+    'hop_length': 256,
+    'frame_length': 1024,
+    'rms_weight': 0.7,        # 明るさ = RMS と オンセット強度 の重み付き和
+    'floor': 0.05,            # これ以下の明るさは 0 にする (背景ノイズで光らせない)
+}
+
+def onsets_to_events(onset_times, duration, params=ANALYSIS_PARAMS):
+    """Turns onset times [s] into [(time, brightness), ...] keyframes: one short pulse per onset."""
+    if not np.any(onset_times):
+        return [(0.0, 0.0), (duration, 0.0)]
         
-        for t in onset_times:
-            if t > last_time + 0.05:
-                events.append((np.float64(last_time), 0.0))
-                events.append((np.float64(t), 1.2))
-                last_time = t + 0.075
+    events = [(0.0, 0.0)]
+    last_time = 0.0
+    
+    for t in onset_times:
+        if t > last_time + params['min_gap']:
+            events.append((float(last_time), 0.0))
+            events.append((float(t), params['pulse_brightness']))
+            last_time = t + params['pulse_width']
+    
+    events.append((float(last_time), 0.0))
+    if duration > last_time:
+        events.append((duration, 0.0))
         
-        events.append((np.float64(last_time), 0.0))
-        final_duration = librosa.get_duration(y=y, sr=sr)
-        if final_duration > last_time:
-            events.append((final_duration, 0.0))
-            
-        return events
+    return events
+
+def keyframes_from_audio(y, sr, params=ANALYSIS_PARAMS):
+    import librosa # 重いので、実際に解析が必要な時 (ワーカー内) だけ読み込む
+    hop_length = params['hop_length']
+    # By adding a 'delta' parameter, we set a minimum threshold for onset strength.
+    # This should be a more precise way to ignore noise without silencing actual chirps.
+    onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units='frames', hop_length=hop_length, backtrack=params['backtrack'], energy=y**2, delta=params['delta'])
+    onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=hop_length)
+    
+    return onsets_to_events(onset_times, float(librosa.get_duration(y=y, sr=sr)), params)
+
+def dense_tracks_from_audio(y, sr, params=ENVELOPE_PARAMS):
+    """
+    Per-frame tracks sampled at params['fps'], both as uint8 (0-255):
+    - envelope: brightness following the song shape (RMS + onset strength)
+    - centroid: spectral centroid, used to mix the accent color into the base color
+    """
+    import librosa
+    hop, frame_length = params['hop_length'], params['frame_length']
+    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop)[0]
+    onset = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop)
+    centroid = librosa.feature.spectral_centroid(y=y, sr=sr, n_fft=frame_length, hop_length=hop)[0]
+    n = min(len(rms), len(onset), len(centroid))
+    rms, onset, centroid = rms[:n], onset[:n], centroid[:n]
+
+    rms_n = rms / (rms.max() + 1e-9)
+    onset_n = onset / (onset.max() + 1e-9)
+    level = np.clip(params['rms_weight'] * rms_n + (1.0 - params['rms_weight']) * onset_n, 0.0, 1.0)
+    level = np.maximum(level - params['floor'], 0.0) / (1.0 - params['floor'])
+
+    # 音が鳴っているフレームの範囲で 0-1 に正規化する
+    voiced = rms_n > 0.1
+    low, high = np.percentile(centroid[voiced], [5, 95]) if voiced.any() else (0.0, 1.0)
+    centroid_n = np.clip((centroid - low) / max(high - low, 1e-9), 0.0, 1.0) * voiced
+
+    frame_times = librosa.frames_to_time(np.arange(n), sr=sr, hop_length=hop)
+    out_times = np.arange(int(np.ceil(librosa.get_duration(y=y, sr=sr) * params['fps']))) / params['fps']
+    to_uint8 = lambda track: np.round(np.interp(out_times, frame_times, track) * 255).astype(np.uint8).tolist()
+    return to_uint8(level), to_uint8(centroid_n)
+
+def analyze_sound(file_path):
+    """Keyframes plus the dense per-frame tracks for one file (runs in a worker process). None if it fails."""
+    import librosa
+    try:
+        y, sr = librosa.load(file_path)
+        envelope, centroid = dense_tracks_from_audio(y, sr)
+        return {'events': keyframes_from_audio(y, sr), 'envelope': envelope, 'centroid': centroid}
     except Exception as e:
         print(f"  [ERROR] Could not process audio file {os.path.basename(file_path)}: {e}")
-        return [(0, 0)]
-
-def format_python_code(obj, indent=0):
-    margin = ' ' * indent
-    if isinstance(obj, dict):
-        items = [f"{margin}    '{k}': {format_python_code(v, indent + 4)}" for k, v in obj.items()]
-        return f"{{\n" + ",\n".join(items) + f"\n{margin}}}"
-    if isinstance(obj, list):
-        if not obj: return "[]"
-        if isinstance(obj[0], tuple):
-            items = [f"{margin}    {repr(tuple(i))}" for i in obj]
-            return f"[\n" + ",\n".join(items) + f"\n{margin}]"
-        else:
-            items = [f"{margin}    {repr(i)}" for i in obj]
-            return f"[\n" + ",\n".join(items) + f"\n{margin}]"
-    return repr(obj)
+        return None
+
+def analysis_cache_key(file_path, params=(ANALYSIS_PARAMS, ENVELOPE_PARAMS)):
+    """音声の内容ハッシュ + 解析パラメータ。どちらかが変わった時だけ再解析する。"""
+    with open(file_path, 'rb') as f:
+        content_hash = hashlib.sha1(f.read()).hexdigest()
+    params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"{content_hash}:{params_hash}"
+
+def load_analysis_cache():
+    try:
+        with open(ANALYSIS_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_analysis_cache(cache):
+    tmp_path = ANALYSIS_CACHE_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, ANALYSIS_CACHE_PATH)
+
+def analyze_sounds(sound_paths):
+    """
+    Returns {path: analysis} for every path that could be analyzed. Cached results are reused;
+    the rest are analyzed in a process pool, one file per worker.
+    Failures are not cached (a temporary decode error is retried on the next run).
+    """
+    cache = load_analysis_cache()
+    keys = {path: analysis_cache_key(path) for path in sound_paths}
+    missing = sorted({path for path, key in keys.items() if key not in cache})
+    failed = []
+
+    if missing:
+        print(f"  -> Analyzing {len(missing)} sound(s) in parallel ({len(sound_paths) - len(missing)} cached)...")
+        with ProcessPoolExecutor(max_workers=min(len(missing), os.cpu_count() or 1)) as pool:
+            for path, analysis in zip(missing, pool.map(analyze_sound, missing)):
+                if analysis is None:
+                    failed.append(path)
+                    continue
+                print(f"     analyzed {os.path.relpath(path, PROJECT_ROOT)}")
+                cache[keys[path]] = analysis
+    else:
+        print(f"  -> All {len(sound_paths)} sound(s) cached, skipping analysis.")
+
+    # 今の音声ファイルのどれにも使われないエントリ (編集前の音声など) は捨てる
+    used = {key: cache[key] for key in keys.values() if key in cache}
+    if missing or len(used) != len(cache):
+        save_analysis_cache(used)
+    if failed:
+        print(f"  [WARNING] {len(failed)} sound(s) could not be analyzed and have no light pattern: "
+              f"{', '.join(os.path.relpath(path, PROJECT_ROOT) for path in failed)}")
+
+    return {path: used[key] for path, key in keys.items() if key in used}
+
+def format_params_json(bird_params):
+    """One line per parameter, so edits to a single color show up as a one-line diff."""
+    blocks = []
+    for bird_id, params in bird_params.items():
+        items = [f"    {json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}" for k, v in params.items()]
+        blocks.append(f"  {json.dumps(bird_id)}: {{\n" + ",\n".join(items) + "\n  }")
+    return "{\n" + ",\n".join(blocks) + "\n}\n"
+
+def patterns_up_to_date(patterns):
+    if not os.path.exists(PATTERNS_PATH):
+        return False
+    with np.load(PATTERNS_PATH) as existing:
+        return set(existing.files) == set(patterns) and all(np.array_equal(existing[k], v) for k, v in patterns.items())
+
+def params_up_to_date(params_json):
+    if not os.path.exists(PARAMS_PATH):
+        return False
+    with open(PARAMS_PATH, 'r', encoding='utf-8') as f:
+        return f.read() == params_json
 
 def main():
     print("--- Starting audio sync pattern generation ---")
     bird_params = get_base_config()
 
+    sound_paths = set()
     for bird_id, params in bird_params.items():
-        print(f"Processing bird: {bird_id.capitalize()}")
-        chirp_patterns = {}
         for sound_name, sound_path in params.get('sound_files', {}).items():
             full_path = os.path.join(PROJECT_ROOT, sound_path)
             if os.path.exists(full_path):
-                print(f"  -> Analyzing '{sound_name}' ({sound_path})...")
-                chirp_patterns[sound_name] = analyze_chirp(full_path)
+                sound_paths.add(full_path)
             else:
                 print(f"  [WARNING] Sound file not found: {full_path}")
-        params['chirp_pattern'] = chirp_patterns
-    
-    print("\n--- Generating new 'config/config.py' ---")
-    output_content = f"""# This file was auto-generated by audio_sync_generator.py. DO NOT EDIT MANUALLY.
-# It defines bird personalities, colors, and audio-synced light patterns.
-# Hardware settings and simulation cast are in 'settings.yaml'.
-import numpy as np
+    analyses = analyze_sounds(sorted(sound_paths))
+
+    # 光のパターンは float32 の (N, 2) 配列 [time, brightness] として .npz に保存する
+    # 密なエンベロープとスペクトル重心は uint8 の (フレーム数,) 配列
+    patterns = {}
+    for bird_id, params in bird_params.items():
+        for sound_name, sound_path in params.get('sound_files', {}).items():
+            full_path = os.path.join(PROJECT_ROOT, sound_path)
+            if full_path in analyses:
+                analysis = analyses[full_path]
+                patterns[pattern_key(bird_id, sound_name)] = np.array(analysis['events'], dtype=np.float32).reshape(-1, 2)
+                for track in ('envelope', 'centroid'):
+                    patterns[envelope_key(bird_id, sound_name, track)] = np.array(analysis[track], dtype=np.uint8)
+    params_json = format_params_json(bird_params)
 
-BIRD_PARAMS = {format_python_code(bird_params, 4)}
-"""
+    print("\n--- Writing bird parameters and chirp patterns ---")
     try:
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            f.write(output_content)
-        print(f"Successfully wrote new bird parameters to '{CONFIG_PATH}'")
+        if params_up_to_date(params_json):
+            print(f"'{PARAMS_PATH}' is already up to date.")
+        else:
+            with open(PARAMS_PATH, 'w', encoding='utf-8') as f:
+                f.write(params_json)
+            print(f"Successfully wrote bird parameters to '{PARAMS_PATH}'")
+
+        if patterns_up_to_date(patterns):
+            print(f"'{PATTERNS_PATH}' is already up to date.")
+        else:
+            np.savez(PATTERNS_PATH, **patterns)
+            print(f"Successfully wrote {len(patterns)} chirp patterns to '{PATTERNS_PATH}'")
     except Exception as e:
-        print(f"FATAL: Failed to write to '{CONFIG_PATH}'. Error: {e}")
+        print(f"FATAL: Failed to write bird parameters. Error: {e}")
         sys.exit(1)
     print("\n--- All processes completed successfully ---")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+# 画面・音声なしで実行する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+import numpy as np
+import pygame
+from config.config import BIRD_PARAMS
+from src.objects import Bird
+from src.simulation import World, FrameClock
+from src.renderer import Renderer
+from src.coordinates import CoordinateSystem
+from src.pixel_lookup import PixelLookup
+from src import kernels
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
+
+MODEL_SIZE = (5.3, 6.3)
+VIEW_SIZE = (800, 800)
+DEFAULT_BASELINE_PATH = os.path.join(PROJECT_ROOT, "scripts", "benchmark_baseline.json")
+
+# 一つずつ軸を動かすスイープ (他の軸は基準値に固定)
+BASE_CASE = {'birds': 16, 'pixels': 400, 'humans': 1}
+SWEEPS = {
+    'birds': [16, 64, 256, 1000],
+    'pixels': [100, 1000, 10000],
+    'humans': [0, 10, 50],
+}
+
+def generate_layout(num_pixels, model_size=MODEL_SIZE):
+    """A spiral LED path inside the pond ellipse, for any number of pixels."""
+    t = np.linspace(0.0, 1.0, num_pixels)
+    angle = t * 2 * np.pi * 3.0
+    radius = 0.95 - 0.6 * t
+    return np.column_stack([radius * np.cos(angle) * model_size[0] / 2, radius * np.sin(angle) * model_size[1] / 2])
+
+def generate_detections(num_humans, frame):
+    """Visitors spread around the rim, walking slowly so that tracking keeps matching them."""
+    if num_humans == 0:
+        return np.empty((0, 3), dtype=np.float32)
+    angles = np.linspace(0, 2 * np.pi, num_humans, endpoint=False) + frame * 0.002
+    detections = np.empty((num_humans, 3), dtype=np.float32)
+    detections[:, 0] = 0.9 * MODEL_SIZE[0] / 2 * np.cos(angles)
+    detections[:, 1] = 0.9 * MODEL_SIZE[1] / 2 * np.sin(angles)
+    detections[:, 2] = 1.0
+    return detections
+
+class Scenario:
+    """A seeded world with the given number of birds, pixels and humans."""
+    def __init__(self, birds, pixels, humans, settings, seed=0):
+        self.num_humans = humans
+        self.pixel_model_positions = generate_layout(pixels)
+        rng = np.random.default_rng(seed)
+        species = sorted(BIRD_PARAMS)
+        bird_objects = [Bird(species[i % len(species)], BIRD_PARAMS[species[i % len(species)]], 0.005, rng=rng) for i in range(birds)]
+        self.world = World(MODEL_SIZE, bird_objects, rng=rng, clock=FrameClock())
+        self.renderer = Renderer(settings, self.pixel_model_positions, CoordinateSystem(VIEW_SIZE, MODEL_SIZE))
+        self.frame = 0
+
+        # 定常状態に近づけるため、数フレーム進めてから一部の鳥を鳴かせておく (音声なしでも光のパスを通す)
+        for _ in range(10):
+            self.step()
+        for bird in self.world.birds[::4]:
+            bird.state = "CHIRPING"
+            bird.active_pattern_key = next(iter(bird.chirp_patterns), None)
+            bird.chirp_start_time = self.world.now
+            bird.chirp_duration = 1e9
+        self.world.capture_snapshot() # 描画側はスナップショットしか読まない
+
+    def step(self):
+        self.world.update_humans(generate_detections(self.num_humans, self.frame))
+        self.world.update(self.pixel_model_positions)
+        self.frame += 1
+
+    def hot_paths(self):
+        world, pixels = self.world, self.pixel_model_positions
+        positions = np.array([bird.position for bird in world.birds]).reshape(-1, 2)
+        pixel_centers = np.array([int(np.argmin(np.linalg.norm(pixels - bird.position, axis=1))) for bird in world.birds], dtype=np.int64)
+        personal_space = np.array([bird.pixel_personal_space for bird in world.birds], dtype=float)
+        other_reach = np.zeros(len(world.birds))
+        repulsion = np.zeros((len(world.birds), 2))
+        # 群れの動き (World では設定で有効にした時だけ)。鳥の数に比例して増えるか
+        flocking = Flocking(MODEL_SIZE, {'enabled': True})
+        velocities = np.array([bird.velocity for bird in world.birds]).reshape(-1, 2)
+        speeds = np.array([bird.speed for bird in world.birds], dtype=float)
+        steering = np.zeros((len(world.birds), 2))
+        # 光の重なりの予測 (予測位置の最寄りピクセルをまとめて引く)
+        strip_avoidance = StripAvoidance({'enabled': True})
+        pixel_lookup = PixelLookup(pixels)
+        half_spans = np.array([bird.lit_half_span() for bird in world.birds], dtype=float)
+        avoidance = np.zeros((len(world.birds), 2))
+
+        def update_humans():
+            self.frame += 1
+            world.update_humans(generate_detections(self.num_humans, self.frame))
+
+        def bird_update():
+            world.birds[0].update(world.humans, repulsion[0], world.now)
+
+        return {
+            'World.update_humans': update_humans,
+            'World.update': lambda: world.update(pixels),
+            'Bird.update': bird_update,
+            'kernels.strip_repulsion': lambda: kernels.strip_repulsion(positions, pixel_centers, personal_space, other_reach, repulsion),
+            'Flocking.steer': lambda: flocking.steer(world.birds, positions, velocities, speeds, steering),
+            'StripAvoidance.steer': lambda: strip_avoidance.steer(positions, velocities, half_spans, pixel_lookup, avoidance),
+            'Renderer.calculate_pixel_colors': lambda: self.renderer.calculate_pixel_colors(world),
+        }
+
+def measure(func, time_budget, min_calls, max_calls):
+    """Per-call latency percentiles [us], then transient / net allocations from a separate traced pass."""
+    func() # warm-up
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_calls and (len(samples) < min_calls or time.perf_counter() - start < time_budget):
+        t0 = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - t0)
+    samples = np.array(samples) / 1000.0
+
+    traced_calls = min(len(samples), 5)
+    tracemalloc.start()
+    peaks = []
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(traced_calls):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    net = (tracemalloc.get_traced_memory()[0] - before) / traced_calls
+    tracemalloc.stop()
+
+    return {
+        'calls': len(samples),
+        'mean_us': float(samples.mean()),
+        'p50_us': float(np.percentile(samples, 50)),
+        'p95_us': float(np.percentile(samples, 95)),
+        'p99_us': float(np.percentile(samples, 99)),
+        'alloc_peak_kib': float(np.median(peaks)) / 1024.0,
+        'alloc_net_bytes_per_call': float(net),
+    }
+
+def result_key(record):
+    return f"{record['path']}|birds={record['birds']}|pixels={record['pixels']}|humans={record['humans']}"
+
+def cases(full_grid):
+    if full_grid:
+        for birds in SWEEPS['birds']:
+            for pixels in SWEEPS['pixels']:
+                for humans in SWEEPS['humans']:
+                    yield {'birds': birds, 'pixels': pixels, 'humans': humans}
+        return
+    seen = set()
+    for axis, values in SWEEPS.items():
+        for value in values:
+            case = dict(BASE_CASE, **{axis: value})
+            key = tuple(case.values())
+            if key not in seen:
+                seen.add(key)
+                yield case
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Prints a comparison table and returns the list of regressions (p50 slower than tolerance)."""
+    baseline_by_key = {result_key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    print("\n--- Comparison with baseline (p50) ---")
+    for record in results:
+        key = result_key(record)
+        base = baseline_by_key.get(key)
+        if base is None:
+            print(f"  [new]        {key}")
+            continue
+        ratio = record['p50_us'] / max(base['p50_us'], 1e-9)
+        status = "ok"
+        if ratio > 1.0 + tolerance:
+            status = "REGRESSION"
+            regressions.append((key, ratio))
+        elif ratio < 1.0 - tolerance:
+            status = "faster"
+        print(f"  [{status:10s}] {key}: {base['p50_us']:.1f} -> {record['p50_us']:.1f} us ({ratio:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the simulation and rendering hot paths (headless).")
+    parser.add_argument('--output', default="bench_results.json", help="Where to write the machine-readable results.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p50 slowdown before failing (0.25 = 25%%).")
+    parser.add_argument('--full-grid', action='store_true', help="Run the full birds x pixels x humans grid instead of one-axis sweeps.")
+    parser.add_argument('--time-budget', type=float, default=0.5, help="Seconds spent timing each hot path per case.")
+    parser.add_argument('--only', default=None, help="Only run hot paths whose name contains this string.")
+    args = parser.parse_args()
+
+    pygame.init()
+    settings = {'view_width': VIEW_SIZE[0], 'view_height': VIEW_SIZE[1], 'global_brightness': 0.8, 'min_brightness_falloff': 0.4}
+
+    results = []
+    print(f"{'hot path':34s} {'birds':>6s} {'pixels':>7s} {'humans':>6s} {'p50 us':>10s} {'p95 us':>10s} {'p99 us':>10s} {'peak KiB':>9s}")
+    for case in cases(args.full_grid):
+        scenario = Scenario(case['birds'], case['pixels'], case['humans'], settings)
+        for name, func in scenario.hot_paths().items():
+            if args.only and args.only not in name:
+                continue
+            stats = measure(func, args.time_budget, min_calls=5, max_calls=20000)
+            record = dict(path=name, **case, **stats)
+            results.append(record)
+            print(f"{name:34s} {case['birds']:6d} {case['pixels']:7d} {case['humans']:6d} "
+                  f"{stats['p50_us']:10.1f} {stats['p95_us']:10.1f} {stats['p99_us']:10.1f} {stats['alloc_peak_kib']:9.1f}")
+
+    output = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=1)
+    print(f"\nResults written to '{args.output}'")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=1)
+        print(f"Baseline saved to '{args.baseline}'")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n!!! {len(regressions)} PERFORMANCE REGRESSION(S) beyond {args.tolerance:.0%} !!!")
+            for key, ratio in regressions:
+                print(f"  {key}: {ratio:.2f}x slower")
+            sys.exit(1)
+        print("\nNo regressions.")
+    else:
+        print(f"No baseline at '{args.baseline}'. Run with --save-baseline to create one.")
+
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import argparse
+
+# 画面・音声なしで実行する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+import pygame
+from benchmark_hot_paths import Scenario, VIEW_SIZE, measure
+
+# 大きな World (既定: 鳥1000羽 x ピクセル10000) で、1フレームの処理時間 (src/kernels.py を含む) を測る
+
+def main():
+    parser = argparse.ArgumentParser(description="Times one frame of a large headless world.")
+    parser.add_argument('--birds', type=int, default=1000)
+    parser.add_argument('--pixels', type=int, default=10000)
+    parser.add_argument('--humans', type=int, default=10)
+    parser.add_argument('--time-budget', type=float, default=3.0, help="Seconds spent timing each hot path.")
+    args = parser.parse_args()
+    pygame.init()
+    settings = {'view_width': VIEW_SIZE[0], 'view_height': VIEW_SIZE[1], 'global_brightness': 0.8, 'min_brightness_falloff': 0.4}
+
+    print(f"--- {args.birds} birds, {args.pixels} pixels, {args.humans} humans ---")
+    scenario = Scenario(args.birds, args.pixels, args.humans, settings)
+    world, renderer, pixels = scenario.world, scenario.renderer, scenario.pixel_model_positions
+    paths = {'World.update': lambda: world.update(pixels),
+             'Renderer.calculate_pixel_colors': lambda: renderer.calculate_pixel_colors(world)}
+    p50 = {}
+    for name, func in paths.items():
+        stats = measure(func, args.time_budget, min_calls=5, max_calls=2000)
+        p50[name] = stats['p50_us']
+        print(f"  {name:34s} p50 {stats['p50_us'] / 1000.0:9.2f} ms   p95 {stats['p95_us'] / 1000.0:9.2f} ms")
+    print(f"  {'frame (both)':34s} p50 {sum(p50.values()) / 1000.0:9.2f} ms")
+
+if __name__ == '__main__':
+    main()
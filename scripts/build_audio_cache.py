@@ -0,0 +1,51 @@
+import os
+import sys
+import glob
+import argparse
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy") # デバイスを開かずにデコードだけ行う
+import pygame
+from src.audio_cache import CACHE_DIR, cache_path, store_cached_sound
+
+SOUND_DIR = os.path.join(PROJECT_ROOT, "assets", "sounds")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-decodes every sound in assets/sounds/ to the PCM cache used at startup.")
+    # main.py / main_real.py と同じミキサー設定でデコードすること (デフォルトは pygame.mixer.init() と同じ)
+    parser.add_argument('--frequency', type=int, default=44100)
+    parser.add_argument('--size', type=int, default=-16)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--prune', action='store_true', help="Delete cache files that no longer match any sound.")
+    args = parser.parse_args()
+
+    pygame.mixer.init(frequency=args.frequency, size=args.size, channels=args.channels, allowedchanges=0)
+    signature = pygame.mixer.get_init()
+    print(f"--- Building PCM cache (mixer: {signature}) ---")
+
+    sound_files = sorted(glob.glob(os.path.join(SOUND_DIR, '*.mp3')))
+    valid_paths = set()
+    for sound_path in sound_files:
+        target = cache_path(sound_path, signature)
+        valid_paths.add(target)
+        if os.path.exists(target):
+            print(f"  [cached]  {os.path.basename(sound_path)}")
+            continue
+        start = time.perf_counter()
+        sound = pygame.mixer.Sound(sound_path)
+        store_cached_sound(sound_path, sound)
+        print(f"  [decoded] {os.path.basename(sound_path)} ({sound.get_length():.1f}s audio in {time.perf_counter() - start:.2f}s)")
+
+    if args.prune and os.path.isdir(CACHE_DIR):
+        for path in glob.glob(os.path.join(CACHE_DIR, '*.npy')):
+            if path not in valid_paths:
+                os.remove(path)
+                print(f"  [pruned]  {os.path.basename(path)}")
+
+    pygame.mixer.quit()
+    print("\n--- PCM cache is up to date ---")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import gc
+import argparse
+import tracemalloc
+
+# 画面・音声なしで実行する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+import numpy as np
+import pygame
+from src.serial_handler import SerialWriterThread
+from benchmark_hot_paths import Scenario, VIEW_SIZE, MODEL_SIZE
+
+# 定常状態のフレームループ (人の追跡 → 世界の更新 → 色計算 → シリアルパケット) が
+# フレームごとにメモリを溜め込まないことを確認する。溜め込むとGCが走り、長時間運転でカクつく。
+
+def detections_for_frame(frame, max_humans):
+    """Visitors walking around the rim; one of them leaves and comes back every 2 seconds."""
+    count = max_humans if frame % 120 < 60 else max_humans - 1
+    angles = np.linspace(0, 2 * np.pi, max_humans, endpoint=False)[:count] + frame * 0.002
+    detections = np.empty((count, 3), dtype=np.float32)
+    detections[:, 0] = 0.9 * MODEL_SIZE[0] / 2 * np.cos(angles)
+    detections[:, 1] = 0.9 * MODEL_SIZE[1] / 2 * np.sin(angles)
+    detections[:, 2] = 1.0
+    return detections
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the steady-state frame loop does not accumulate allocations.")
+    parser.add_argument('--birds', type=int, default=16)
+    parser.add_argument('--pixels', type=int, default=400)
+    parser.add_argument('--humans', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=300, help="Frames run before measuring.")
+    parser.add_argument('--frames', type=int, default=600, help="Frames measured.")
+    parser.add_argument('--max-bytes-per-frame', type=float, default=16.0)
+    args = parser.parse_args()
+
+    pygame.init()
+    settings = {'view_width': VIEW_SIZE[0], 'view_height': VIEW_SIZE[1], 'global_brightness': 0.8, 'min_brightness_falloff': 0.4}
+    scenario = Scenario(args.birds, args.pixels, args.humans, settings)
+    world, renderer, pixels = scenario.world, scenario.renderer, scenario.pixel_model_positions
+    serial_thread = SerialWriterThread(None, 0, 0x7E, args.pixels) # 接続はしない。パケットの構築だけ使う
+
+    def frame(i):
+        world.update_humans(detections_for_frame(i, args.humans))
+        world.update(pixels)
+        renderer.calculate_pixel_colors(world)
+        serial_thread.build_packet(renderer.get_final_colors())
+
+    for i in range(args.warmup):
+        frame(i)
+
+    collections = [0, 0, 0]
+    def on_gc(phase, info):
+        if phase == 'start':
+            collections[info['generation']] += 1
+
+    # gc.collect() で捨てられた NumPy 内部のキャッシュは次のフレームで作り直されるので、
+    # 集めた後にもう少しだけ回してから計測を始める
+    gc.collect()
+    tracemalloc.start(10)
+    start = args.warmup + 60
+    for i in range(args.warmup, start):
+        frame(i)
+    gc.callbacks.append(on_gc)
+    before = tracemalloc.take_snapshot()
+    for i in range(start, start + args.frames):
+        frame(i)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    gc.callbacks.remove(on_gc)
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'traceback')
+    net_bytes = sum(stat.size_diff for stat in stats)
+    per_frame = net_bytes / args.frames
+
+    print(f"Frames measured: {args.frames} (birds={args.birds}, pixels={args.pixels}, humans={args.humans})")
+    print(f"Net allocations: {net_bytes} bytes ({per_frame:.1f} bytes/frame)")
+    print(f"GC collections during the run: gen0={collections[0]} gen1={collections[1]} gen2={collections[2]}")
+
+    if per_frame > args.max_bytes_per_frame:
+        print(f"\nFAIL: more than {args.max_bytes_per_frame} bytes/frame retained. Largest growth:")
+        for stat in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:10]:
+            if stat.size_diff <= 0:
+                break
+            print(f"  +{stat.size_diff} bytes in {stat.count_diff} blocks")
+            for line in stat.traceback.format()[-4:]:
+                print(f"    {line}")
+        sys.exit(1)
+    print("OK")
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import sys
+import hashlib
+import argparse
+
+# 画面・音声なしで実行する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+import numpy as np
+import pygame
+from src import kernels
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
+from benchmark_hot_paths import Scenario, MODEL_SIZE, VIEW_SIZE, generate_detections
+
+# src/kernels.py の NumPy の実装が、元のループ (下の *_loops、毎フレーム Python で回していたもの) と
+# ビット単位で同じ結果を出すことを確認する。1. ランダムな入力でカーネルごとに、2. シード固定のシミュレーション全体で。
+
+# --- Reference loops ---
+
+def nearest_pixels_loops(pixel_positions, positions, out):
+    for i in range(positions.shape[0]):
+        px, py = positions[i, 0], positions[i, 1]
+        best, best_dist_sq = 0, np.inf
+        for k in range(pixel_positions.shape[0]):
+            dx = pixel_positions[k, 0] - px
+            dy = pixel_positions[k, 1] - py
+            dist_sq = dx * dx + dy * dy
+            if dist_sq < best_dist_sq:
+                best, best_dist_sq = k, dist_sq
+        out[i] = best
+    return out
+
+def strip_repulsion_loops(positions, pixel_centers, personal_space, other_reach, out):
+    n = positions.shape[0]
+    for i in range(n):
+        repulsion_x = repulsion_y = 0.0
+        for j in range(n):
+            if i == j:
+                continue
+            pixel_distance = abs(pixel_centers[i] - pixel_centers[j])
+            reach = personal_space[i] + other_reach[j]
+            if pixel_distance < reach:
+                vx = positions[j, 0] - positions[i, 0]
+                vy = positions[j, 1] - positions[i, 1]
+                dist = np.sqrt(vx * vx + vy * vy)
+                if dist > 1e-6:
+                    strength = (reach - pixel_distance) / reach
+                    repulsion_x -= vx / dist * strength
+                    repulsion_y -= vy / dist * strength
+        out[i, 0] = repulsion_x
+        out[i, 1] = repulsion_y
+    return out
+
+def composite_spans_loops(centers, spreads, brightness, min_falloff, brightness_map, winner_map):
+    num_pixels = brightness_map.shape[0]
+    for i in range(centers.shape[0]):
+        spread = spreads[i]
+        for j in range(-spread, spread + 1):
+            pixel_idx = centers[i] + j
+            if 0 <= pixel_idx < num_pixels:
+                linear_falloff = (spread - abs(j)) / spread if spread > 0 else 1.0
+                falloff = min_falloff + (1.0 - min_falloff) * linear_falloff
+                final_brightness = brightness[i] * falloff
+                if final_brightness > brightness_map[pixel_idx]:
+                    brightness_map[pixel_idx] = final_brightness
+                    winner_map[pixel_idx] = i
+
+def choose_colors_loops(winner_map, centers, mask_offset, mask_length, masks, color_choice, lit):
+    for pixel_idx in range(winner_map.shape[0]):
+        bird_idx = winner_map[pixel_idx]
+        color_choice[pixel_idx] = 0
+        lit[pixel_idx] = False
+        if bird_idx != -1 and mask_length[bird_idx] > 0:
+            lit[pixel_idx] = True
+            index = pixel_idx - centers[bird_idx] + mask_length[bird_idx] // 2 + mask_length[bird_idx] % 2
+            if 0 <= index < mask_length[bird_idx]:
+                color_choice[pixel_idx] = masks[mask_offset[bird_idx] + index]
+
+def flock_sums_loops(positions, velocities, species, cells, cell_start, order, grid_width, radius, separation_distance,
+                      max_neighbors, out):
+    n = positions.shape[0]
+    grid_height = (cell_start.shape[0] - 1) // grid_width
+    radius_sq = radius * radius
+    separation_sq = separation_distance * separation_distance
+    for i in range(n):
+        cx, cy = cells[i] % grid_width, cells[i] // grid_width
+        separation_x = separation_y = velocity_x = velocity_y = offset_x = offset_y = count = 0.0
+        found = 0
+        for o in range(9):
+            # 自分のマスを先に、次に周りの 8 マスを行ごとに見る
+            m = 4 if o == 0 else (o - 1 if o <= 4 else o)
+            gx, gy = cx + m % 3 - 1, cy + m // 3 - 1
+            if found >= max_neighbors or gx < 0 or gx >= grid_width or gy < 0 or gy >= grid_height:
+                continue
+            cell = gy * grid_width + gx
+            for k in range(cell_start[cell], cell_start[cell + 1]):
+                j = order[k]
+                if i == j:
+                    continue
+                dx = positions[j, 0] - positions[i, 0]
+                dy = positions[j, 1] - positions[i, 1]
+                dist_sq = dx * dx + dy * dy
+                if dist_sq >= radius_sq:
+                    continue
+                if 1e-12 < dist_sq < separation_sq:
+                    dist = np.sqrt(dist_sq)
+                    strength = (separation_distance - dist) / separation_distance
+                    separation_x -= dx / dist * strength
+                    separation_y -= dy / dist * strength
+                if species[j] == species[i]:
+                    velocity_x += velocities[j, 0]
+                    velocity_y += velocities[j, 1]
+                    offset_x += dx
+                    offset_y += dy
+                    count += 1.0
+                found += 1
+                if found >= max_neighbors:
+                    break
+        out[i, 0] = separation_x
+        out[i, 1] = separation_y
+        out[i, 2] = velocity_x
+        out[i, 3] = velocity_y
+        out[i, 4] = offset_x
+        out[i, 5] = offset_y
+        out[i, 6] = count
+    return out
+
+REFERENCE = {
+    'nearest_pixels': nearest_pixels_loops,
+    'strip_repulsion': strip_repulsion_loops,
+    'composite_spans': composite_spans_loops,
+    'choose_colors': choose_colors_loops,
+    'flock_sums': flock_sums_loops,
+}
+KERNELS = {name: getattr(kernels, name) for name in REFERENCE}
+
+def random_case(rng, num_birds, num_pixels):
+    """Inputs for every kernel, with the awkward cases: span edges, zero spreads, zero brightness, ties, stacked birds."""
+    pixel_positions = rng.uniform(-3.0, 3.0, (num_pixels, 2))
+    positions = rng.uniform(-3.0, 3.0, (num_birds, 2))
+    if num_birds > 1:
+        positions[-1] = positions[0] # 同じ位置の鳥 (2D の距離が 0)
+    centers = rng.integers(0, num_pixels, num_birds).astype(np.int64)
+    centers[:2] = [0, num_pixels - 1][:num_birds] # テープの両端からはみ出す
+    spreads = rng.integers(0, 8, num_birds).astype(np.int64)
+    brightness = rng.choice([0.0, 0.4, 0.8, 1.2], num_birds) # 同じ明るさが多い (先の鳥が勝つか)
+    personal_space = rng.integers(2, 10, num_birds).astype(float)
+    lengths = rng.integers(0, 9, num_birds).astype(np.int64)
+    offsets = (np.cumsum(lengths) - lengths).astype(np.int64)
+    masks = rng.integers(0, 2, int(lengths.sum())).astype(np.uint8)
+    flocking = Flocking((6.0, 6.0), {'enabled': True, 'neighbor_radius': 1.0})
+    flocking.grid.rebuild(positions)
+    return dict(pixel_positions=pixel_positions, positions=positions, centers=centers, spreads=spreads,
+                brightness=brightness, personal_space=personal_space, other_reach=rng.integers(0, 2, num_birds) * spreads.astype(float),
+                offsets=offsets, lengths=lengths, masks=masks,
+                velocities=rng.normal(0.0, 0.01, (num_birds, 2)), species=rng.integers(0, 3, num_birds).astype(np.int64),
+                grid=flocking.grid)
+
+def run_kernels(impl, case, num_pixels):
+    num_birds = len(case['positions'])
+    nearest = impl['nearest_pixels'](case['pixel_positions'], case['positions'], np.zeros(num_birds, dtype=np.int64))
+    repulsion = impl['strip_repulsion'](case['positions'], case['centers'], case['personal_space'], case['other_reach'],
+                                        np.zeros((num_birds, 2)))
+    brightness_map, winner_map = np.zeros(num_pixels), np.full(num_pixels, -1, dtype=np.int64)
+    impl['composite_spans'](case['centers'], case['spreads'], case['brightness'], 0.3, brightness_map, winner_map)
+    color_choice, lit = np.full(num_pixels, 7, dtype=np.int64), np.ones(num_pixels, dtype=bool)
+    impl['choose_colors'](winner_map, case['centers'], case['offsets'], case['lengths'], case['masks'], color_choice, lit)
+    grid = case['grid']
+    flock = impl['flock_sums'](case['positions'], case['velocities'], case['species'], grid.cells, grid.cell_start, grid.order,
+                               grid.grid_width, 1.0, 0.35, 7, np.zeros((num_birds, 7)))
+    return {'nearest_pixels': nearest, 'strip_repulsion': repulsion,
+            'composite_spans': (brightness_map, winner_map), 'choose_colors': (color_choice, lit), 'flock_sums': flock}
+
+def same(a, b):
+    if isinstance(a, tuple):
+        return all(same(x, y) for x, y in zip(a, b))
+    return a.shape == b.shape and a.tobytes() == b.tobytes()
+
+def check_kernels(cases):
+    failures = 0
+    rng = np.random.default_rng(0)
+    for num_birds, num_pixels in cases:
+        for _ in range(5):
+            case = random_case(rng, num_birds, num_pixels)
+            expected = run_kernels(REFERENCE, case, num_pixels)
+            results = run_kernels(KERNELS, case, num_pixels)
+            for name in REFERENCE:
+                if not same(results[name], expected[name]):
+                    failures += 1
+                    print(f"  MISMATCH {name} birds={num_birds} pixels={num_pixels}")
+        print(f"  kernels, birds={num_birds:4d} pixels={num_pixels:5d}: {'ok' if not failures else 'FAILED'}")
+    return failures
+
+def use_kernels(impl):
+    """Points the src.kernels functions (looked up at call time by World, Renderer, ...) at impl."""
+    for name, func in impl.items():
+        setattr(kernels, name, func)
+
+def simulation_digest(birds, pixels, humans, frames, settings):
+    """Hash of every frame's LED colours from a seeded Scenario (with some birds chirping, flocking and strip avoidance on)."""
+    scenario = Scenario(birds, pixels, humans, settings)
+    scenario.world.flocking = Flocking(MODEL_SIZE, {'enabled': True})
+    scenario.world.strip_avoidance = StripAvoidance({'enabled': True})
+    digest = hashlib.sha1()
+    for frame in range(frames):
+        scenario.world.update_humans(generate_detections(humans, frame))
+        scenario.world.update(scenario.pixel_model_positions)
+        scenario.renderer.calculate_pixel_colors(scenario.world)
+        digest.update(scenario.renderer.get_final_colors().tobytes())
+        digest.update(scenario.world.snapshot.bird_position.tobytes())
+    return digest.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the NumPy kernels match the reference loops bit for bit.")
+    parser.add_argument('--frames', type=int, default=60, help="Frames of the seeded simulation (the reference loops are slow).")
+    args = parser.parse_args()
+    pygame.init()
+
+    print("--- Kernels vs. reference loops ---")
+    failures = check_kernels([(1, 10), (2, 5), (16, 400), (200, 2000)])
+
+    print("--- Seeded simulation (LED colours and bird positions of every frame) ---")
+    settings = {'view_width': VIEW_SIZE[0], 'view_height': VIEW_SIZE[1], 'global_brightness': 0.8, 'min_brightness_falloff': 0.4}
+    digests = {}
+    for name, impl in (('numpy', KERNELS), ('loops', REFERENCE)):
+        use_kernels(impl)
+        digests[name] = simulation_digest(64, 1000, 5, args.frames, settings)
+        print(f"  {name:6s} {digests[name]}")
+    use_kernels(KERNELS)
+    if len(set(digests.values())) > 1:
+        failures += 1
+        print("  MISMATCH between the kernels and the reference loops")
+
+    print("OK: the kernels match the reference loops." if not failures else f"FAILED: {failures} mismatches.")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
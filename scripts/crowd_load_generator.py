@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import yaml
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from src.crowd_simulator import CrowdSimulator
+
+# UdpInputSource は recvfrom(2048) で受信するため、1パケットに載せられる検出数には上限がある
+MAX_OBJECTS_PER_PACKET = 2048 // 12
+
+def parse_args(settings):
+    udp = settings.get('udp_settings', {})
+    parser = argparse.ArgumentParser(description="Streams synthetic crowd detections to UdpInputSource for load testing.")
+    parser.add_argument('--host', default=udp.get('host', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=udp.get('port', 9999))
+    parser.add_argument('--rate', type=float, default=30.0, help="Frames per second to send (LiDAR rate).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=0.0, help="Seconds to run. 0 = until Ctrl+C.")
+    parser.add_argument('--max-people', type=int, default=20)
+    parser.add_argument('--arrival-rate', type=float, default=0.5, help="Mean arrivals per second.")
+    parser.add_argument('--mean-stay', type=float, default=90.0, help="Mean seconds a visitor stays.")
+    parser.add_argument('--walk-speed', type=float, default=0.8, help="Mean walking speed in m/s.")
+    parser.add_argument('--stop-probability', type=float, default=0.05, help="Chance per second to stop and watch.")
+    parser.add_argument('--gesture-probability', type=float, default=0.1, help="Chance per second to spread arms while stopped.")
+    parser.add_argument('--noise', type=float, default=0.02, help="Position noise std in meters.")
+    parser.add_argument('--dropout', type=float, default=0.02, help="Per-detection chance of being missed in a frame.")
+    parser.add_argument('--ramp', type=float, default=0.0,
+                        help="If > 0, raise --max-people by one every RAMP seconds to find where the receiver falls behind.")
+    return parser.parse_args()
+
+def main():
+    with open(os.path.join(PROJECT_ROOT, "settings.yaml"), 'r', encoding='utf-8') as f:
+        settings = yaml.safe_load(f)
+    args = parse_args(settings)
+
+    crowd_config = {
+        'max_pedestrians': args.max_people,
+        'arrival_rate': args.arrival_rate,
+        'mean_stay': args.mean_stay,
+        'walk_speed': args.walk_speed,
+        'stop_probability': args.stop_probability,
+        'gesture_probability': args.gesture_probability,
+        'position_noise': args.noise,
+        'dropout_probability': args.dropout,
+    }
+    crowd = CrowdSimulator((settings['model_width'], settings['model_height']), crowd_config, seed=args.seed)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (args.host, args.port)
+    frame_interval = 1.0 / args.rate
+
+    print(f"--- Crowd load generator -> udp://{args.host}:{args.port} at {args.rate:.0f} Hz (seed={args.seed}) ---")
+    print("Press Ctrl+C to stop.")
+
+    start = time.perf_counter()
+    next_frame = start
+    next_report = start + 1.0
+    next_ramp = start + args.ramp if args.ramp > 0 else None
+    frames_sent, late_frames, truncated = 0, 0, 0
+    try:
+        while args.duration <= 0 or time.perf_counter() - start < args.duration:
+            detections = crowd.step(frame_interval)
+            if len(detections) > MAX_OBJECTS_PER_PACKET:
+                detections = detections[:MAX_OBJECTS_PER_PACKET]
+                truncated += 1
+            sock.sendto(detections.tobytes(), target)
+            frames_sent += 1
+
+            now = time.perf_counter()
+            if next_ramp is not None and now >= next_ramp:
+                crowd.max_pedestrians += 1
+                next_ramp += args.ramp
+
+            if now >= next_report:
+                print(f"[{now - start:7.1f}s] people={len(crowd.pedestrians):3d}/{crowd.max_pedestrians:3d} "
+                      f"sent={frames_sent} late={late_frames} truncated={truncated}")
+                next_report += 1.0
+
+            # 絶対時刻でスケジュールし、送信レートがドリフトしないようにする
+            next_frame += frame_interval
+            sleep_time = next_frame - time.perf_counter()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                late_frames += 1
+    except KeyboardInterrupt:
+        print("\nStopping generator.")
+    finally:
+        # 空のパケットを送って、受信側の最後の検出をクリアする
+        sock.sendto(b"", target)
+        sock.close()
+
+if __name__ == '__main__':
+    main()
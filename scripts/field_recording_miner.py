@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+import numpy as np
+import soundfile as sf
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from audio_sync_generator import ANALYSIS_PARAMS, onsets_to_events
+
+# 長時間のフィールド録音をブロック単位で読み、鳴き声らしい区間を切り出す。
+# メモリ使用量はブロック長と最大クリップ長だけで決まり、ファイルの長さには依存しない。
+MINER_PARAMS = {
+    'frame_length': 2048,
+    'hop_length': 512,
+    'block_seconds': 10.0,
+    'threshold_db': 12.0,        # ノイズフロアからこれだけ大きければ鳴き声の候補
+    'floor_rise_seconds': 5.0,   # ノイズフロアが上がる速さ (下がる時は即座に追従)
+    'min_floor_db': -80.0,       # 無音 (デジタルゼロ) でフロアが下がりすぎないようにする
+    'pre_roll': 0.2,             # 区間の前に付ける余白 [s]
+    'hangover': 0.4,             # これだけ静かな状態が続いたら区間を閉じる [s]
+    'min_duration': 0.3,
+    'max_duration': 8.0,
+    'onset_sensitivity': 1.5,    # オンセット: 区間内のフラックス平均 + 標準偏差 x この値
+}
+
+class ChirpSegmenter:
+    """Frame-by-frame energy gate with an adaptive noise floor. Holds at most one clip in memory."""
+    def __init__(self, sr, params, on_segment):
+        self.sr = sr
+        self.params = params
+        self.on_segment = on_segment
+        self.hop = params['hop_length']
+        frames_per_second = sr / self.hop
+        self.hangover_frames = int(params['hangover'] * frames_per_second)
+        self.max_frames = int(params['max_duration'] * frames_per_second)
+        self.floor_rise = 1.0 / (params['floor_rise_seconds'] * frames_per_second)
+
+        self.noise_floor_db = None
+        self.history = deque(maxlen=max(int(params['pre_roll'] * frames_per_second), 1)) # pre-roll用
+        self.active = False
+        self.quiet_frames = 0
+        self.clip_chunks, self.clip_flux, self.clip_db = [], [], []
+        self.clip_start_frame = 0
+
+    def process_frame(self, frame_index, chunk, rms_db, flux):
+        if self.noise_floor_db is None:
+            self.noise_floor_db = max(rms_db, self.params['min_floor_db'])
+        is_loud = rms_db > self.noise_floor_db + self.params['threshold_db']
+
+        if not self.active:
+            # 静かな間だけノイズフロアを更新する
+            if rms_db < self.noise_floor_db:
+                self.noise_floor_db = max(rms_db, self.params['min_floor_db'])
+            else:
+                self.noise_floor_db += (rms_db - self.noise_floor_db) * self.floor_rise
+            if is_loud:
+                self.active = True
+                self.quiet_frames = 0
+                self.clip_start_frame = frame_index - len(self.history)
+                self.clip_chunks = [c for c, _, _ in self.history]
+                self.clip_flux = [f for _, f, _ in self.history]
+                self.clip_db = [d for _, _, d in self.history]
+                self.history.clear()
+            else:
+                self.history.append((chunk, flux, rms_db))
+                return
+
+        self.clip_chunks.append(chunk)
+        self.clip_flux.append(flux)
+        self.clip_db.append(rms_db)
+        self.quiet_frames = 0 if is_loud else self.quiet_frames + 1
+        if self.quiet_frames >= self.hangover_frames:
+            self.flush()
+        elif len(self.clip_chunks) >= self.max_frames:
+            # 最大長まで鳴り続けた = 背景音が大きくなった可能性が高い。フロアを区間の中央値まで引き上げる
+            self.noise_floor_db = max(self.noise_floor_db, float(np.median(self.clip_db)))
+            self.flush()
+
+    def flush(self):
+        if self.active and len(self.clip_chunks) * self.hop >= self.params['min_duration'] * self.sr:
+            self.on_segment(self.clip_start_frame * self.hop / self.sr,
+                            np.concatenate(self.clip_chunks),
+                            np.array(self.clip_flux),
+                            np.array(self.clip_db))
+        self.active = False
+        self.clip_chunks, self.clip_flux, self.clip_db = [], [], []
+
+def envelope_for_clip(flux, clip_duration, sr, params):
+    """Light keyframes for a clip, in the same format as the chirp patterns in config/."""
+    threshold = flux.mean() + flux.std() * params['onset_sensitivity']
+    peaks = (flux[1:-1] > threshold) & (flux[1:-1] >= flux[:-2]) & (flux[1:-1] > flux[2:])
+    onset_times = (np.nonzero(peaks)[0] + 1) * params['hop_length'] / sr
+    return onsets_to_events(onset_times, clip_duration, ANALYSIS_PARAMS)
+
+def mine_recording(path, out_dir, params=MINER_PARAMS):
+    info = sf.info(path)
+    sr = info.samplerate
+    n_fft, hop = params['frame_length'], params['hop_length']
+    frames_per_block = max(int(params['block_seconds'] * sr / hop), 1)
+    window = np.hanning(n_fft).astype(np.float32)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    clip_dir = os.path.join(out_dir, "clips")
+    os.makedirs(clip_dir, exist_ok=True)
+    segments = []
+
+    def on_segment(start_time, samples, flux, db):
+        duration = len(samples) / sr
+        clip_name = f"{stem}_{start_time:09.2f}.wav"
+        sf.write(os.path.join(clip_dir, clip_name), samples, sr)
+        segments.append({
+            'clip': os.path.join("clips", clip_name),
+            'start': round(start_time, 3),
+            'duration': round(duration, 3),
+            'peak_db': round(float(db.max()), 1),
+            'envelope': envelope_for_clip(flux, duration, sr, params),
+        })
+        print(f"  [chirp] {start_time:9.2f}s  {duration:5.2f}s  peak {db.max():6.1f} dB -> {clip_name}")
+
+    segmenter = ChirpSegmenter(sr, params, on_segment)
+    prev_spectrum = None
+    frame_index = 0
+    wall_start = time.perf_counter()
+    next_report = 60.0
+
+    # ブロック同士を (frame_length - hop) だけ重ねて、フレームが境界で途切れないようにする
+    for block in sf.blocks(path, blocksize=frames_per_block * hop + n_fft - hop, overlap=n_fft - hop,
+                           dtype='float32', always_2d=True):
+        mono = block.mean(axis=1)
+        if len(mono) < n_fft:
+            break
+        frames = np.lib.stride_tricks.sliding_window_view(mono, n_fft)[::hop]
+        rms_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        previous = np.vstack([spectrum[:1] if prev_spectrum is None else prev_spectrum, spectrum[:-1]])
+        flux = np.maximum(spectrum - previous, 0.0).sum(axis=1)
+        prev_spectrum = spectrum[-1:]
+
+        for i in range(len(frames)):
+            segmenter.process_frame(frame_index, mono[i * hop:(i + 1) * hop], rms_db[i], flux[i])
+            frame_index += 1
+
+        audio_seconds = frame_index * hop / sr
+        if audio_seconds >= next_report:
+            elapsed = time.perf_counter() - wall_start
+            print(f"  ... {audio_seconds:8.0f}s of audio, {audio_seconds / elapsed:6.1f} s/s, {len(segments)} chirps")
+            next_report += 60.0
+
+    segmenter.flush()
+    elapsed = time.perf_counter() - wall_start
+    audio_seconds = frame_index * hop / sr
+
+    index_path = os.path.join(out_dir, f"{stem}_segments.json")
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': path, 'sample_rate': sr, 'params': params, 'segments': segments}, f, indent=1)
+
+    print(f"\nFound {len(segments)} chirp candidates in {audio_seconds:.1f}s of audio.")
+    print(f"Throughput: {audio_seconds / max(elapsed, 1e-9):.1f} seconds of audio per second ({elapsed:.1f}s wall).")
+    print(f"Index written to '{index_path}'")
+    return segments
+
+def main():
+    parser = argparse.ArgumentParser(description="Finds chirp candidates in long field recordings with bounded memory.")
+    parser.add_argument('recordings', nargs='+', help="Audio files (wav, flac, ogg, mp3).")
+    parser.add_argument('--out', default=os.path.join(PROJECT_ROOT, "assets", "sounds", "mined"))
+    parser.add_argument('--threshold-db', type=float, default=MINER_PARAMS['threshold_db'])
+    parser.add_argument('--block-seconds', type=float, default=MINER_PARAMS['block_seconds'])
+    parser.add_argument('--max-duration', type=float, default=MINER_PARAMS['max_duration'])
+    args = parser.parse_args()
+
+    params = dict(MINER_PARAMS, threshold_db=args.threshold_db, block_seconds=args.block_seconds, max_duration=args.max_duration)
+    for path in args.recordings:
+        print(f"--- Mining '{path}' ---")
+        mine_recording(path, args.out, params)
+
+if __name__ == '__main__':
+    main()
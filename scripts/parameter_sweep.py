@@ -0,0 +1,273 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import datetime
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 画面・音声なしで実行する (ミキサーがないので、鳥は光の長さだけ鳴く: main_offline.py と同じ)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # ワーカーごとに pygame の挨拶を出さない
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+import numpy as np
+import yaml
+from config.config import BIRD_PARAMS
+from src.objects import Bird, BIRD_STATES, BIRD_STATE_CODES
+from src.audio_scheduler import AudioScheduler
+from src.simulation import World, FrameClock
+from src.crowd_simulator import CrowdSimulator
+from src.recording import FrameLog, KIND_INPUT
+from src.flocking import Flocking
+from src.strip_avoidance import StripAvoidance
+
+FPS = 60
+CHIRPING = BIRD_STATE_CODES["CHIRPING"]
+CHIRP_PROBABILITY = 'chirp_probability_per_frame' # ai_tuning の値。それ以外の名前は鳥のパラメーター
+
+# --- Parameter space ---
+
+def parse_param(spec):
+    """
+    'name=v1,v2,...' (grid values) or 'name=lo:hi' (uniform range, random sampling only).
+    name is chirp_probability_per_frame, a bird parameter (all birds) or species.parameter (one species).
+    """
+    name, sep, values = spec.partition('=')
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,... or name=lo:hi, got '{spec}'")
+    key = name.split('.')[-1]
+    if key != CHIRP_PROBABILITY and not any(key in params for params in BIRD_PARAMS.values()):
+        raise argparse.ArgumentTypeError(f"unknown parameter '{key}'")
+    if '.' in name and name.split('.')[0] not in BIRD_PARAMS:
+        raise argparse.ArgumentTypeError(f"unknown species '{name.split('.')[0]}'")
+    try:
+        if ':' in values:
+            low, high = (float(v) if '.' in v or 'e' in v else int(v) for v in values.split(':'))
+            return name, ('range', low, high)
+        return name, ('values', [float(v) if '.' in v or 'e' in v else int(v) for v in values.split(',')])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad number in '{spec}'")
+
+def build_cases(params, samples, seed):
+    """Returns a list of {name: value} dicts: the full grid, or `samples` random points if samples > 0."""
+    if not params:
+        return [{}]
+    names = [name for name, _ in params]
+    if samples <= 0:
+        for name, (kind, *_) in params:
+            if kind == 'range':
+                raise SystemExit(f"'{name}' is a range: use --samples N for random sampling, or list the values.")
+        return [dict(zip(names, combo)) for combo in itertools.product(*(values for _, (_, values) in params))]
+
+    rng = np.random.default_rng(seed)
+    cases = []
+    for _ in range(samples):
+        case = {}
+        for name, spec in params:
+            if spec[0] == 'values':
+                case[name] = spec[1][rng.integers(len(spec[1]))]
+            elif isinstance(spec[1], int) and isinstance(spec[2], int):
+                case[name] = int(rng.integers(spec[1], spec[2] + 1))
+            else:
+                case[name] = float(rng.uniform(spec[1], spec[2]))
+        cases.append(case)
+    return cases
+
+# --- Input trace (the same for every run) ---
+
+def load_trace(settings, input_path, duration, crowd_seed):
+    """Returns (counts, detections): detections of frame i are detections[offsets[i]:offsets[i] + counts[i]]."""
+    frames = []
+    if input_path:
+        log = FrameLog(input_path)
+        total = log.count(KIND_INPUT)
+        if duration is not None:
+            total = min(total, int(duration * FPS))
+        frames = [np.array(log.input_frame(i), dtype=np.float32) for i in range(total)]
+        log.close()
+        print(f"Input trace: {total} frames from '{input_path}'.")
+    else:
+        model_size = (settings['model_width'], settings['model_height'])
+        crowd = CrowdSimulator(model_size, settings.get('offline', {}).get('crowd', {}), seed=crowd_seed)
+        frames = [crowd.step(1.0 / FPS) for _ in range(int(duration * FPS))]
+        print(f"Input trace: {len(frames)} frames of a synthetic crowd (seed={crowd_seed}).")
+    counts = np.array([len(frame) for frame in frames], dtype=np.int64)
+    detections = np.concatenate(frames).astype(np.float32) if frames else np.empty((0, 3), dtype=np.float32)
+    return counts, detections.reshape(-1, 3)
+
+# --- Worker ---
+
+_worker = {}
+
+def _init_worker(settings, pixel_model_positions, counts, detections):
+    # 設定・レイアウト・入力はワーカーごとに一度だけ受け取る
+    _worker.update(settings=settings, pixel_model_positions=pixel_model_positions, counts=counts, detections=detections,
+                   offsets=np.concatenate([[0], np.cumsum(counts)]))
+
+def run_case(run_id, case, seed):
+    """Simulates one deterministic World over the trace and returns its metrics row."""
+    settings = _worker['settings']
+    counts, detections, offsets = _worker['counts'], _worker['detections'], _worker['offsets']
+    chirp_probability = case.get(CHIRP_PROBABILITY, settings.get('ai_tuning', {}).get(CHIRP_PROBABILITY, 0.001))
+
+    rng = np.random.default_rng(seed)
+    birds = []
+    for bird_id in settings.get('birds_to_simulate', []):
+        if bird_id not in BIRD_PARAMS:
+            continue
+        params = dict(BIRD_PARAMS[bird_id])
+        for name, value in case.items():
+            species, _, key = name.rpartition('.')
+            if key != CHIRP_PROBABILITY and species in ('', bird_id):
+                params[key] = value
+        birds.append(Bird(bird_id, params, chirp_probability, rng=rng))
+    world = World(model_size=(settings['model_width'], settings['model_height']), birds=birds, rng=rng,
+                  audio_scheduler=AudioScheduler(settings.get('audio', {})), clock=FrameClock(FPS),
+                  flocking=Flocking((settings['model_width'], settings['model_height']), settings.get('flocking', {})),
+                  strip_avoidance=StripAvoidance(settings.get('strip_avoidance', {})))
+
+    num_birds = len(birds)
+    half_span = np.array([bird.base_pixel_count // 2 for bird in birds]) # 通常時に光る幅の半分 [ピクセル]
+    reach = half_span[:, None] + half_span[None, :]
+    upper = np.triu(np.ones((num_birds, num_birds), dtype=bool), k=1)
+    was_overlapping = np.zeros((num_birds, num_birds), dtype=bool)
+    was_chirping = np.zeros(num_birds, dtype=bool)
+    state_frames = np.zeros(len(BIRD_STATES), dtype=np.int64)
+    overlap_events = chirp_overlap_events = overlap_frames = chirps = 0
+    spacing_sum = 0.0
+
+    started = time.perf_counter()
+    pixel_model_positions = _worker['pixel_model_positions']
+    for frame in range(len(counts)):
+        world.update_humans(detections[offsets[frame]:offsets[frame + 1]])
+        world.update(pixel_model_positions)
+        if num_birds < 2:
+            continue
+
+        # LEDテープ上の位置は、鳥が縄張りの判断に使ったもの (World.pixel_centers) で数える
+        centers = np.asarray(world.pixel_centers)
+        states = world.snapshot.bird_state
+        chirping = states == CHIRPING
+
+        # 光る範囲 [c - s, c + s] が重なり始めた組を1回と数える (鳴いている鳥がいれば色が混ざる)。
+        # 境目で1ピクセルずつ揺れる組を何度も数えないよう、離れたとみなすのは1ピクセル余分に離れてから
+        distance = np.abs(centers[:, None] - centers[None, :])
+        overlapping = ((distance <= reach) | (was_overlapping & (distance <= reach + 1))) & upper
+        new_overlaps = overlapping & ~was_overlapping
+        overlap_events += int(new_overlaps.sum())
+        chirp_overlap_events += int((new_overlaps & (chirping[:, None] | chirping[None, :])).sum())
+        overlap_frames += bool(overlapping.any())
+        was_overlapping = overlapping
+
+        chirps += int((chirping & ~was_chirping).sum())
+        was_chirping = chirping
+        state_frames += np.bincount(states, minlength=len(BIRD_STATES))
+
+        # テープ上で一番近い鳥までの距離 [ピクセル] の平均
+        gaps = np.diff(np.sort(centers))
+        nearest = np.empty(num_birds)
+        nearest[0], nearest[-1] = gaps[0], gaps[-1]
+        np.minimum(gaps[:-1], gaps[1:], out=nearest[1:-1])
+        spacing_sum += float(nearest.mean())
+
+    frames = max(len(counts), 1)
+    minutes = frames / FPS / 60.0
+    row = {'run': run_id, 'seed': seed, **case,
+           'overlap_events_per_min': overlap_events / minutes,
+           'chirp_overlap_events_per_min': chirp_overlap_events / minutes,
+           'overlap_frame_fraction': overlap_frames / frames,
+           'chirps_per_min': chirps / minutes,
+           'mean_strip_spacing': spacing_sum / frames}
+    bird_frames = max(int(state_frames.sum()), 1)
+    for code, state in enumerate(BIRD_STATES):
+        row[f'frac_{state.lower()}'] = float(state_frames[code]) / bird_frames
+    row['seconds'] = time.perf_counter() - started
+    return row
+
+# --- Main ---
+
+def write_table(path, rows, columns):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_table(rows, columns, limit):
+    def cell(value):
+        return f"{value:.4g}" if isinstance(value, float) else str(value)
+    shown = [[cell(row.get(column, '')) for column in columns] for row in rows[:limit]]
+    widths = [max(len(column), *(len(line[i]) for line in shown)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in shown:
+        print("  ".join(value.rjust(width) for value, width in zip(line, widths)))
+
+def main():
+    with open(os.path.join(PROJECT_ROOT, "settings.yaml"), 'r', encoding='utf-8') as f:
+        settings = yaml.safe_load(f)
+    sweep_settings = settings.get('sweep', {})
+
+    parser = argparse.ArgumentParser(
+        description="Runs many deterministic Worlds over the same input trace with different parameters, in parallel, "
+                    "and tabulates strip overlaps, chirp rate, strip spacing and time spent in each state.")
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=VALUES',
+                        help="Swept parameter: 'caution_distance=1.0,1.5,2.0', 'kumagera.pixel_personal_space=3:8' "
+                             "(range, with --samples) or 'chirp_probability_per_frame=0.0005,0.001'. Repeat for more axes.")
+    parser.add_argument('--samples', type=int, default=0, help="Random sample of N points instead of the full grid.")
+    parser.add_argument('--sample-seed', type=int, default=0, help="Seed for drawing the random sample.")
+    parser.add_argument('--seeds', default="0", help="Comma-separated World seeds; every point runs once per seed.")
+    parser.add_argument('--input', default=None, help="Recorded .tklog to replay. Without it a synthetic crowd is used.")
+    parser.add_argument('--crowd-seed', type=int, default=0, help="Seed of the synthetic crowd trace.")
+    parser.add_argument('--minutes', type=float, default=sweep_settings.get('duration_minutes', 10),
+                        help="Simulated minutes per run (default: sweep.duration_minutes; with --input, at most the log).")
+    parser.add_argument('--workers', type=int, default=sweep_settings.get('workers') or os.cpu_count())
+    parser.add_argument('--sort', default='overlap_events_per_min', help="Metric column to sort the printed table by.")
+    parser.add_argument('--top', type=int, default=20, help="Rows to print (the CSV has all of them).")
+    parser.add_argument('--out', default=None, help="CSV path (default: under sweep.output_directory).")
+    args = parser.parse_args()
+
+    cases = build_cases(args.param, args.samples, seed=args.sample_seed)
+    seeds = [int(seed) for seed in args.seeds.split(',')]
+    jobs = [(case, seed) for case in cases for seed in seeds]
+
+    all_led_positions = np.loadtxt(os.path.join(PROJECT_ROOT, "assets", "data", settings['led_layout_file']), delimiter=',', skiprows=1)
+    num_pixels = settings['num_leds'] // 3
+    pixel_model_positions = all_led_positions[:num_pixels * 3].reshape(num_pixels, 3, 2).mean(axis=1)
+    counts, detections = load_trace(settings, args.input, args.minutes * 60.0, args.crowd_seed)
+
+    out_path = args.out or os.path.join(PROJECT_ROOT, sweep_settings.get('output_directory', 'recordings/sweeps'),
+                                        datetime.datetime.now().strftime("sweep_%Y%m%d_%H%M%S.csv"))
+    run_minutes = len(counts) / FPS / 60.0
+    print(f"--- Parameter sweep: {len(jobs)} runs x {run_minutes:.1f} min on {args.workers} workers ---")
+
+    rows = []
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(settings, pixel_model_positions, counts, detections)) as pool:
+        futures = [pool.submit(run_case, run_id, case, seed) for run_id, (case, seed) in enumerate(jobs)]
+        for done, future in enumerate(as_completed(futures), 1):
+            rows.append(future.result())
+            elapsed = time.perf_counter() - wall_start
+            if done == len(futures) or done % max(len(futures) // 20, 1) == 0:
+                simulated = done * run_minutes
+                print(f"  {done}/{len(futures)} runs, {simulated:.0f} min simulated in {elapsed:.1f}s "
+                      f"({simulated * 60.0 / elapsed:.0f}x realtime)")
+
+    rows.sort(key=lambda row: row['run'])
+    param_columns = [name for name, _ in args.param]
+    metric_columns = [column for column in rows[0] if column not in param_columns and column not in ('run', 'seed')]
+    write_table(out_path, rows, ['run', 'seed'] + param_columns + metric_columns)
+    print(f"Results for {len(rows)} runs written to '{out_path}'")
+
+    if args.sort in rows[0]:
+        rows.sort(key=lambda row: row[args.sort])
+    summary = ['run', 'seed'] + param_columns + ['overlap_events_per_min', 'chirp_overlap_events_per_min',
+                                                 'chirps_per_min', 'mean_strip_spacing', 'frac_idle', 'frac_chirping']
+    print_table(rows, summary, args.top)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# src/async_runtime.py
+import asyncio
+import signal
+import pygame
+
+class AsyncRuntime:
+    """
+    asyncio 版のメインループ (main_real.py --runtime asyncio)。
+
+    - tick: 締め切り (deadline) で刻むシミュレーションのタスク。入力 → World → 色 → シリアル/記録/共有
+    - serial: AsyncSerialWriter.run() (接続中のリセット待ちもループを止めない)
+    - preview: ウィンドウの描画とイベント処理、または別プロセスのプレビューの監視 (任意)
+    UDP 入力は AsyncUdpInputSource が受信した瞬間にイベントループ上で処理する。
+    Ctrl+C / SIGTERM / ウィンドウを閉じると全タスクを取り消し、順番に後片付けする。
+    """
+    def __init__(self, world, renderer, input_source, serial_writer, pixel_model_positions, fps=60,
+                 screen=None, preview_fps=30, snapshot_ring=None, preview_process=None, recorder=None, frame_timer=None,
+                 hot_reloader=None, checkpointer=None, startup_report=None):
+        self.world = world
+        self.renderer = renderer
+        self.input_source = input_source
+        self.serial_writer = serial_writer
+        self.pixel_model_positions = pixel_model_positions
+        self.period = 1.0 / fps
+        self.screen = screen
+        self.preview_period = 1.0 / preview_fps
+        self.snapshot_ring = snapshot_ring
+        self.preview_process = preview_process
+        self.recorder = recorder
+        self.frame_timer = frame_timer
+        self.hot_reloader = hot_reloader
+        self.checkpointer = checkpointer
+        self.startup_report = startup_report # 最初のフレームの後に起動時間の内訳を表示する (任意)
+        self.frames = 0
+        self.late_ticks = 0 # 締め切りに間に合わず飛ばしたティック数
+        self.stop_event = None
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        world, renderer, timer = self.world, self.renderer, self.frame_timer
+        deadline = loop.time()
+        while True:
+            deadline += self.period
+            timer.start_frame()
+            if self.hot_reloader is not None:
+                self.hot_reloader.apply_pending()
+            if self.checkpointer is not None:
+                self.checkpointer.maybe_save()
+            detected_objects = self.input_source.get_detected_objects()
+            timer.lap('input')
+            world.update_humans(detected_objects)
+            timer.lap('humans')
+            world.update(self.pixel_model_positions)
+            timer.lap('world')
+            renderer.calculate_pixel_colors(world.snapshot)
+            timer.lap('colors')
+
+            final_colors = renderer.get_final_colors()
+            self.serial_writer.send(final_colors)
+            if self.recorder:
+                self.recorder.record_leds(final_colors)
+            if self.snapshot_ring is not None:
+                self.snapshot_ring.publish(world.snapshot, renderer)
+            timer.lap('output')
+            self.frames += 1
+            if self.frames == 1 and self.startup_report is not None:
+                self.startup_report.mark("first frame")
+                self.startup_report.print_report()
+
+            # 次の締め切りまで眠る。1ティック以上遅れたら追いつこうとせず、今から数え直す
+            now = loop.time()
+            if now - deadline > self.period:
+                self.late_ticks += int((now - deadline) / self.period)
+                deadline = now
+            await asyncio.sleep(max(deadline - now, 0.0))
+            timer.lap('tick')
+            timer.end_frame()
+
+    async def _preview_loop(self):
+        while True:
+            if self.screen is not None:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.stop()
+                self.renderer.draw(self.screen, self.world.snapshot, self.frame_timer.overlay_lines())
+            elif self.preview_process is not None:
+                self.preview_process.check()
+            await asyncio.sleep(self.preview_period)
+
+    def _install_signal_handlers(self, loop):
+        installed = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+                installed.append(sig)
+            except (NotImplementedError, RuntimeError):
+                pass # Windows など: Ctrl+C は asyncio.run がメインタスクの取り消しとして扱う
+        return installed
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        signals = self._install_signal_handlers(loop)
+        await self.input_source.start()
+
+        # シリアルが繋がらなくてもショーは続ける (従来のスレッドと同じ)。異常終了だけ知らせる
+        serial_task = asyncio.create_task(self.serial_writer.run(), name="serial")
+        serial_task.add_done_callback(
+            lambda task: task.cancelled() or task.exception() is None or print(f"ERROR: serial task failed: {task.exception()!r}"))
+        tasks = [asyncio.create_task(self._tick_loop(), name="tick")]
+        if self.screen is not None or self.preview_process is not None:
+            tasks.append(asyncio.create_task(self._preview_loop(), name="preview"))
+        stopper = asyncio.create_task(self.stop_event.wait(), name="stop")
+
+        error = None
+        try:
+            done, _ = await asyncio.wait(tasks + [stopper], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stopper and not task.cancelled() and task.exception() is not None:
+                    error = task.exception()
+        finally:
+            # 取り消し → 全タスクの終了を待つ → 入出力を閉じる
+            for task in tasks + [stopper, serial_task]:
+                task.cancel()
+            await asyncio.gather(*tasks, stopper, serial_task, return_exceptions=True)
+            self.input_source.shutdown()
+            self.serial_writer.close()
+            for sig in signals:
+                loop.remove_signal_handler(sig)
+        print(f"Async runtime stopped after {self.frames} frames ({self.late_ticks} late ticks skipped, "
+              f"{self.serial_writer.dropped_frames} serial frames dropped).")
+        if error is not None:
+            raise error
@@ -0,0 +1,59 @@
+# src/audio_cache.py
+import os
+import hashlib
+import numpy as np
+import pygame
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, "assets", "sounds", ".pcm_cache")
+
+def mixer_signature():
+    """Returns (frequency, format, channels) of the initialized mixer, or None."""
+    return pygame.mixer.get_init()
+
+def cache_path(sound_path, signature):
+    """
+    デコード済みPCMのキャッシュファイルのパス。
+    音声ファイルの内容ハッシュとミキサーの設定をキーにするので、
+    音声の差し替えやミキサー設定の変更で古いキャッシュが使われることはない。
+    """
+    with open(sound_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+    frequency, fmt, channels = signature
+    name = os.path.splitext(os.path.basename(sound_path))[0]
+    return os.path.join(CACHE_DIR, f"{name}_{digest}_{frequency}_{fmt}_{channels}.npy")
+
+def load_cached_sound(sound_path):
+    """Builds a Sound directly from the cached PCM buffer. Returns None on a cache miss."""
+    signature = mixer_signature()
+    if signature is None:
+        return None
+    path = cache_path(sound_path, signature)
+    if not os.path.exists(path):
+        return None
+    samples = np.load(path, mmap_mode='r')
+    return pygame.mixer.Sound(buffer=samples)
+
+def store_cached_sound(sound_path, sound):
+    """Writes the decoded samples of sound to the cache (atomically)."""
+    path = cache_path(sound_path, mixer_signature())
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, pygame.sndarray.array(sound))
+    os.replace(tmp_path, path)
+    return path
+
+def load_sound(sound_path):
+    """
+    Loads a Sound, preferring the PCM cache. On a miss the file is decoded
+    normally and the result is written back, so the next start is fast.
+    """
+    sound = load_cached_sound(sound_path)
+    if sound is not None:
+        return sound
+    sound = pygame.mixer.Sound(sound_path)
+    try:
+        store_cached_sound(sound_path, sound)
+    except OSError as e:
+        print(f"WARNING: Could not write PCM cache for '{sound_path}': {e}")
+    return sound
@@ -0,0 +1,86 @@
+# src/audio_scheduler.py
+import numpy as np
+import pygame
+
+class AudioScheduler:
+    """
+    同時に鳴る鳴き声の数 (ボイス数) を固定し、ミキサーのチャンネルを明示的に割り当てる。
+    ボイスが足りない時は、より優先度の低い種の声を止めて鳴くか、鳴くのを諦める。
+    ボイスは鳥が鳴き終わるまでその鳥が所有するので、光 (CHIRPING) と音は常に一致する。
+    """
+    def __init__(self, config=None):
+        config = config or {}
+        self.num_voices = config.get('num_voices', 8)
+        self.species_priority = config.get('species_priority', {})
+        self.default_priority = config.get('default_priority', 1)
+
+        # 距離に応じた音量 (最寄りの来場者までの距離 [m])
+        self.full_volume_distance = config.get('full_volume_distance', 1.0)
+        self.min_volume_distance = config.get('min_volume_distance', 4.0)
+        self.min_volume = config.get('min_volume', 0.3)
+
+        # play() してから実際に音がスピーカーから出るまでの遅延 (ミキサーのバッファ分)
+        self.output_latency = config.get('output_latency_ms', 12) / 1000.0
+
+        # ミキサーがない場合 (ヘッドレス実行) でもボイス数の制約だけは同じように働かせる
+        # silent の時、鳥は音なしで光だけ鳴く (オフライン描画)
+        self.channels = [None] * self.num_voices
+        self.silent = not pygame.mixer.get_init()
+        if not self.silent:
+            pygame.mixer.set_num_channels(self.num_voices)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.num_voices)]
+        self.owners = [None] * self.num_voices # 各ボイスを使っている鳥
+
+    def priority_of(self, bird):
+        return self.species_priority.get(bird.id, self.default_priority)
+
+    def volume_for_distance(self, distance):
+        if distance <= self.full_volume_distance:
+            return 1.0
+        span = max(self.min_volume_distance - self.full_volume_distance, 1e-6)
+        t = min((distance - self.full_volume_distance) / span, 1.0)
+        return 1.0 + (self.min_volume - 1.0) * t
+
+    def _find_voice(self, bird):
+        """Returns a free voice index, preempting a lower-priority bird if needed. None if refused."""
+        for i, owner in enumerate(self.owners):
+            if owner is None:
+                return i
+
+        my_priority = self.priority_of(bird)
+        priorities = [self.priority_of(owner) for owner in self.owners]
+        victim = int(np.argmin(priorities))
+        if priorities[victim] >= my_priority:
+            return None
+
+        # 優先度の低い鳥の声を止め、その鳥の光も同時に終わらせる
+        if self.channels[victim] is not None:
+            self.channels[victim].stop()
+        self.owners[victim].end_chirp()
+        return victim
+
+    def request_voice(self, bird, sound, listener_distance, now):
+        """
+        Plays sound for bird if a voice can be granted. Returns the clock time at which
+        the sound becomes audible, or None if refused; the bird must call release()
+        when its chirp ends.
+        """
+        voice = self._find_voice(bird)
+        if voice is None:
+            return None
+
+        self.owners[voice] = bird
+        channel = self.channels[voice]
+        if channel is not None:
+            channel.play(sound)
+            channel.set_volume(self.volume_for_distance(listener_distance))
+        return now + self.output_latency
+
+    def release(self, bird):
+        for i, owner in enumerate(self.owners):
+            if owner is bird:
+                self.owners[i] = None
+
+    @property
+    def active_voices(self):
+        return sum(owner is not None for owner in self.owners)
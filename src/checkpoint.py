@@ -0,0 +1,135 @@
+# src/checkpoint.py
+import os
+import json
+import threading
+import time
+import zipfile
+import numpy as np
+from src.objects import BIRD_STATES, BIRD_STATE_CODES
+
+# World の状態 (鳥・来場者の追跡・乱数) を小さな .npz に保存し、再起動時に続きから始める。
+# 書き込みは一時ファイル → fsync → os.replace なので、途中で落ちても前回のファイルが残る。
+CHECKPOINT_VERSION = 1
+IDLE = BIRD_STATE_CODES["IDLE"]
+
+def capture_state(world):
+    """Copies the compact world state into a dict of arrays (cheap; call on the simulation thread)."""
+    birds, humans = world.birds, world.humans
+    states = np.array([BIRD_STATE_CODES.get(bird.state, IDLE) for bird in birds], dtype=np.uint8)
+    # 鳴き声の音は再起動をまたいで続けられないので、鳴いている鳥は IDLE として保存する
+    states[states == BIRD_STATE_CODES["CHIRPING"]] = IDLE
+    return {
+        'version': np.array(CHECKPOINT_VERSION),
+        'saved_at': np.array(time.time()),
+        'bird_id': np.array([bird.id for bird in birds], dtype=str),
+        'bird_position': np.array([bird.position for bird in birds], dtype=float).reshape(-1, 2),
+        'bird_velocity': np.array([bird.velocity for bird in birds], dtype=float).reshape(-1, 2),
+        'bird_target': np.array([bird.target_position for bird in birds], dtype=float).reshape(-1, 2),
+        'bird_state': states,
+        'bird_action_timer': np.array([bird.action_timer for bird in birds], dtype=np.int64),
+        'human_id': np.array([human.id for human in humans], dtype=np.int64),
+        'human_position': np.array([human.position for human in humans], dtype=float).reshape(-1, 2),
+        'human_velocity': np.array([human.velocity for human in humans], dtype=float).reshape(-1, 2),
+        'human_smooth_velocity': np.array([human.smooth_velocity for human in humans], dtype=float).reshape(-1, 2),
+        'human_size': np.array([human.size for human in humans], dtype=float),
+        'human_size_change': np.array([human.size_change for human in humans], dtype=float),
+        'next_human_id': np.array(world.next_human_id),
+        'rng_state': np.array(json.dumps(world.rng.bit_generator.state)),
+    }
+
+def write_checkpoint(path, state):
+    """Atomically replaces path with the given state."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **state)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def restore_state(world, state):
+    """
+    Puts a captured state back into world. Birds are matched by species in order, so a changed
+    cast still restores every bird that exists in both. Returns the number of birds restored.
+    """
+    saved = {}
+    for i, bird_id in enumerate(state['bird_id']):
+        saved.setdefault(str(bird_id), []).append(i)
+
+    restored = 0
+    for bird in world.birds:
+        indices = saved.get(bird.id)
+        if not indices:
+            continue # チェックポイントにない鳥は、新しく置かれた位置のまま
+        i = indices.pop(0)
+        bird.position = state['bird_position'][i].copy()
+        bird.velocity = state['bird_velocity'][i].copy()
+        bird.target_position = state['bird_target'][i].copy()
+        bird.state = BIRD_STATES[int(state['bird_state'][i])]
+        bird.action_timer = int(state['bird_action_timer'][i])
+        restored += 1
+
+    # 来場者の追跡 (まだいれば次のフレームでそのまま同じIDにマッチする)
+    world.restore_humans(zip(state['human_id'], state['human_position'], state['human_velocity'], state['human_smooth_velocity'],
+                             state['human_size'], state['human_size_change']), int(state['next_human_id']))
+
+    # 鳥は World と同じジェネレーターを共有しているので、これで全員の乱数が続きから引かれる
+    world.rng.bit_generator.state = json.loads(str(state['rng_state']))
+    world.refresh_profiles()
+    return restored
+
+def load_checkpoint(world, path, max_age_seconds=None):
+    """Restores world from path. Returns False (and leaves world alone) if it is missing, stale or unreadable."""
+    try:
+        with np.load(path) as data:
+            state = {key: data[key] for key in data.files}
+    except FileNotFoundError:
+        print(f"No checkpoint at '{path}'. Starting fresh.")
+        return False
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"WARNING: Could not read checkpoint '{path}' ({e}). Starting fresh.")
+        return False
+    if int(state.get('version', -1)) != CHECKPOINT_VERSION:
+        print(f"WARNING: Checkpoint '{path}' has an unknown version. Starting fresh.")
+        return False
+    age = time.time() - float(state['saved_at'])
+    if max_age_seconds is not None and age > max_age_seconds:
+        print(f"Checkpoint '{path}' is {age / 60.0:.0f} minutes old. Starting fresh.")
+        return False
+    restored = restore_state(world, state)
+    print(f"Resumed from checkpoint '{path}' ({age:.1f}s old): {restored}/{len(world.birds)} birds, {len(world.humans)} visitor tracks.")
+    return True
+
+class Checkpointer:
+    """
+    Saves the world every interval_seconds on a background thread (the frame only pays for the copy),
+    and once more, synchronously, on close().
+    """
+    def __init__(self, world, path, interval_seconds=10.0):
+        self.world = world
+        self.path = path
+        self.interval = interval_seconds
+        self.next_save = time.monotonic() + interval_seconds
+        self.thread = None
+
+    def maybe_save(self):
+        now = time.monotonic()
+        if now < self.next_save or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.next_save = now + self.interval
+        self.thread = threading.Thread(target=self._write, args=(capture_state(self.world),), name="checkpoint", daemon=True)
+        self.thread.start()
+
+    def _write(self, state):
+        try:
+            write_checkpoint(self.path, state)
+        except OSError as e:
+            print(f"WARNING: Could not write checkpoint '{self.path}': {e}")
+
+    def close(self):
+        if self.thread is not None:
+            self.thread.join()
+        self._write(capture_state(self.world))
+        print(f"Checkpoint saved to '{self.path}'")
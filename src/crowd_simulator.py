@@ -0,0 +1,120 @@
+import numpy as np
+
+class Pedestrian:
+    """A single synthetic visitor walking around the pond."""
+    def __init__(self, angle, radius, direction, speed, lifetime):
+        self.angle = angle          # 楕円上の位置（ラジアン）
+        self.radius = radius        # 楕円半径に対する比率 (1.0 = 池の縁)
+        self.direction = direction  # +1: 反時計回り, -1: 時計回り
+        self.speed = speed          # m/s
+        self.lifetime = lifetime    # 退場までの残り時間 (秒)
+        self.state = "WALKING"
+        self.state_timer = 0.0
+        self.size = 1.0
+        self.gesture_timer = 0.0
+
+class CrowdSimulator:
+    """
+    Simulates a crowd of visitors around the pond and produces [x, y, size]
+    detections in the same format as the LiDAR pipeline.
+    All randomness comes from a single seeded generator, so a given seed and
+    config always produce the same stream of frames.
+    """
+    def __init__(self, model_size, config=None, seed=None):
+        config = config or {}
+        self.model_radius_x = model_size[0] / 2.0
+        self.model_radius_y = model_size[1] / 2.0
+        self.rng = np.random.default_rng(seed)
+
+        # Crowd parameters
+        self.max_pedestrians = config.get('max_pedestrians', 20)
+        self.arrival_rate = config.get('arrival_rate', 0.5)          # 人/秒 (ポアソン到着)
+        self.mean_stay = config.get('mean_stay', 90.0)               # 平均滞在時間 (秒)
+        self.walk_speed = config.get('walk_speed', 0.8)              # m/s
+        self.walk_speed_std = config.get('walk_speed_std', 0.2)
+        self.rim_band = config.get('rim_band', (0.85, 1.05))         # 歩く位置（楕円半径比）の範囲
+        self.spawn_angles = config.get('spawn_angles', None)         # 入口の角度(度)。Noneなら縁上のどこでも
+        self.stop_probability = config.get('stop_probability', 0.05) # 1秒あたりの立ち止まる確率
+        self.stop_duration = config.get('stop_duration', (3.0, 15.0))
+        self.gesture_probability = config.get('gesture_probability', 0.1) # 立ち止まり中, 1秒あたり
+        self.gesture_duration = config.get('gesture_duration', 1.0)
+        self.base_size = config.get('base_size', 1.0)
+        self.gesture_size = config.get('gesture_size', 2.0)
+
+        # Sensor model
+        self.position_noise = config.get('position_noise', 0.02)     # m (標準偏差)
+        self.size_noise = config.get('size_noise', 0.05)
+        self.dropout_probability = config.get('dropout_probability', 0.02) # 1検出・1フレームあたり
+
+        self.pedestrians = []
+        self.time = 0.0
+
+    def _spawn(self):
+        if self.spawn_angles:
+            angle = np.deg2rad(self.rng.choice(self.spawn_angles))
+        else:
+            angle = self.rng.uniform(0, 2 * np.pi)
+        radius = self.rng.uniform(*self.rim_band)
+        direction = 1 if self.rng.random() < 0.5 else -1
+        speed = max(0.1, self.rng.normal(self.walk_speed, self.walk_speed_std))
+        lifetime = self.rng.exponential(self.mean_stay)
+        self.pedestrians.append(Pedestrian(angle, radius, direction, speed, lifetime))
+
+    def _step_pedestrian(self, p, dt):
+        p.lifetime -= dt
+
+        if p.state == "WALKING":
+            # 楕円の周長に沿って一定速度で進むよう、角速度に換算する
+            rx, ry = self.model_radius_x * p.radius, self.model_radius_y * p.radius
+            local_radius = np.hypot(rx * np.sin(p.angle), ry * np.cos(p.angle))
+            p.angle += p.direction * p.speed * dt / max(local_radius, 1e-3)
+            # 縁からの距離をゆっくり揺らす
+            p.radius = float(np.clip(p.radius + self.rng.normal(0, 0.01) * dt, *self.rim_band))
+            if self.rng.random() < self.stop_probability * dt:
+                p.state = "STOPPED"
+                p.state_timer = self.rng.uniform(*self.stop_duration)
+
+        elif p.state == "STOPPED":
+            p.state_timer -= dt
+            if p.gesture_timer <= 0 and self.rng.random() < self.gesture_probability * dt:
+                p.gesture_timer = self.gesture_duration
+            if p.state_timer <= 0:
+                p.state = "WALKING"
+
+        # 手を広げる動作: 検出サイズが一時的に大きくなる
+        if p.gesture_timer > 0:
+            p.gesture_timer -= dt
+            p.size = self.gesture_size
+        else:
+            p.size = self.base_size
+
+    def step(self, dt):
+        """Advances the crowd by dt seconds and returns the (N, 3) float32 detections."""
+        self.time += dt
+
+        # 1. 到着 (ポアソン過程)
+        for _ in range(self.rng.poisson(self.arrival_rate * dt)):
+            if len(self.pedestrians) < self.max_pedestrians:
+                self._spawn()
+
+        # 2. 移動と退場
+        for p in self.pedestrians:
+            self._step_pedestrian(p, dt)
+        self.pedestrians = [p for p in self.pedestrians if p.lifetime > 0]
+
+        if not self.pedestrians:
+            return np.empty((0, 3), dtype=np.float32)
+
+        # 3. センサーモデル (ノイズと検出漏れ)
+        angles = np.array([p.angle for p in self.pedestrians])
+        radii = np.array([p.radius for p in self.pedestrians])
+        sizes = np.array([p.size for p in self.pedestrians])
+        n = len(self.pedestrians)
+
+        detections = np.empty((n, 3), dtype=np.float32)
+        detections[:, 0] = radii * self.model_radius_x * np.cos(angles) + self.rng.normal(0, self.position_noise, n)
+        detections[:, 1] = radii * self.model_radius_y * np.sin(angles) + self.rng.normal(0, self.position_noise, n)
+        detections[:, 2] = sizes + self.rng.normal(0, self.size_noise, n)
+
+        visible = self.rng.random(n) >= self.dropout_probability
+        return detections[visible]
@@ -0,0 +1,95 @@
+# src/flocking.py
+import math
+import numpy as np
+from src import kernels
+
+class SpatialHash:
+    """
+    池 (楕円) を囲む長方形を一様なマス目に分け、毎フレーム鳥をマスごとに並べ直す。
+    近くの鳥は周り 3x3 マスの中だけを見ればよい (マスの一辺 >= 近傍の半径)。
+    """
+    def __init__(self, model_size, cell_size):
+        self.cell_size = cell_size
+        self.origin_x, self.origin_y = -model_size[0] / 2.0, -model_size[1] / 2.0
+        self.grid_width = max(int(math.ceil(model_size[0] / cell_size)), 1)
+        self.grid_height = max(int(math.ceil(model_size[1] / cell_size)), 1)
+        self.num_cells = self.grid_width * self.grid_height
+        self.cell_start = np.zeros(self.num_cells + 1, dtype=np.int64) # マス c の鳥は order[cell_start[c]:cell_start[c + 1]]
+        # マスの番号が 16 ビットに収まれば、安定ソートは基数ソート (鳥の数に比例) になる
+        self._key_dtype = np.uint16 if self.num_cells <= np.iinfo(np.uint16).max else np.int64
+        self._resize(0)
+
+    def _resize(self, num_birds):
+        self.cells = np.zeros(num_birds, dtype=np.int64)
+        self.order = np.zeros(num_birds, dtype=np.int64)
+        self._cell_xy = np.zeros((num_birds, 2), dtype=np.int64)
+        self._key = np.zeros(num_birds, dtype=self._key_dtype)
+
+    def rebuild(self, positions):
+        """Buckets the birds by cell (a counting sort: O(number of birds))."""
+        if len(self.cells) != len(positions):
+            self._resize(len(positions))
+        cell_xy = self._cell_xy
+        np.floor_divide(positions - (self.origin_x, self.origin_y), self.cell_size, out=cell_xy, casting='unsafe')
+        np.clip(cell_xy[:, 0], 0, self.grid_width - 1, out=cell_xy[:, 0])
+        np.clip(cell_xy[:, 1], 0, self.grid_height - 1, out=cell_xy[:, 1])
+        np.multiply(cell_xy[:, 1], self.grid_width, out=self.cells)
+        self.cells += cell_xy[:, 0]
+        np.cumsum(np.bincount(self.cells, minlength=self.num_cells), out=self.cell_start[1:])
+        self._key[:] = self.cells
+        self.order[:] = np.argsort(self._key, kind='stable') # 同じマスの中は鳥の番号順
+
+class Flocking:
+    """
+    鳥どうしの2Dの群れの動き (boids): 近すぎる鳥から離れる (種に関係なく)、同じ種の鳥と向きを揃える、
+    同じ種の鳥の群れの中心に寄る。近くの鳥は SpatialHash で探し、見るのは max_neighbors 羽まで (本物の群れと同じく
+    近くの数羽だけに反応する)。池が混み合っても1羽あたりの手間は増えないので、処理時間は鳥の数に比例する。
+    設定は settings.yaml の flocking。species で種ごとに重みを変えられる (例: 単独行動の鳥は cohesion: 0)。
+    """
+    def __init__(self, model_size, settings=None):
+        self.model_size = model_size
+        self._birds = None
+        self.apply_settings(settings)
+
+    def apply_settings(self, settings):
+        """Sets (or, on a hot reload, replaces) the rules from the 'flocking' section of settings.yaml."""
+        settings = settings or {}
+        self.enabled = settings.get('enabled', False)
+        self.neighbor_radius = settings.get('neighbor_radius', 0.8)
+        self.separation_distance = settings.get('separation_distance', 0.35)
+        self.max_neighbors = int(settings.get('max_neighbors', 7))
+        self.weights = {rule: settings.get(rule, default) for rule, default in
+                        (('separation', 0.5), ('alignment', 0.05), ('cohesion', 0.1))}
+        self.species_weights = settings.get('species', {})
+        cell_size = max(settings.get('cell_size', self.neighbor_radius), self.neighbor_radius)
+        self.grid = SpatialHash(self.model_size, cell_size)
+        self._birds = None # 種ごとの表を作り直す
+
+    def _update_bird_tables(self, birds):
+        # 鳥の顔ぶれが変わった時だけ作る (種の番号と、鳥ごとの重み)
+        species_ids = {}
+        self._species = np.array([species_ids.setdefault(bird.id, len(species_ids)) for bird in birds], dtype=np.int64)
+        self._weights = np.array([[dict(self.weights, **self.species_weights.get(bird.id, {}))[rule]
+                                   for rule in ('separation', 'alignment', 'cohesion')] for bird in birds], dtype=float).reshape(-1, 3)
+        self._sums = np.zeros((len(birds), 7))
+        self._birds, self._num_birds = birds, len(birds)
+
+    def steer(self, birds, positions, velocities, speeds, out):
+        """
+        out[i] = this frame's velocity change for birds[i] (positions, velocities and speeds are per-bird arrays).
+        Separation is scaled by the bird's own speed, like the strip repulsion; alignment closes part of the gap
+        to the neighbours' mean velocity; cohesion pulls towards their centre, harder the further away it is.
+        """
+        if birds is not self._birds or len(birds) != self._num_birds:
+            self._update_bird_tables(birds)
+        self.grid.rebuild(positions)
+        sums = kernels.flock_sums(positions, velocities, self._species, self.grid.cells, self.grid.cell_start, self.grid.order,
+                                  self.grid.grid_width, self.neighbor_radius, self.separation_distance, self.max_neighbors, self._sums)
+        count = np.maximum(sums[:, 6:7], 1.0)
+        has_flock = sums[:, 6:7] > 0
+        separation = sums[:, 0:2] * (self._weights[:, 0:1] * speeds[:, None])
+        alignment = np.where(has_flock, sums[:, 2:4] / count - velocities, 0.0) * self._weights[:, 1:2]
+        cohesion = sums[:, 4:6] / (count * self.neighbor_radius) * (self._weights[:, 2:3] * speeds[:, None])
+        np.add(separation, alignment, out=out)
+        out += cohesion
+        return out
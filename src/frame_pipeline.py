@@ -0,0 +1,44 @@
+# src/frame_pipeline.py
+from concurrent.futures import ThreadPoolExecutor
+
+class FramePipeline:
+    """
+    Runs the output stage (colors, serial, ...) of frame N on a worker thread while the main
+    thread simulates frame N+1. The output stage must only read the WorldSnapshot it is given.
+
+    submit() は前のフレームの出力段が終わっていることを前提にする (先に wait() を呼ぶ)。
+    enabled=False の時は submit() の中でそのまま実行するので、結果は同じで並行しないだけ。
+    """
+    def __init__(self, output_stage, enabled=True):
+        self.output_stage = output_stage
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="output") if enabled else None
+        self.pending = None
+        self.last_snapshot = None # 出力段が最後に処理し終えたスナップショット
+
+    @property
+    def enabled(self):
+        return self.executor is not None
+
+    def submit(self, snapshot):
+        self.wait()
+        if self.executor is None:
+            self.output_stage(snapshot)
+            self.last_snapshot = snapshot
+        else:
+            self.pending = (self.executor.submit(self.output_stage, snapshot), snapshot)
+
+    def wait(self):
+        """Blocks until the submitted frame is done; re-raises an exception from the output stage."""
+        if self.pending is not None:
+            future, snapshot = self.pending
+            self.pending = None
+            future.result()
+            self.last_snapshot = snapshot
+        return self.last_snapshot
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
@@ -0,0 +1,170 @@
+# src/frame_timing.py
+import os
+import time
+import datetime
+import threading
+import numpy as np
+
+class FrameTimer:
+    """
+    メインループの各段階 (入力, 人の更新, 世界の更新, 色計算, 描画, シリアル, tick待ち) の所要時間を計る。
+    使い方: ループの先頭で start_frame()、各段階の終わりで lap('名前')、最後に end_frame()。
+    別スレッドで動く段階 (パイプラインの出力段) は record('名前', 開始時刻) で記録する。
+    直近 window_frames フレームの p50/p95/p99 と予算超過の回数を保持し、定期的にログへ1行書き出す。
+    """
+    def __init__(self, fps=60, window_frames=600, log_interval=10.0, log_path=None, clock=time.perf_counter):
+        self.budget = 1.0 / fps
+        self.window = window_frames
+        self.log_interval = log_interval
+        self.clock = clock
+
+        self.stages = [] # 最初のフレームで lap() が呼ばれた順
+        self.samples = {} # {stage: 直近 window 個の所要時間 [s] のリングバッファ}
+        self.record_counts = {} # {record() で記録する stage: 記録した回数} (lap() の段階はフレーム番号で書く)
+        self._lock = threading.Lock() # record() は出力段のスレッドから呼ばれる
+        self.totals = np.zeros(window_frames)
+        self.frame_count = 0
+        self.overruns = 0 # 前回のログ以降
+        self.total_overruns = 0
+        self.summary_lines = []
+
+        self.log_file = None
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            self.log_file = open(log_path, 'a', encoding='utf-8', buffering=1)
+        self._frame_start = self._lap_start = self.clock()
+        self._last_log = self._frame_start
+
+    @property
+    def enabled(self):
+        return True
+
+    def start_frame(self):
+        self._frame_start = self._lap_start = self.clock()
+
+    def _buffer(self, stage):
+        buffer = self.samples.get(stage)
+        if buffer is None:
+            with self._lock:
+                if stage not in self.samples:
+                    self.samples[stage] = np.zeros(self.window)
+                    self.stages.append(stage)
+                buffer = self.samples[stage]
+        return buffer
+
+    def lap(self, stage):
+        now = self.clock()
+        self._buffer(stage)[self.frame_count % self.window] = now - self._lap_start
+        self._lap_start = now
+
+    def record(self, stage, start):
+        """Records clock() - start as one sample of stage; safe to call from another thread. Returns clock()."""
+        now = self.clock()
+        buffer = self._buffer(stage)
+        with self._lock:
+            count = self.record_counts.get(stage, 0)
+            buffer[count % self.window] = now - start
+            self.record_counts[stage] = count + 1
+        return now
+
+    def end_frame(self):
+        now = self.clock()
+        total = now - self._frame_start
+        self.totals[self.frame_count % self.window] = total
+        # tick の待ち時間は予算を使い切るためのものなので、超過の判定からは除く
+        busy = total - self.samples['tick'][self.frame_count % self.window] if 'tick' in self.samples else total
+        if busy > self.budget:
+            self.overruns += 1
+            self.total_overruns += 1
+        self.frame_count += 1
+
+        if self.frame_count % 30 == 0:
+            self.summary_lines = self._summarize()
+        if now - self._last_log >= self.log_interval:
+            self._write_log()
+            self._last_log = now
+            self.overruns = 0
+
+    def _percentiles_ms(self, stage):
+        if stage == 'total':
+            return self._percentiles_of(self.totals, self.frame_count)
+        with self._lock:
+            return self._percentiles_of(self.samples[stage], self.record_counts.get(stage, self.frame_count))
+
+    def _percentiles_of(self, buffer, count):
+        n = min(count, self.window)
+        return np.percentile(buffer[:n], [50, 95, 99]) * 1000.0 if n else np.zeros(3)
+
+    def _stage_names(self):
+        with self._lock:
+            return self.stages + ['total']
+
+    def _summarize(self):
+        lines = []
+        for stage in self._stage_names():
+            p50, p95, p99 = self._percentiles_ms(stage)
+            lines.append(f"{stage:>8s} {p50:6.2f} {p95:6.2f} {p99:6.2f} ms")
+        lines.append(f"overruns {self.total_overruns} / {self.frame_count} frames")
+        return lines
+
+    def _write_log(self):
+        if self.frame_count == 0:
+            return
+        parts = []
+        for stage in self._stage_names():
+            p50, p95, p99 = self._percentiles_ms(stage)
+            parts.append(f"{stage}={p50:.2f}/{p95:.2f}/{p99:.2f}")
+        line = (f"{datetime.datetime.now().isoformat(timespec='seconds')} [frame-timing] frames={self.frame_count} "
+                f"overruns={self.overruns} (p50/p95/p99 ms) " + " ".join(parts))
+        print(line)
+        if self.log_file:
+            self.log_file.write(line + "\n")
+
+    def overlay_lines(self):
+        """Lines for the debug view overlay (refreshed every 30 frames)."""
+        return self.summary_lines
+
+    def close(self):
+        self._write_log()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+class NullFrameTimer:
+    """計測が無効な時の代わり。全てのメソッドが何もしない。"""
+    enabled = False
+
+    def start_frame(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def clock(self):
+        return 0.0
+
+    def record(self, stage, start):
+        return start
+
+    def end_frame(self):
+        pass
+
+    def overlay_lines(self):
+        return None
+
+    def close(self):
+        pass
+
+def create_frame_timer(config, fps=60, project_root="."):
+    """Returns a FrameTimer built from the frame_timing settings, or a NullFrameTimer when disabled."""
+    config = config or {}
+    if not config.get('enabled', False):
+        return NullFrameTimer()
+    log_path = config.get('log_path')
+    if log_path:
+        log_path = os.path.join(project_root, log_path)
+    timer = FrameTimer(fps=fps, window_frames=config.get('window_frames', 600),
+                       log_interval=config.get('log_interval_seconds', 10.0), log_path=log_path)
+    if not config.get('overlay', True):
+        timer.overlay_lines = lambda: None
+    return timer
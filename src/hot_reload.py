@@ -0,0 +1,191 @@
+# src/hot_reload.py
+import os
+import json
+import threading
+import time
+import yaml
+import config.config as bird_config
+
+# 実行中にそのまま反映できる settings.yaml のキー。これ以外のキーの変更は再起動が必要 (ポート・レイアウトなど)
+LIVE_SETTINGS = ('global_brightness', 'min_brightness_falloff', 'simulator_visuals', 'chirp_light_mode',
+                 'chirp_centroid_mix', 'ai_tuning', 'strip_avoidance', 'flocking', 'birds_to_simulate', 'hot_reload')
+
+class ConfigWatcher:
+    """Polls files for changes (mtime and size). No extra dependency, and cheap enough to run every second."""
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.stamps = {path: self._stamp(path) for path in self.paths}
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def poll(self):
+        """Returns the paths that changed since the last call."""
+        changed = []
+        for path in self.paths:
+            stamp = self._stamp(path)
+            if stamp != self.stamps[path]:
+                self.stamps[path] = stamp
+                changed.append(path)
+        return changed
+
+class ReloadPlan:
+    """What a reload changes. Built on the watcher thread, applied between frames on the main thread."""
+    def __init__(self, settings, changed_settings, restart_settings, bird_params, changed_birds):
+        self.settings = settings
+        self.changed_settings = changed_settings   # すぐ反映するキー
+        self.restart_settings = restart_settings   # 再起動するまで反映されないキー
+        self.bird_params = bird_params             # 新しい BIRD_PARAMS (鳥の設定が変わっていなければ None)
+        self.changed_birds = changed_birds         # パラメーターが変わった鳥のID
+
+    def merged_with(self, newer):
+        """
+        One plan covering this (not yet applied) plan and a newer one: the newest settings and bird params,
+        and every key and bird that changed in either (the watcher has already moved past both).
+        """
+        return ReloadPlan(newer.settings,
+                          sorted(set(self.changed_settings) | set(newer.changed_settings)),
+                          sorted(set(self.restart_settings) | set(newer.restart_settings)),
+                          newer.bird_params if newer.bird_params is not None else self.bird_params,
+                          sorted(set(self.changed_birds) | set(newer.changed_birds)))
+
+class HotReloader:
+    """
+    settings.yaml と鳥のパラメーター (config/bird_params.json, chirp_patterns.npz) を監視し、
+    変更を再起動せずに反映する。ファイルの読み込みと差分の計算は監視スレッドで行い、
+    反映はメインループがフレームの合間に apply_pending() を呼んだ時だけ行う (描画中の状態は書き換えない)。
+    """
+    def __init__(self, settings_path, settings, world, renderer, make_bird, poll_interval=1.0):
+        self.settings_path = settings_path
+        self.world = world
+        self.renderer = renderer
+        self.make_bird = make_bird # bird_id, params, chirp_probability -> Bird
+        self.poll_interval = poll_interval
+        self.watcher = ConfigWatcher([settings_path, bird_config.PARAMS_PATH, bird_config.PATTERNS_PATH])
+
+        # 監視スレッドが差分を取るための、最後に読んだ内容
+        self._settings = settings
+        self._bird_json = self._read_bird_json()
+        self._pending = None
+        self._lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="hot-reload", daemon=True)
+        self.thread.start()
+        print(f"Hot reload: watching '{os.path.basename(settings_path)}' and the bird parameters.")
+
+    @staticmethod
+    def _read_bird_json():
+        with open(bird_config.PARAMS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # --- Watcher thread ---
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            changed = self.watcher.poll()
+            if not changed:
+                continue
+            try:
+                plan = self._prepare(changed)
+            except Exception as e:
+                # 保存途中のファイルなどは、次に変更された時にもう一度読む
+                print(f"[hot-reload] Could not reload ({e}). Keeping the running configuration.")
+                continue
+            if plan is not None:
+                with self._lock:
+                    # まだ反映されていない変更は捨てずに、新しい変更とまとめる
+                    self._pending = plan if self._pending is None else self._pending.merged_with(plan)
+
+    def _prepare(self, changed_paths):
+        settings = self._settings
+        changed_settings, restart_settings = [], []
+        if self.settings_path in changed_paths:
+            with open(self.settings_path, 'r', encoding='utf-8') as f:
+                settings = yaml.safe_load(f)
+            for key in sorted(set(settings) | set(self._settings)):
+                if settings.get(key) != self._settings.get(key):
+                    (changed_settings if key in LIVE_SETTINGS else restart_settings).append(key)
+
+        bird_params, changed_birds = None, []
+        if bird_config.PARAMS_PATH in changed_paths or bird_config.PATTERNS_PATH in changed_paths:
+            bird_json = self._read_bird_json()
+            if bird_config.PATTERNS_PATH in changed_paths:
+                changed_birds = sorted(bird_json) # 光のパターンはどの鳥のものが変わったか分からない
+            else:
+                changed_birds = sorted(bird_id for bird_id in set(bird_json) | set(self._bird_json)
+                                       if bird_json.get(bird_id) != self._bird_json.get(bird_id))
+            if changed_birds:
+                bird_params = bird_config.load_bird_params()
+            self._bird_json = bird_json
+
+        self._settings = settings
+        if not (changed_settings or restart_settings or changed_birds):
+            return None
+        return ReloadPlan(settings, changed_settings, restart_settings, bird_params, changed_birds)
+
+    # --- Main thread ---
+
+    def apply_pending(self):
+        """Applies a prepared reload, if any. Call between frames; returns True if something was applied."""
+        if self._pending is None:
+            return False
+        with self._lock:
+            plan, self._pending = self._pending, None
+        self._apply(plan)
+        return True
+
+    def _apply(self, plan):
+        settings = plan.settings
+        applied = list(plan.changed_settings)
+
+        # 1. 鳥のパラメーター: 共有の BIRD_PARAMS を差し替え、動いている鳥にもそのまま反映する
+        if plan.bird_params is not None:
+            for bird_id in plan.changed_birds:
+                if bird_id in plan.bird_params:
+                    bird_config.BIRD_PARAMS[bird_id] = plan.bird_params[bird_id]
+            for bird in self.world.birds:
+                if bird.id in plan.changed_birds and bird.id in bird_config.BIRD_PARAMS:
+                    bird.apply_params(bird_config.BIRD_PARAMS[bird.id])
+            applied.append(f"bird params ({', '.join(plan.changed_birds)})")
+
+        # 2. 描画の設定
+        self.renderer.apply_settings(settings)
+
+        # 3. AI の調整
+        chirp_probability = settings.get('ai_tuning', {}).get('chirp_probability_per_frame', 0.001)
+        for bird in self.world.birds:
+            bird.chirp_probability = chirp_probability
+        if self.world.strip_avoidance is not None:
+            self.world.strip_avoidance.apply_settings(settings.get('strip_avoidance', {}))
+        if self.world.flocking is not None:
+            self.world.flocking.apply_settings(settings.get('flocking', {}))
+
+        # 4. 鳥の顔ぶれ: 同じ種の鳥は今の状態のまま残し、増えた鳥だけ作り、減った鳥は消す
+        cast = [bird_id for bird_id in settings.get('birds_to_simulate', []) if bird_id in bird_config.BIRD_PARAMS]
+        if [bird.id for bird in self.world.birds] != cast:
+            remaining = list(self.world.birds)
+            birds = []
+            for bird_id in cast:
+                existing = next((bird for bird in remaining if bird.id == bird_id), None)
+                if existing is not None:
+                    remaining.remove(existing)
+                    birds.append(existing)
+                else:
+                    birds.append(self.make_bird(bird_id, bird_config.BIRD_PARAMS[bird_id], chirp_probability))
+            self.world.set_birds(birds)
+        else:
+            self.world.refresh_profiles() # 色やパターンが変わった鳥の描画用データを作り直す
+
+        if applied:
+            print(f"[hot-reload] Applied: {', '.join(applied)}")
+        if plan.restart_settings:
+            print(f"[hot-reload] Restart required for: {', '.join(plan.restart_settings)} (not applied)")
+
+    def close(self):
+        self.running = False
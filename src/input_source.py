@@ -1,9 +1,11 @@
 import abc
+import asyncio
 import pygame
 import socket
 import threading
 import numpy as np
 import time
+from src.recording import FrameLog, KIND_INPUT
 
 # Humanクラスのインポートは不要になる
 # from .objects import Human 
@@ -18,6 +20,10 @@ class InputSource(abc.ABC):
         """検出されたオブジェクトの生データ（Numpy配列）を返す"""
         pass
     
+    async def start(self):
+        """asyncio ランタイムが最初のフレームの前に呼ぶ (イベントループ上で準備が必要なソース用)"""
+        pass
+
     def shutdown(self):
         """クリーンアップ処理"""
         pass
@@ -74,6 +80,45 @@ class UdpInputSource(InputSource):
         self.thread.join()
         print("UDP Input source shut down.")
 
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, source):
+        self.source = source
+
+    def datagram_received(self, data, addr):
+        self.source._on_datagram(data)
+
+class AsyncUdpInputSource(InputSource):
+    """
+    UdpInputSource for the asyncio runtime. Packets are parsed on the event loop the moment
+    they arrive (no listener thread), and shutdown just closes the transport.
+    """
+    def __init__(self, host='0.0.0.0', port=9999):
+        self.host, self.port = host, port
+        self.latest_data = np.empty((0, 3))
+        self.transport = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), local_addr=(self.host, self.port))
+        print(f"Listening for OBJECT DATA on UDP port {self.port} (asyncio)...")
+
+    def _on_datagram(self, data):
+        try:
+            # 受信データを [x, y, size] のN行3列の配列に変換
+            self.latest_data = np.frombuffer(data, dtype=np.float32).reshape(-1, 3)
+        except ValueError:
+            print("Warning: Received malformed UDP packet. Clearing data.")
+            self.latest_data = np.empty((0, 3))
+
+    def get_detected_objects(self) -> np.ndarray:
+        return self.latest_data
+
+    def shutdown(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+            print("UDP Input source shut down.")
+
 # -------------------------------------------------------------
 # 4. Automatic (for testing)
 # -------------------------------------------------------------
@@ -97,3 +142,67 @@ class AutomaticInputSource(InputSource):
         
         # Return as a single detected object
         return np.array([[x, y, size]])
+
+# -------------------------------------------------------------
+# 5. Record / Replay
+# -------------------------------------------------------------
+class RecordingInputSource(InputSource):
+    """Wraps any InputSource and appends every frame it returns to a FrameRecorder."""
+    def __init__(self, source: InputSource, recorder):
+        self.source = source
+        self.recorder = recorder
+
+    def get_detected_objects(self) -> np.ndarray:
+        detected_objects = self.source.get_detected_objects()
+        self.recorder.record_input(detected_objects)
+        return detected_objects
+
+    async def start(self):
+        await self.source.start()
+
+    def shutdown(self):
+        self.source.shutdown()
+
+class ReplayInputSource(InputSource):
+    """
+    Plays back the input frames of a recorded log.
+    speed > 0 replays in real time scaled by speed (1.0 = as recorded).
+    speed == 0 returns the next recorded frame on every call, as fast as the caller runs.
+    """
+    def __init__(self, path, speed=1.0, loop=False):
+        self.log = FrameLog(path)
+        self.speed = speed
+        self.loop = loop
+        self.times = self.log.times(KIND_INPUT)
+        self.next_index = 0
+        self.start_time = time.monotonic()
+        print(f"Replaying {len(self.times)} input frames ({self.log.duration:.1f}s) from '{path}' at "
+              f"{'max' if speed == 0 else f'{speed}x'} speed.")
+
+    @property
+    def finished(self):
+        return not self.loop and self.next_index >= len(self.times)
+
+    def get_detected_objects(self) -> np.ndarray:
+        if len(self.times) == 0:
+            return np.empty((0, 3))
+
+        if self.speed == 0:
+            index = self.next_index
+            if index >= len(self.times):
+                if not self.loop:
+                    return self.log.input_frame(len(self.times) - 1)
+                index = 0
+            self.next_index = index + 1
+            return self.log.input_frame(index)
+
+        elapsed = (time.monotonic() - self.start_time) * self.speed
+        if self.loop and self.times[-1] > 0:
+            elapsed %= self.times[-1]
+        # elapsed 以前で最新のフレームを返す
+        index = max(int(np.searchsorted(self.times, elapsed, side='right')) - 1, 0)
+        self.next_index = index + 1
+        return self.log.input_frame(index)
+
+    def shutdown(self):
+        self.log.close()
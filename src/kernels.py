@@ -0,0 +1,165 @@
+# src/kernels.py
+import numpy as np
+
+# 毎フレームの重いループ (最寄りピクセルの検索、テープ上の縄張りの反発、光の広がりの合成、パターンの色選び、
+# 群れの近傍の集計) を NumPy の配列演算で行う。
+# どれも元の Python のループ (scripts/check_kernel_parity.py の *_loops) と同じ順番で同じ演算をするので、
+# 結果はビット単位で一致する (シード指定の実行は、ループで書いた時と同じになる)。
+
+def nearest_pixels(pixel_positions, positions, out):
+    """out[i] = index of the pixel nearest to positions[i] (first one on ties). Returns out."""
+    # 鳥 x ピクセルの距離の表を数羽ずつ作る。表はキャッシュに収まる大きさにし、同じバッファを使い回す
+    # (大きな表を毎回作るとメモリの読み書きで遅くなる)
+    rows = max(1, min(len(positions), (1 << 16) // max(len(pixel_positions), 1)))
+    dx = np.empty((rows, len(pixel_positions)))
+    dy = np.empty_like(dx)
+    pixel_x, pixel_y = pixel_positions[:, 0], pixel_positions[:, 1]
+    for start in range(0, len(positions), rows):
+        chunk = positions[start:start + rows]
+        n = len(chunk)
+        np.subtract(pixel_x, chunk[:, 0:1], out=dx[:n])
+        np.subtract(pixel_y, chunk[:, 1:2], out=dy[:n])
+        np.multiply(dx[:n], dx[:n], out=dx[:n])
+        np.multiply(dy[:n], dy[:n], out=dy[:n])
+        np.add(dx[:n], dy[:n], out=dx[:n])
+        out[start:start + n] = dx[:n].argmin(axis=1)
+    return out
+
+def strip_repulsion(positions, pixel_centers, personal_space, other_reach, out):
+    """
+    out[i] = 2D push away from every bird j whose strip pixel is closer than personal_space[i] + other_reach[j]
+    to bird i's, weighted by how far inside it is (the territorial rule of Bird.update with other_reach = 0;
+    the predicted span overlaps of src/strip_avoidance.py with both set to half span widths). Returns out.
+    Birds are sorted by pixel, so each bird only visits those within personal_space[i] + max(other_reach) pixels:
+    O(N log N) plus the number of such pairs (which is still N^2 if every bird sits on the same few pixels).
+    """
+    # ループと同じく、テープ上で届く範囲にいる鳥の組 (i, j) だけを作り、i ごとに j の番号順に並べる
+    n = len(positions)
+    order = np.argsort(pixel_centers, kind='stable')
+    sorted_centers = pixel_centers[order]
+    search_reach = personal_space + (other_reach.max() if n > 0 else 0.0)
+    lo = np.searchsorted(sorted_centers, pixel_centers - search_reach, side='left')
+    counts = np.searchsorted(sorted_centers, pixel_centers + search_reach, side='right') - lo
+    i = np.repeat(np.arange(n), counts)
+    j = order[np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts) + lo[i]]
+    pairs = np.lexsort((j, i))
+    i, j = i[pairs], j[pairs]
+    vx = positions[j, 0] - positions[i, 0]
+    vy = positions[j, 1] - positions[i, 1]
+    dist = np.sqrt(vx * vx + vy * vy)
+    pixel_distance = np.abs(pixel_centers[i] - pixel_centers[j])
+    reach = personal_space[i] + other_reach[j]
+    active = (i != j) & (pixel_distance < reach) & (dist > 1e-6)
+    i, vx, vy, dist = i[active], vx[active], vy[active], dist[active]
+    strength = (reach[active] - pixel_distance[active]) / reach[active]
+    # bincount は組の順番に足すので、ループと同じ合計になる
+    out[:, 0] = np.bincount(i, -(vx / dist * strength), n)
+    out[:, 1] = np.bincount(i, -(vy / dist * strength), n)
+    return out
+
+def composite_spans(centers, spreads, brightness, min_falloff, brightness_map, winner_map):
+    """
+    Draws every bird's span (centre +- spread, brightness falling off towards the ends) into brightness_map,
+    keeping the brightest bird per pixel in winner_map (the earlier bird on ties). Maps must be cleared first.
+    """
+    widths = 2 * spreads + 1
+    bird = np.repeat(np.arange(len(centers)), widths)
+    j = np.arange(len(bird)) - np.repeat(np.cumsum(widths) - widths, widths) - spreads[bird]
+    pixel_idx = centers[bird] + j
+    inside = (pixel_idx >= 0) & (pixel_idx < len(brightness_map))
+    bird, j, pixel_idx = bird[inside], j[inside], pixel_idx[inside]
+    spread = spreads[bird]
+    linear_falloff = np.where(spread > 0, (spread - np.abs(j)) / np.maximum(spread, 1), 1.0)
+    falloff = min_falloff + (1.0 - min_falloff) * linear_falloff
+    final_brightness = brightness[bird] * falloff
+    # ループでは「より明るい時だけ」上書きするので、同じ明るさなら先の鳥が残る
+    np.maximum.at(brightness_map, pixel_idx, final_brightness)
+    won = (final_brightness > 0.0) & (final_brightness == brightness_map[pixel_idx])
+    first = np.full(len(brightness_map), len(centers))
+    np.minimum.at(first, pixel_idx[won], bird[won])
+    np.copyto(winner_map, first, where=first < len(centers))
+
+def choose_colors(winner_map, centers, mask_offset, mask_length, masks, color_choice, lit):
+    """
+    For each lit pixel, looks up the winning bird's colour pattern ('a' = 1, 'b' = 0) at the pixel's offset
+    from the bird's centre. masks[mask_offset[i]:][:mask_length[i]] is bird i's pattern for its current state.
+    """
+    has_winner = winner_map != -1
+    bird = np.maximum(winner_map, 0)
+    length = mask_length[bird]
+    index = np.arange(len(winner_map)) - centers[bird] + length // 2 + length % 2
+    np.logical_and(has_winner, length > 0, out=lit)
+    chosen = lit & (index >= 0) & (index < length)
+    color_choice.fill(0)
+    color_choice[chosen] = masks[mask_offset[bird[chosen]] + index[chosen]]
+
+def _flock_candidates(birds, first, count, limit=None):
+    # 鳥ごとに、周りのマスの鳥を見る順番に並べた (鳥 i, 鳥 j) の組。limit があれば鳥ごとに先頭の limit 組まで
+    if limit is not None:
+        before = np.cumsum(count, axis=1) - count
+        count = np.clip(limit - before, 0, count)
+    count, first = count.ravel(), first.ravel()
+    slot = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    return np.repeat(birds, count.reshape(len(birds), -1).sum(axis=1)), np.repeat(first, count) + slot
+
+def flock_sums(positions, velocities, species, cells, cell_start, order, grid_width, radius, separation_distance,
+                      max_neighbors, out):
+    """
+    Neighbour sums for the flocking rules, visiting only the 3x3 grid cells around each bird (src/flocking.py).
+    cells[i] is bird i's cell (row-major, grid_width wide); the birds in cell c are order[cell_start[c]:cell_start[c + 1]].
+    Each bird looks at up to max_neighbors other birds within radius (its own cell first), and out[i] gets:
+    [0:2] the push away from those closer than separation_distance (any species), and for those of the same species
+    [2:4] the sum of their velocities, [4:6] the sum of their offsets from bird i, [6] their number. Returns out.
+    """
+    # 鳥 i と周り 3x3 マスの鳥 j の組を、ループと同じ順番 (i、自分のマス → 周りのマス、マスの中) に並べて一度に計算する
+    n = len(positions)
+    grid_height = (len(cell_start) - 1) // grid_width
+    cx, cy = cells % grid_width, cells // grid_width
+    first = np.zeros((n, 9), dtype=np.int64)
+    count = np.zeros((n, 9), dtype=np.int64)
+    for k, m in enumerate((4, 0, 1, 2, 3, 5, 6, 7, 8)):
+        gx, gy = cx + m % 3 - 1, cy + m // 3 - 1
+        valid = (gx >= 0) & (gx < grid_width) & (gy >= 0) & (gy < grid_height)
+        cell = np.where(valid, gy * grid_width + gx, 0)
+        first[:, k] = cell_start[cell]
+        count[:, k] = np.where(valid, cell_start[cell + 1] - cell_start[cell], 0)
+
+    def near_pairs(i, slots):
+        j = order[slots]
+        dx = positions[j, 0] - positions[i, 0]
+        dy = positions[j, 1] - positions[i, 1]
+        dist_sq = dx * dx + dy * dy
+        near = (i != j) & (dist_sq < radius * radius)
+        return i[near], j[near], dx[near], dy[near], dist_sq[near]
+
+    # 混み合った所では、最初の数組で max_neighbors 羽が見つかる (組の数が鳥の数の2乗にならないように)。
+    # 見つからなかった鳥 (周りに鳥が少ない) だけ、残りも全部見る
+    limit = 4 * max_neighbors
+    birds = np.arange(n)
+    pairs = near_pairs(*_flock_candidates(birds, first, count, limit))
+    done = (np.bincount(pairs[0], minlength=n) >= max_neighbors) | (count.sum(axis=1) <= limit)
+    if not done.all():
+        rest = np.flatnonzero(~done)
+        keep = done[pairs[0]]
+        more = near_pairs(*_flock_candidates(rest, first[rest], count[rest]))
+        pairs = [np.concatenate([a[keep], b]) for a, b in zip(pairs, more)]
+        ordered = np.argsort(pairs[0], kind='stable')
+        pairs = [a[ordered] for a in pairs]
+    i, j, dx, dy, dist_sq = pairs
+    # 鳥ごとに、見つけた順に max_neighbors 羽まで
+    per_bird = np.bincount(i, minlength=n)
+    rank = np.arange(len(i)) - np.repeat(np.cumsum(per_bird) - per_bird, per_bird)
+    kept = rank < max_neighbors
+    i, j, dx, dy, dist_sq = i[kept], j[kept], dx[kept], dy[kept], dist_sq[kept]
+
+    close = (dist_sq > 1e-12) & (dist_sq < separation_distance * separation_distance)
+    dist = np.sqrt(np.where(close, dist_sq, 1.0))
+    strength = (separation_distance - dist) / separation_distance
+    same = species[j] == species[i]
+    # bincount は組の順番に足すので、ループと同じ合計になる
+    sums = (np.where(close, -(dx / dist * strength), 0.0), np.where(close, -(dy / dist * strength), 0.0),
+            np.where(same, velocities[j, 0], 0.0), np.where(same, velocities[j, 1], 0.0),
+            np.where(same, dx, 0.0), np.where(same, dy, 0.0), same.astype(float))
+    for column, weights in enumerate(sums):
+        out[:, column] = np.bincount(i, weights, n)
+    return out
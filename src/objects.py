@@ -1,31 +1,69 @@
-import pygame
+import math
 import numpy as np
-import random
 import os
+from src.sound_bank import get_sound_bank
+from config.config import ENVELOPE_FPS
+
+# 鳥の状態の一覧。プロセス間で共有するスナップショットなどでは、この番号 (uint8) で状態を表す
+BIRD_STATES = ("IDLE", "FORAGING", "EXPLORING", "CURIOUS", "FLEEING", "CAUTION", "CHIRPING")
+BIRD_STATE_CODES = {name: code for code, name in enumerate(BIRD_STATES)}
 
 class Human:
     """Represents the user in the simulation. An "actor" in the world."""
     def __init__(self, position, velocity, size, size_change):
-        self.position = np.array(position)
-        self.velocity = np.array(velocity) # 鳥のAIが参照する、平滑化された速度
-        self.smooth_velocity = np.array(velocity) # 次フレーム計算用の平滑化速度
+        self.position = np.array(position, dtype=float)
+        self.velocity = np.array(velocity, dtype=float) # 鳥のAIが参照する、平滑化された速度
+        self.smooth_velocity = np.array(velocity, dtype=float) # 次フレーム計算用の平滑化速度
         self.size = size
         self.size_change = size_change # varianceから改名
+        self.id = None       # World が付ける追跡ID
+        self.matched = False # World の追跡処理で使う
+
+    def reset(self, x, y, size):
+        """Reinitializes a pooled Human for a newly detected visitor (no velocity yet)."""
+        self.position[0], self.position[1] = x, y
+        self.velocity.fill(0.0)
+        self.smooth_velocity.fill(0.0)
+        self.size = size
+        self.size_change = 0.0
 
 class Bird:
     """
     Represents a single bird as an AI agent. An "actor" in the world.
     It is only responsible for its own behavior and intentions.
     """
-    def __init__(self, bird_id, params, chirp_probability):
+    def __init__(self, bird_id, params, chirp_probability, rng=None):
         self.id = bird_id
-        self.params = params
+        # 乱数は全てこのジェネレーターから引く (World と共有し、シード固定で再現可能にする)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.chirp_probability = chirp_probability
+        self.apply_params(params)
+
+        # State initialization
+        self.position = np.array([0.0, 0.0])
+        self.velocity = np.array([0.0, 0.0])
+        self._jitter = np.zeros(2) # FORAGING の揺らぎ用 (毎フレーム配列を作らない)
+        self.target_position = self.position
+        self.state = "IDLE"
+        self.action_timer = self.rng.integers(180, 401)
+        self.current_brightness = 1.0 # Initialize current_brightness
+        
+        # Playback tracking (chirp_start_time / chirp_duration are on the World clock, in seconds)
+        self.chirp_playback_time = 0.0
+        self.chirp_start_time = 0.0
+        self.chirp_duration = 0.0
+        self.active_pattern_key = None 
+        self.audio_scheduler = None # World が設定する (None の場合は直接再生)
+
+    def apply_params(self, params):
+        """Sets (or, on a hot reload, replaces) everything derived from this bird's BIRD_PARAMS entry."""
+        self.params = params
 
         # Visual and personality parameters
         self.base_color = np.array(self.params['base_color'])
         self.accent_color = np.array(self.params['accent_color'])
         self.base_pixel_count = self.params['base_pixel_count']
+        self.size = self.params.get('size', 1.0)
         self.color_pattern = self.params['color_pattern']
         self.chirp_color_pattern = self.params.get('chirp_color_pattern', self.color_pattern)
         self.speed = self.params['movement_speed'] / 60.0
@@ -34,29 +72,16 @@ class Bird:
         self.caution_distance = self.params['caution_distance']
         self.flee_distance = self.params['flee_distance']
         self.chirp_patterns = self.params.get('chirp_pattern', {})
+        self.chirp_envelopes = self.params.get('chirp_envelope', {}) # uint8, 1フレーム1サンプル
+        self.chirp_centroids = self.params.get('chirp_centroid', {})
         self.pixel_personal_space = self.params.get('pixel_personal_space', 3) # デフォルト値を設定
 
-        # State initialization
-        self.position = np.array([0.0, 0.0])
-        self.velocity = np.array([0.0, 0.0])
-        self.target_position = self.position
-        self.state = "IDLE"
-        self.action_timer = random.randint(180, 400)
-        self.current_brightness = 1.0 # Initialize current_brightness
-        
-        # Playback tracking
-        self.chirp_playback_time = 0.0
-        self.active_pattern_key = None 
-
-        # Load sounds
+        # Sounds are decoded once per file by the shared SoundBank, in the background.
+        # Until a sound is ready, this bird simply does not chirp with it.
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.sounds = {}
-        try:
-            for key, path in self.params.get('sound_files', {}).items():
-                abs_path = os.path.join(project_root, path)
-                self.sounds[key] = pygame.mixer.Sound(abs_path)
-        except Exception as e:
-            print(f"ERROR loading sound for {self.id} at '{abs_path}': {e}")
+        self.sound_paths = {key: os.path.join(project_root, path) for key, path in self.params.get('sound_files', {}).items()}
+        for path in self.sound_paths.values():
+            get_sound_bank().request(path)
 
     def get_current_light_pattern(self):
         """Returns the appropriate light pattern and base pixel count based on the current state."""
@@ -64,47 +89,44 @@ class Bird:
             return self.chirp_color_pattern, self.base_pixel_count
         return self.color_pattern, self.base_pixel_count
 
-    def update(self, humans, all_birds, my_index, all_pixel_centers):
-        """1D/2D空間を考慮して鳥の状態を更新する"""
+    def lit_half_span(self):
+        """Pixels lit on each side of the bird's centre (the renderer's spread; its widest while chirping)."""
+        if self.state == "CHIRPING":
+            return int(self.base_pixel_count * (1 + self.size * 0.5)) // 2
+        return self.base_pixel_count // 2
+
+    def update(self, humans, repulsion, now):
+        """
+        1D/2D空間を考慮して鳥の状態を更新する。
+        repulsion はLEDテープ上の縄張り意識による反発 (x, y)。全ての鳥の分を World がまとめて計算する
+        (縄張り内 = pixel_personal_space 以内のピクセルにいる鳥から、2D空間で離れる向き。src/kernels.py)。
+        """
 
         # --- 0. 最もインタラクションすべき人間を見つける ---
+        # (毎フレーム全ての鳥が呼ぶので、一時的なNumPy配列を作らずスカラーで計算する)
         nearest_human = None
         min_dist_to_human = float('inf')
-        if humans: # 人間が一人でも存在する場合
-            distances = [np.linalg.norm(self.position - h.position) for h in humans]
-            min_idx = np.argmin(distances)
-            min_dist_to_human = distances[min_idx]
-            nearest_human = humans[min_idx]
-
-        # --- 1. LEDテープ上(1D)の縄張り意識 ---
-        my_pixel_pos = all_pixel_centers[my_index]
-        led_repulsion_vec = np.array([0.0, 0.0])
-
-        for other_index, other in enumerate(all_birds):
-            if self is other: continue
-
-            other_pixel_pos = all_pixel_centers[other_index]
-            pixel_distance = abs(my_pixel_pos - other_pixel_pos)
-
-            # 縄張り内に他の鳥がいたら、2D空間で反発
-            if pixel_distance < self.pixel_personal_space:
-                vec_to_other_2d = other.position - self.position
-                dist_to_other_2d = np.linalg.norm(vec_to_other_2d)
-
-                if dist_to_other_2d > 1e-6:
-                    overlap = self.pixel_personal_space - pixel_distance
-                    repulsion_force = (vec_to_other_2d / dist_to_other_2d) * (overlap / self.pixel_personal_space)
-                    led_repulsion_vec -= repulsion_force
-        
-        # 反発力を速度に穏やかに加える
-        self.velocity += led_repulsion_vec * self.speed * 0.5
+        px, py = self.position[0], self.position[1]
+        for h in humans:
+            dx, dy = px - h.position[0], py - h.position[1]
+            dist = math.sqrt(dx * dx + dy * dy)
+            if dist < min_dist_to_human:
+                min_dist_to_human = dist
+                nearest_human = h
+
+        # --- 1. LEDテープ上(1D)の縄張り意識: 反発力を速度に穏やかに加える ---
+        repulsion_x, repulsion_y = repulsion
+        if repulsion_x or repulsion_y:
+            self.velocity[0] += repulsion_x * self.speed * 0.5
+            self.velocity[1] += repulsion_y * self.speed * 0.5
 
         # --- 2. 人間とのインタラクション(2D)とステートマシン ---
         if nearest_human: # 最も近い人間が存在する場合のみ、インタラクションを考慮
+            human_speed = math.sqrt(nearest_human.velocity[0] ** 2 + nearest_human.velocity[1] ** 2)
             # 鳴いている最中は、他の状態に遷移させない
             if self.state != 'CHIRPING':
                 # 新しいロジック：速度や分散に基づく状態変化
-                if np.linalg.norm(nearest_human.velocity) > 0.5: # 速度が速い人間には、より遠くから逃げる
+                if human_speed > 0.5: # 速度が速い人間には、より遠くから逃げる
                     self.state = "FLEEING"
                 
                 # 手を広げた（サイズが急に大きくなった）ら、特別な鳴き声を出す
@@ -116,7 +138,7 @@ class Bird:
                     if min_dist_to_human < self.flee_distance: self.state = "FLEEING"
                     elif min_dist_to_human < self.caution_distance: self.state = "CAUTION"
                     # 人間の速度が非常に遅い（ほぼ静止）場合に、好奇心を示す
-                    elif np.linalg.norm(nearest_human.velocity) < 0.05 and random.random() < self.curiosity: 
+                    elif human_speed < 0.05 and self.rng.random() < self.curiosity: 
                         self.state = "CURIOUS"
             
             self.action_timer -= 1
@@ -124,51 +146,103 @@ class Bird:
             if self.state == "IDLE":
                 self.velocity *= 0.8
                 if self.action_timer <= 0:
-                    self.state = "FORAGING" if random.random() < 0.7 else "EXPLORING"
-                    self.action_timer = random.randint(120, 300) if self.state == "FORAGING" else random.randint(180, 400)
+                    self.state = "FORAGING" if self.rng.random() < 0.7 else "EXPLORING"
+                    self.action_timer = self.rng.integers(120, 301) if self.state == "FORAGING" else self.rng.integers(180, 401)
                     if self.state == "EXPLORING":
-                        distance = random.uniform(1.5, 4.0)
-                        angle = random.uniform(0, 2 * np.pi)
+                        distance = self.rng.uniform(1.5, 4.0)
+                        angle = self.rng.uniform(0, 2 * np.pi)
                         self.target_position = self.position + np.array([np.cos(angle), np.sin(angle)]) * distance
             elif self.state == "FORAGING":
-                if random.random() < 0.1: self.velocity += (np.random.rand(2) - 0.5) * 0.02
+                if self.rng.random() < 0.1:
+                    self.rng.random(out=self._jitter)
+                    self._jitter -= 0.5
+                    self._jitter *= 0.02
+                    self.velocity += self._jitter
                 else: self.velocity *= 0.7
-                if self.action_timer <= 0: self.state = "IDLE"; self.action_timer = random.randint(180, 400)
+                if self.action_timer <= 0: self.state = "IDLE"; self.action_timer = self.rng.integers(180, 401)
             elif self.state == "EXPLORING":
-                direction_vec = self.target_position - self.position
-                if np.linalg.norm(direction_vec) < 0.2: self.state = "IDLE"; self.action_timer = random.randint(180, 400)
-                else: self.velocity += direction_vec / np.linalg.norm(direction_vec) * self.speed * 0.1
+                dx, dy = self.target_position[0] - px, self.target_position[1] - py
+                dist = math.sqrt(dx * dx + dy * dy)
+                if dist < 0.2: self.state = "IDLE"; self.action_timer = self.rng.integers(180, 401)
+                else:
+                    self.velocity[0] += dx / dist * self.speed * 0.1
+                    self.velocity[1] += dy / dist * self.speed * 0.1
             elif self.state == "CURIOUS":
-                direction_vec = nearest_human.position - self.position; dist = np.linalg.norm(direction_vec)
-                if dist < self.caution_distance * 0.8: self.state = "IDLE"; self.action_timer = random.randint(180, 400)
-                else: self.velocity += direction_vec / dist * self.approach_speed * 0.1
+                dx, dy = nearest_human.position[0] - px, nearest_human.position[1] - py
+                dist = math.sqrt(dx * dx + dy * dy)
+                if dist < self.caution_distance * 0.8: self.state = "IDLE"; self.action_timer = self.rng.integers(180, 401)
+                else:
+                    self.velocity[0] += dx / dist * self.approach_speed * 0.1
+                    self.velocity[1] += dy / dist * self.approach_speed * 0.1
                 # 人間が動き出したら、警戒状態に戻る
-                if np.linalg.norm(nearest_human.velocity) > 0.1: self.state = "CAUTION"
+                if human_speed > 0.1: self.state = "CAUTION"
             elif self.state == "FLEEING":
-                self.velocity += (self.position - nearest_human.position) / min_dist_to_human * self.speed * 0.3
+                self.velocity[0] += (px - nearest_human.position[0]) / min_dist_to_human * self.speed * 0.3
+                self.velocity[1] += (py - nearest_human.position[1]) / min_dist_to_human * self.speed * 0.3
                 if min_dist_to_human > self.flee_distance * 1.5: self.state = "CAUTION"
             elif self.state == "CAUTION":
                 self.velocity *= 0.8
                 if min_dist_to_human > self.caution_distance * 1.2: self.state = "IDLE"
             elif self.state == "CHIRPING":
-                # 物理計算はsimulation.py側で完全にスキップされるので、ここでは何もしない
-                self.chirp_playback_time += 1.0 / 60.0
-                # 輝度計算はレンダラーに任せるので、ここでは時間経過のみを管理
-                if self.action_timer <= 0:
-                    self.state = "IDLE"
-                    self.active_pattern_key = None
+                self._update_chirp(now)
 
         else: # 人間が誰もいない場合
             if self.state in ["FLEEING", "CAUTION", "CURIOUS"]:
                 self.state = "IDLE"
+            elif self.state == "CHIRPING":
+                # 誰もいなくても鳴き声は最後まで進め、ボイスを解放する
+                self._update_chirp(now)
 
         # ランダムなタイミングで鳴き声を開始
-        if self.state in ["IDLE", "FORAGING"] and self.action_timer > 0 and random.random() < self.chirp_probability:
+        if self.state in ["IDLE", "FORAGING"] and self.action_timer > 0 and self.rng.random() < self.chirp_probability:
             self.active_pattern_key = 'drumming' if self.id == 'kumagera' else 'default'
-            if self.active_pattern_key in self.sounds:
-                sound_to_play = self.sounds[self.active_pattern_key]
+            sound_to_play = get_sound_bank().get(self.sound_paths.get(self.active_pattern_key))
+            if sound_to_play is not None:
+                duration = sound_to_play.get_length()
+            elif self.audio_scheduler is not None and self.audio_scheduler.silent:
+                # ミキサーなし (オフライン描画): 音は鳴らさず、光のパターンの長さだけ鳴いたことにする
+                duration = self.chirp_length(self.active_pattern_key)
+            else:
+                duration = 0.0
+            # 光はボイスが実際に割り当てられた時だけ始める (音と光を必ず一致させる)
+            start_time = self._start_sound(sound_to_play, min_dist_to_human, now) if duration > 0 else None
+            if start_time is not None:
                 self.state = "CHIRPING"
-                # Set the timer to the actual length of the sound file.
-                self.action_timer = int(sound_to_play.get_length() * 60) # Convert seconds to frames
+                # 光の再生はフレーム数ではなく時計で管理する (フレームが遅れても音とずれない)
+                self.chirp_start_time = start_time
+                self.chirp_duration = duration
                 self.chirp_playback_time = 0.0
-                sound_to_play.play()
\ No newline at end of file
+            else:
+                self.active_pattern_key = None
+
+    def chirp_length(self, pattern_key):
+        """Length [s] of a chirp's light, from its dense envelope (or its last keyframe)."""
+        envelope = self.chirp_envelopes.get(pattern_key)
+        if envelope is not None and len(envelope) > 0:
+            return len(envelope) / ENVELOPE_FPS
+        pattern = self.chirp_patterns.get(pattern_key)
+        if pattern is not None and len(pattern) > 0:
+            return float(pattern[-1, 0])
+        return 0.0
+
+    def _start_sound(self, sound, listener_distance, now):
+        """Starts the sound and returns the time it begins playing, or None if no voice was granted."""
+        if self.audio_scheduler is None:
+            sound.play()
+            return now
+        return self.audio_scheduler.request_voice(self, sound, listener_distance, now)
+
+    def _update_chirp(self, now):
+        # 物理計算はsimulation.py側で完全にスキップされるので、ここでは何もしない
+        # 輝度計算はレンダラーに任せるので、ここでは経過時間のみを管理
+        self.chirp_playback_time = max(now - self.chirp_start_time, 0.0)
+        if now - self.chirp_start_time >= self.chirp_duration:
+            self.end_chirp()
+
+    def end_chirp(self):
+        """Ends the current chirp, either naturally or because its voice was taken by another bird."""
+        self.state = "IDLE"
+        self.active_pattern_key = None
+        self.action_timer = min(self.action_timer, 0)
+        if self.audio_scheduler is not None:
+            self.audio_scheduler.release(self)
\ No newline at end of file
@@ -0,0 +1,26 @@
+# src/pixel_lookup.py
+import numpy as np
+from src import kernels
+
+class PixelLookup:
+    """
+    鳥の位置から最も近いピクセルの番号を引く。
+    作業用の配列を最初に確保しておき、毎フレームの検索では新しい配列を作らない。
+    """
+    def __init__(self, pixel_model_positions):
+        self.source = pixel_model_positions # 呼び出し側の配列 (差し替えを検出するため)
+        self.pixel_model_positions = np.ascontiguousarray(pixel_model_positions, dtype=float)
+        self.num_pixels = len(self.pixel_model_positions)
+        self._diff = np.empty_like(self.pixel_model_positions)
+        self._dist_sq = np.empty(self.num_pixels)
+
+    def nearest(self, position):
+        """Index of the pixel closest to position (squared distance, same winner as the Euclidean norm)."""
+        np.subtract(self.pixel_model_positions, position, out=self._diff)
+        np.multiply(self._diff, self._diff, out=self._diff)
+        np.add(self._diff[:, 0], self._diff[:, 1], out=self._dist_sq)
+        return int(self._dist_sq.argmin())
+
+    def nearest_for_positions(self, positions, out):
+        """Fills out[i] (an int64 array) with the pixel nearest to positions[i] and returns out (src/kernels.py)."""
+        return kernels.nearest_pixels(self.pixel_model_positions, positions, out)
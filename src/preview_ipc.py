@@ -0,0 +1,192 @@
+# src/preview_ipc.py
+import numpy as np
+from multiprocessing import shared_memory
+
+# --- Shared memory layout -----------------------------------------------------
+# [header: int64 x 8] に続いて、同じ形のスロットが num_slots 個並ぶリング。
+#   header: MAGIC, num_pixels, max_birds, max_humans, num_slots, closed, latest_seq, (予備)
+#   slot  : seq (奇数 = 書き込み中), num_birds, num_humans, frame, cast (鳥の顔ぶれの世代), time
+#           鳥のID・位置・状態・アクセント寄せ, 来場者 [x, y, size, vx, vy, size_change],
+#           LEDの色, 各ピクセルの輝度・勝者・色の種類
+# 書き込み側 (LEDのループ) は待たない。読み込み側 (プレビュー) は seq を前後で比べ、
+# 書き換え中に読んだフレームは捨てる (seqlock)。
+# 鳥の顔ぶれやパラメーターが変わる (hot reload) と cast の世代が進むので、プレビューは鳥の描画用データを作り直す。
+MAGIC = 0x544B5052 # "TKPR"
+HEADER_FIELDS = 8
+H_MAGIC, H_PIXELS, H_BIRDS, H_HUMANS, H_SLOTS, H_CLOSED, H_LATEST = range(7)
+HUMAN_FIELDS = 6
+BIRD_ID_BYTES = 32
+
+def _slot_fields(num_pixels, max_birds, max_humans):
+    return [
+        ('meta', np.int64, (5,)), # seq, num_birds, num_humans, frame, cast
+        ('time', np.float64, (1,)),
+        ('bird_id', f'S{BIRD_ID_BYTES}', (max_birds,)),
+        ('bird_position', np.float32, (max_birds, 2)),
+        ('bird_state', np.uint8, (max_birds,)),
+        ('accent_mix', np.float32, (max_birds,)),
+        ('human', np.float32, (max_humans, HUMAN_FIELDS)),
+        ('human_id', np.int64, (max_humans,)),
+        ('colors', np.uint8, (num_pixels, 3)),
+        ('brightness', np.float32, (num_pixels,)),
+        ('winner', np.int32, (num_pixels,)),
+        ('color_choice', np.uint8, (num_pixels,)),
+    ]
+
+def _layout(num_pixels, max_birds, max_humans):
+    """Returns ({field: (offset, dtype, shape)}, slot_size) with 8-byte aligned fields."""
+    offsets, offset = {}, 0
+    for name, dtype, shape in _slot_fields(num_pixels, max_birds, max_humans):
+        offsets[name] = (offset, dtype, shape)
+        offset += (np.dtype(dtype).itemsize * int(np.prod(shape)) + 7) & ~7
+    return offsets, offset
+
+class SnapshotRing:
+    """
+    A ring of world snapshots and LED frames in multiprocessing.shared_memory.
+    The LED process creates it and publishes every frame; a preview process attaches
+    by name and reads the newest complete frame at its own pace.
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self.header[H_MAGIC] != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a snapshot ring.")
+        self.num_pixels, self.max_birds, self.max_humans, self.num_slots = (int(v) for v in self.header[H_PIXELS:H_SLOTS + 1])
+        layout, slot_size = _layout(self.num_pixels, self.max_birds, self.max_humans)
+        base = HEADER_FIELDS * 8
+        self.slots = []
+        for i in range(self.num_slots):
+            start = base + i * slot_size
+            self.slots.append({name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start + offset)
+                               for name, (offset, dtype, shape) in layout.items()})
+        # 書き込み側: 今の顔ぶれと、各スロットに書いてある顔ぶれの世代
+        self._profiles = None
+        self.cast_generation = 0
+        self._slot_casts = [0] * self.num_slots
+        self._bird_ids = np.zeros(self.max_birds, dtype=f'S{BIRD_ID_BYTES}')
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, num_pixels, max_birds, max_humans=64, num_slots=4):
+        _, slot_size = _layout(num_pixels, max_birds, max_humans)
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_FIELDS * 8 + slot_size * num_slots)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (MAGIC, num_pixels, max_birds, max_humans, num_slots, 0, 0, 0)
+        del header # 共有メモリを閉じられるよう、ビューを残さない
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        # 後片付け (unlink) は作った側だけが行う
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    # --- Writer (LED process) ---
+
+    def publish(self, snapshot, renderer):
+        """Copies a WorldSnapshot and the colors calculated from it into the next slot. Never blocks."""
+        seq = int(self.header[H_LATEST]) + 1
+        slot = self.slots[seq % self.num_slots]
+        meta = slot['meta']
+        meta[0] = 2 * seq - 1 # 奇数: 書き込み中
+
+        num_birds = min(snapshot.num_birds, self.max_birds)
+        if snapshot.profiles is not self._profiles:
+            self._set_cast(snapshot.profiles)
+        if self._slot_casts[seq % self.num_slots] != self.cast_generation:
+            slot['bird_id'][:] = self._bird_ids
+            self._slot_casts[seq % self.num_slots] = self.cast_generation
+        slot['bird_position'][:num_birds] = snapshot.bird_position[:num_birds]
+        slot['bird_state'][:num_birds] = snapshot.bird_state[:num_birds]
+        slot['accent_mix'][:num_birds] = renderer.accent_mix[:num_birds]
+
+        num_humans = min(snapshot.num_humans, self.max_humans)
+        human = slot['human']
+        human[:num_humans, 0:2] = snapshot.human_position[:num_humans]
+        human[:num_humans, 2] = snapshot.human_size[:num_humans]
+        human[:num_humans, 3:5] = snapshot.human_velocity[:num_humans]
+        human[:num_humans, 5] = snapshot.human_size_change[:num_humans]
+        slot['human_id'][:num_humans] = snapshot.human_id[:num_humans]
+
+        slot['colors'][:] = renderer.final_pixel_colors
+        slot['brightness'][:] = renderer.brightness_map
+        slot['winner'][:] = renderer.winner_map
+        slot['color_choice'][:] = renderer.color_choice
+        meta[1], meta[2], meta[3], meta[4] = num_birds, num_humans, snapshot.frame, self.cast_generation
+        slot['time'][0] = snapshot.time
+
+        meta[0] = 2 * seq # 偶数: 完成
+        self.header[H_LATEST] = seq
+
+    def _set_cast(self, profiles):
+        if len(profiles) > self.max_birds:
+            print(f"WARNING: The preview shows only the first {self.max_birds} of {len(profiles)} birds "
+                  f"(raise preview.max_birds in settings.yaml).")
+        self._bird_ids[:] = b''
+        self._bird_ids[:min(len(profiles), self.max_birds)] = [profile.id.encode() for profile in profiles[:self.max_birds]]
+        self._profiles = profiles
+        self.cast_generation += 1
+
+    def mark_closed(self):
+        self.header[H_CLOSED] = 1
+
+    # --- Reader (preview process) ---
+
+    @property
+    def closed(self):
+        return bool(self.header[H_CLOSED])
+
+    @property
+    def latest_seq(self):
+        return int(self.header[H_LATEST])
+
+    def read_latest(self, known_cast=None, retries=3):
+        """
+        Returns a dict with copies of the newest complete slot, or None if none could be read.
+        'bird_ids' is only filled in when the slot's cast generation differs from known_cast (otherwise None).
+        """
+        for _ in range(retries):
+            seq = self.latest_seq
+            if seq == 0:
+                return None
+            slot = self.slots[seq % self.num_slots]
+            if slot['meta'][0] != 2 * seq:
+                continue # 書き込みが一周して上書き中
+            num_birds, num_humans, cast = int(slot['meta'][1]), int(slot['meta'][2]), int(slot['meta'][4])
+            snapshot = {
+                'seq': seq,
+                'frame': int(slot['meta'][3]),
+                'cast': cast,
+                'bird_ids': None if cast == known_cast else [bird_id.decode() for bird_id in slot['bird_id'][:num_birds]],
+                'time': float(slot['time'][0]),
+                'bird_position': slot['bird_position'][:num_birds].copy(),
+                'bird_state': slot['bird_state'][:num_birds].copy(),
+                'accent_mix': slot['accent_mix'][:num_birds].copy(),
+                'human': slot['human'][:num_humans].copy(),
+                'human_id': slot['human_id'][:num_humans].copy(),
+                'colors': slot['colors'].copy(),
+                'brightness': slot['brightness'].copy(),
+                'winner': slot['winner'].copy(),
+                'color_choice': slot['color_choice'].copy(),
+            }
+            if slot['meta'][0] == 2 * seq: # 読んでいる間に書き換えられていなければ完成
+                return snapshot
+        return None
+
+    def close(self):
+        # ビューを先に捨てないと、共有メモリを閉じる時に BufferError になる
+        self.header = None
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
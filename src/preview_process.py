@@ -0,0 +1,84 @@
+# src/preview_process.py
+import multiprocessing
+import numpy as np
+
+def run_preview(shm_name, settings, pixel_model_positions, model_size, lidar_pose=None, fps=60):
+    """
+    Entry point of the preview process: draws the debug and art views from the snapshot ring.
+    Closing this window only ends the preview; the installation keeps running.
+    The birds' profiles are (re)built whenever the ring reports a new cast (hot reload of the cast or bird params).
+    """
+    import signal
+    import pygame
+    from config.config import load_bird_params
+    from src.renderer import Renderer
+    from src.coordinates import CoordinateSystem
+    from src.preview_ipc import SnapshotRing
+    from src.snapshot import BirdProfile, WorldSnapshot
+
+    # Ctrl+C は LED 側のプロセスが受け取り、終了時にこちらへ知らせる (closed フラグ)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = SnapshotRing.attach(shm_name)
+    view_width, view_height = settings.get('view_width', 800), settings.get('view_height', 800)
+    pygame.init()
+    screen = pygame.display.set_mode((view_width * 2, view_height))
+    pygame.display.set_caption("Preview (separate process) | Left: Debug View | Right: Artistic View")
+    clock = pygame.time.Clock()
+    coord_system = CoordinateSystem(view_size=(view_width, view_height), model_size=model_size)
+    renderer = Renderer(settings, pixel_model_positions, coord_system, lidar_pose=lidar_pose)
+    world, cast = None, None
+    parent = multiprocessing.parent_process()
+
+    last_seq = 0
+    running = True
+    while running and not ring.closed and (parent is None or parent.is_alive()):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        snapshot = ring.read_latest(known_cast=cast)
+        if snapshot is not None and snapshot['seq'] != last_seq:
+            last_seq = snapshot['seq']
+            if snapshot['cast'] != cast:
+                # 鳥の顔ぶれかパラメーターが変わった: 生成済みのファイルを読み直して描画用データを作り直す
+                bird_params = load_bird_params()
+                world = WorldSnapshot(tuple(BirdProfile(bird_id, bird_params[bird_id]) for bird_id in snapshot['bird_ids']))
+                cast = snapshot['cast']
+            human = snapshot['human']
+            world.load(snapshot['frame'], snapshot['time'], snapshot['bird_position'], snapshot['bird_state'],
+                       human[:, 0:2], human[:, 3:5], human[:, 2], human[:, 5], snapshot['human_id'])
+            renderer.brightness_map = snapshot['brightness']
+            renderer.winner_map = snapshot['winner']
+            renderer.color_choice = snapshot['color_choice']
+            renderer.accent_mix = snapshot['accent_mix']
+            renderer.final_pixel_colors = snapshot['colors']
+            renderer.draw(screen, world)
+        clock.tick(fps)
+
+    ring.close()
+    pygame.quit()
+
+class PreviewProcess:
+    """Starts the preview in its own process and notices (once) if it goes away."""
+    def __init__(self, ring, settings, pixel_model_positions, model_size, lidar_pose=None):
+        context = multiprocessing.get_context('spawn') # pygame の状態を親から引き継がない
+        self.process = context.Process(
+            target=run_preview, name="preview", daemon=True,
+            args=(ring.name, settings, np.asarray(pixel_model_positions), model_size, lidar_pose))
+        self.reported_exit = False
+
+    def start(self):
+        self.process.start()
+        print(f"Preview window started in a separate process (pid {self.process.pid}).")
+
+    def check(self):
+        """Call occasionally from the LED loop; only logs, never raises."""
+        if not self.reported_exit and not self.process.is_alive():
+            self.reported_exit = True
+            print(f"INFO: Preview process exited (code {self.process.exitcode}). LED output continues.")
+
+    def stop(self, timeout=2.0):
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
@@ -0,0 +1,133 @@
+# src/recording.py
+import os
+import mmap
+import struct
+import time
+import numpy as np
+
+# --- Log format ---------------------------------------------------------------
+# [MAGIC 8 bytes] に続いて、レコードが追記されていくだけのシンプルな形式。
+#   record header: kind (uint8), padding (3 bytes), count (uint32), timestamp (float64)
+#   payload      : KIND_INPUT -> count x 3 float32 ([x, y, size])
+#                  KIND_LEDS  -> count x 3 uint8   ([R, G, B])
+# payloadは8バイト境界までゼロ埋めし、次のヘッダーが常に整列するようにする。
+# 書き込み途中でクラッシュした場合、末尾の不完全なレコードは読み込み時に無視される。
+MAGIC = b"TKLOG\x00\x00\x01"
+RECORD_HEADER = struct.Struct("<B3xId")
+KIND_INPUT = 1
+KIND_LEDS = 2
+
+_PAYLOAD_DTYPES = {KIND_INPUT: np.float32, KIND_LEDS: np.uint8}
+
+def _padded(size):
+    return (size + 7) & ~7
+
+class FrameRecorder:
+    """
+    Appends timestamped input frames and LED frames to a binary log.
+    An existing log is continued: timestamps carry on from its last frame, so they never go backwards.
+    """
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        resume_from = 0.0
+        if not is_new:
+            # 既存のログの続きに書く (ReplayInputSource は時刻が増えていく前提で検索する)
+            log = FrameLog(path)
+            resume_from, valid_size = log.duration, log.end
+            log.close()
+        self.file = open(path, 'ab')
+        if is_new:
+            self.file.write(MAGIC)
+        else:
+            self.file.truncate(valid_size) # 末尾の不完全なレコードは捨てる
+        self.start_time = self.clock() - resume_from
+        print(f"Recording frames to '{path}'")
+
+    def _write(self, kind, data, now=None):
+        data = np.ascontiguousarray(data, dtype=_PAYLOAD_DTYPES[kind]).reshape(-1, 3)
+        payload = data.tobytes()
+        timestamp = (self.clock() if now is None else now) - self.start_time
+        self.file.write(RECORD_HEADER.pack(kind, len(data), timestamp))
+        self.file.write(payload)
+        self.file.write(b"\x00" * (_padded(len(payload)) - len(payload)))
+
+    def record_input(self, detected_objects):
+        self._write(KIND_INPUT, detected_objects)
+
+    def record_leds(self, colors, now=None):
+        """now: clock time of the frame the colors show (default: the time of this call)."""
+        self._write(KIND_LEDS, colors, now)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print(f"Recording saved to '{self.path}'")
+
+class FrameLog:
+    """
+    Read-only view of a recorded log. The file is memory-mapped and indexed once,
+    so individual frames are returned as zero-copy NumPy views.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"'{path}' is not a frame log (bad magic)")
+
+        kinds, counts, times, offsets = [], [], [], []
+        pos, end = len(MAGIC), len(self._mmap)
+        while pos + RECORD_HEADER.size <= end:
+            kind, count, timestamp = RECORD_HEADER.unpack_from(self._mmap, pos)
+            payload_offset = pos + RECORD_HEADER.size
+            payload_size = count * 3 * np.dtype(_PAYLOAD_DTYPES.get(kind, np.uint8)).itemsize
+            if kind not in _PAYLOAD_DTYPES or payload_offset + payload_size > end:
+                break # 不完全なレコード（書き込み中のクラッシュなど）
+            kinds.append(kind); counts.append(count); times.append(timestamp); offsets.append(payload_offset)
+            pos = payload_offset + _padded(payload_size)
+        self.end = pos # 最後の完全なレコードの終わり
+
+        kinds = np.array(kinds, dtype=np.uint8)
+        self._index = {}
+        for kind in _PAYLOAD_DTYPES:
+            mask = kinds == kind
+            self._index[kind] = (
+                np.array(times, dtype=np.float64)[mask],
+                np.array(counts, dtype=np.int64)[mask],
+                np.array(offsets, dtype=np.int64)[mask],
+            )
+
+    def times(self, kind):
+        return self._index[kind][0]
+
+    def count(self, kind):
+        return len(self._index[kind][0])
+
+    def frame(self, kind, index):
+        _, counts, offsets = self._index[kind]
+        return np.frombuffer(self._mmap, dtype=_PAYLOAD_DTYPES[kind],
+                             count=int(counts[index]) * 3, offset=int(offsets[index])).reshape(-1, 3)
+
+    def input_frame(self, index):
+        return self.frame(KIND_INPUT, index)
+
+    def led_frame(self, index):
+        return self.frame(KIND_LEDS, index)
+
+    @property
+    def duration(self):
+        ends = [t[-1] for t, _, _ in self._index.values() if len(t)]
+        return max(ends) if ends else 0.0
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass # まだ参照されているフレームがある場合は、GCに任せる
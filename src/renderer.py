@@ -2,6 +2,10 @@
 import pygame
 import numpy as np
 from src.coordinates import CoordinateSystem
+from config.config import ENVELOPE_FPS
+from src.pixel_lookup import PixelLookup
+from src import kernels
+from src.snapshot import PATTERN_KEYS, CHIRPING
 
 class Renderer:
     """
@@ -20,12 +24,8 @@ class Renderer:
         # Settings
         self.view_width = settings.get('view_width', 800)
         self.view_height = settings.get('view_height', 800)
-        self.min_brightness_falloff = settings.get('min_brightness_falloff', 0.3)
         self.debug_min_bird_size_px = 6.0
 
-        # シミュレーター用の色設定を読み込む
-        self.simulator_colors = settings.get('simulator_visuals', {})
-
         self.lidar_pose = lidar_pose # LiDARの姿勢情報を保存
 
         # --- LiDARアイコンの事前生成 (効率化のため) ---
@@ -33,12 +33,13 @@ class Renderer:
         if self.lidar_pose:
             self._create_lidar_icon()
 
-        # --- 全体的な輝度設定 ---
-        self.global_brightness = settings.get('global_brightness', 0.2)
+        self.chirp_peak_brightness = 1.2 # keyframes のパルスと同じ最大輝度
+        self.apply_settings(settings)
 
         # Font for debug text
         pygame.font.init()
         self.font = pygame.font.SysFont('Arial', 16)
+        self.overlay_font = None # オーバーレイを使う時だけ作る
 
         # Coordinate system
         self.coord_system = coord_system
@@ -58,6 +59,58 @@ class Renderer:
         # Calculated colors from the last frame, can be fetched for real-time output
         self.final_pixel_colors = np.zeros((self.num_pixels, 3), dtype=int)
 
+        # 毎フレーム使い回す作業用バッファ (長時間運転でGCを起こさないよう、フレームごとに配列を作らない)
+        self.pixel_lookup = PixelLookup(self.pixel_model_positions)
+        self.brightness_map = np.zeros(self.num_pixels)
+        self.winner_map = np.full(self.num_pixels, -1, dtype=int)
+        self.color_choice = np.zeros(self.num_pixels, dtype=int) # 0: ベース色 (+アクセント寄せ), 1: アクセント色
+        self._pixel_lit = np.zeros(self.num_pixels, dtype=bool)
+        self._winner_safe = np.zeros(self.num_pixels, dtype=int)
+        self._pixel_color = np.zeros((self.num_pixels, 3))
+        self._resize_bird_buffers(0)
+
+    def apply_settings(self, settings):
+        """Reads the settings that can change while running (also used by the hot reload)."""
+        self.min_brightness_falloff = settings.get('min_brightness_falloff', 0.3)
+
+        # シミュレーター用の色設定を読み込む
+        self.simulator_colors = settings.get('simulator_visuals', {})
+
+        # --- 全体的な輝度設定 ---
+        self.global_brightness = settings.get('global_brightness', 0.2)
+
+        # --- 鳴き声の光の表現 ---
+        # "keyframes": オンセットごとのパルス, "dense": 音の形に沿ったフレームごとの明るさ
+        self.chirp_light_mode = settings.get('chirp_light_mode', 'keyframes')
+        self.chirp_centroid_mix = settings.get('chirp_centroid_mix', 0.0)
+
+    def _resize_bird_buffers(self, num_birds):
+        self.accent_mix = np.zeros(num_birds) # ベース色をアクセント色へ寄せる割合 (dense モードのみ)
+        self.pixel_centers = np.zeros(num_birds, dtype=np.int64)
+        self._bird_colors = np.zeros((num_birds, 2, 3)) # [鳥, (ベース, アクセント), RGB]
+        self._spreads = np.zeros(num_birds, dtype=np.int64) # 光の広がり (中心から片側のピクセル数)
+        self._bird_brightness = np.zeros(num_birds)
+        self._mask_offset = np.zeros(num_birds, dtype=np.int64)
+        self._mask_length = np.zeros(num_birds, dtype=np.int64)
+        self._chirp_pixel_count = np.zeros(num_birds) # 鳴いている時の光る幅 (int にする前)
+        self._profile_tables = None # 下の表を作った時の profiles
+
+    def _build_profile_tables(self, profiles):
+        """
+        Per-bird arrays of the profile data used every frame: base pixel counts, sizes and colours, and every bird's
+        expanded colour patterns (BirdProfile.pattern_masks) packed into one array for the kernels.
+        """
+        self._base_pixel_counts = np.array([profile.base_pixel_count for profile in profiles], dtype=np.int64)
+        self._sizes = np.array([profile.size for profile in profiles], dtype=float)
+        self._base_colors = np.array([profile.base_color for profile in profiles], dtype=float).reshape(-1, 3)
+        self._accent_colors = np.array([profile.accent_color for profile in profiles], dtype=float).reshape(-1, 3)
+        masks = [mask for profile in profiles for mask in profile.pattern_masks]
+        self._masks = np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint8)
+        lengths = np.array([len(mask) for mask in masks], dtype=np.int64).reshape(-1, 2)
+        self._pattern_lengths = lengths                                             # [鳥, (通常時, 鳴いている時)]
+        self._pattern_offsets = (np.cumsum(lengths) - lengths.ravel()).reshape(-1, 2)
+        self._profile_tables = profiles
+
     def _create_lidar_icon(self):
         """LiDARを表す三角形のアイコンを事前に描画しておく"""
         icon_size = 15 # ピクセル単位
@@ -97,86 +150,87 @@ class Renderer:
 
     def calculate_pixel_colors(self, world):
         """
-        Calculates the final color for each pixel based on the state of the world.
+        Calculates the final color for each pixel from a WorldSnapshot (or a World's latest snapshot).
+        Only the snapshot is read, so this can run while the next World.update is in progress.
         This updates the internal `self.final_pixel_colors` attribute.
         """
-        brightness_map = np.zeros(self.num_pixels, dtype=float)
-        winner_map = np.full(self.num_pixels, -1, dtype=int)
+        snapshot = getattr(world, 'snapshot', world)
+        profiles = snapshot.profiles
+        num_birds = len(profiles)
+        if len(self.pixel_centers) != num_birds:
+            self._resize_bird_buffers(num_birds)
+        if self._profile_tables is not profiles:
+            self._build_profile_tables(profiles)
+        brightness_map, winner_map, accent_mix = self.brightness_map, self.winner_map, self.accent_mix
+        brightness_map.fill(0.0)
+        winner_map.fill(-1)
+        accent_mix.fill(0.0)
         
-        pixel_centers = [np.argmin(np.linalg.norm(self.pixel_model_positions - bird.position, axis=1)) for bird in world.birds]
-
-        for i, bird in enumerate(world.birds):
-            center_idx = pixel_centers[i]
-            
-            # 1. パターンと基本サイズを取得
-            color_pattern, num_pixels_pattern = bird.get_current_light_pattern()
-
-            # 2. 輝度を決定 (通常時はグローバル設定値、CHIRPING時は動的計算)
-            brightness = self.global_brightness
-            if bird.state == "CHIRPING":
-                brightness = 0.0 # デフォルトは0
-                active_pattern = bird.chirp_patterns.get(bird.active_pattern_key, [])
-                if active_pattern:
-                    # パターンから現在の輝度を補間して計算
-                    # (バグ修正1: ループ変数を i -> pat_idx に変更)
-                    # (バグ修正2: ループ範囲を len-1 -> len にし、最後のキーフレームまでチェック)
-                    for pat_idx in range(len(active_pattern)):
-                        # 最後のキーフレームに達したら、その輝度を使いループを抜ける
-                        if pat_idx == len(active_pattern) - 1:
-                            brightness = active_pattern[pat_idx][1]
-                            break
-
-                        start_time, start_bright = active_pattern[pat_idx]
-                        end_time, end_bright = active_pattern[pat_idx+1]
-                        
-                        if start_time <= bird.chirp_playback_time < end_time:
-                            time_delta = end_time - start_time
-                            progress = (bird.chirp_playback_time - start_time) / time_delta if time_delta > 0 else 0
-                            brightness = start_bright + (end_bright - start_bright) * progress
-                            break
-                
-                # 輝度に基づいて描画サイズを動的に変更
-                num_pixels_pattern = int(num_pixels_pattern * (1 + brightness * bird.params['size'] * 0.5))
-
-            # 3. 光の広がりを計算
-            spread = num_pixels_pattern // 2
-
-            for j in range(-spread, spread + 1):
-                pixel_idx = center_idx + j
-                if 0 <= pixel_idx < self.num_pixels:
-                    linear_falloff = (spread - abs(j)) / spread if spread > 0 else 1.0
-                    falloff = self.min_brightness_falloff + (1.0 - self.min_brightness_falloff) * linear_falloff
-                    final_brightness = brightness * falloff
-                    if final_brightness > brightness_map[pixel_idx]:
-                        brightness_map[pixel_idx] = final_brightness
-                        winner_map[pixel_idx] = i
-
-        # Reset colors and then fill them in
-        self.final_pixel_colors.fill(0)
-        for pixel_idx in range(self.num_pixels):
-            bird_idx = winner_map[pixel_idx]
-            if bird_idx != -1 and bird_idx < len(world.birds):
-                bird = world.birds[bird_idx]
-                pixel_offset = pixel_idx - pixel_centers[bird_idx]
-                pattern, _ = bird.get_current_light_pattern()
-                total_pixels = sum(p[1] for p in pattern)
-                
-                if total_pixels > 0:
-                    color_type, start_pixel = 'b', -total_pixels // 2
-                    for p_type, p_count in pattern:
-                        if start_pixel <= pixel_offset < start_pixel + p_count:
-                            color_type = p_type
-                            break
-                        start_pixel += p_count
-                    
-                    color = bird.accent_color if color_type == 'a' else bird.base_color
-                    self.final_pixel_colors[pixel_idx] = np.clip(color * brightness_map[pixel_idx], 0, 255)
-
-        # --- ▼ここから追加 ---
-        # 描画処理で再利用するために、計算結果をインスタンス変数に保存
-        self.brightness_map = brightness_map
-        self.winner_map = winner_map
-        # --- ▲ここまで追加 ---
+        pixel_centers = self.pixel_lookup.nearest_for_positions(snapshot.bird_position, self.pixel_centers)
+        # 鳴き声の光は、数えたフレームではなく World の時計からの経過時間で引く
+        now = snapshot.time
+        states, chirp_start_times, chirp_patterns = snapshot.bird_state, snapshot.chirp_start_time, snapshot.chirp_pattern
+
+        # 1. 通常時: 光の広がりはパターンの基本サイズの半分、輝度はグローバル設定値 (全ての鳥をまとめて)
+        chirping = states == CHIRPING
+        np.floor_divide(self._base_pixel_counts, 2, out=self._spreads)
+        self._bird_brightness.fill(self.global_brightness)
+
+        # 2. 鳴いている鳥だけ、輝度を鳴き声のパターンから動的に計算する
+        for i in np.flatnonzero(chirping):
+            bird = profiles[i]
+            brightness = 0.0 # デフォルトは0
+            playback_time = max(now - chirp_start_times[i], 0.0)
+            pattern_key = PATTERN_KEYS[chirp_patterns[i]] if chirp_patterns[i] >= 0 else None
+            active_pattern = bird.chirp_patterns.get(pattern_key)
+            envelope = bird.chirp_envelopes.get(pattern_key)
+            if self.chirp_light_mode == 'dense' and envelope is not None and len(envelope) > 0:
+                # フレームごとのエンベロープをそのまま引く (O(1))
+                frame = int(playback_time * ENVELOPE_FPS)
+                if frame < len(envelope):
+                    brightness = envelope[frame] / 255.0 * self.chirp_peak_brightness
+                    centroid = bird.chirp_centroids.get(pattern_key)
+                    if centroid is not None and frame < len(centroid):
+                        accent_mix[i] = centroid[frame] / 255.0 * self.chirp_centroid_mix
+            elif active_pattern is not None and len(active_pattern) > 0:
+                # パターン ((N, 2) の [time, brightness] 配列) から現在の輝度を線形補間で求める
+                # 最後のキーフレームを過ぎたら、その輝度を保つ
+                brightness = float(np.interp(playback_time, active_pattern[:, 0], active_pattern[:, 1]))
+            self._bird_brightness[i] = brightness
+
+        # 3. 鳴いている鳥は輝度に基づいて描画サイズを動的に変更する (合成は全ての鳥の分をまとめて行う)
+        if chirping.any():
+            chirp_pixel_count = self._chirp_pixel_count
+            np.multiply(self._bird_brightness, self._sizes, out=chirp_pixel_count)
+            chirp_pixel_count *= 0.5
+            chirp_pixel_count += 1
+            chirp_pixel_count *= self._base_pixel_counts
+            np.copyto(self._spreads, chirp_pixel_count.astype(np.int64) // 2, where=chirping)
+
+        # 鳥の色 (ベース色は centroid に応じてアクセント色へ寄せる)
+        colors = self._bird_colors
+        colors[:, 1] = self._accent_colors
+        np.subtract(self._accent_colors, self._base_colors, out=colors[:, 0])
+        colors[:, 0] *= accent_mix[:, None]
+        colors[:, 0] += self._base_colors
+
+        # 4. 光の広がりを重ね (ピクセルごとに一番明るい鳥が勝つ)、各ピクセルがパターンのどの色 ('a' / 'b') に当たるかを決める
+        kernels.composite_spans(pixel_centers, self._spreads, self._bird_brightness, self.min_brightness_falloff,
+                                brightness_map, winner_map)
+        np.copyto(self._mask_offset, self._pattern_offsets[:, 0])
+        np.copyto(self._mask_offset, self._pattern_offsets[:, 1], where=chirping)
+        np.copyto(self._mask_length, self._pattern_lengths[:, 0])
+        np.copyto(self._mask_length, self._pattern_lengths[:, 1], where=chirping)
+        kernels.choose_colors(winner_map, pixel_centers, self._mask_offset, self._mask_length, self._masks,
+                              self.color_choice, self._pixel_lit)
+
+        # 5. 色 x 輝度 をまとめて計算し、光らないピクセルは消す
+        np.maximum(winner_map, 0, out=self._winner_safe)
+        if num_birds > 0:
+            np.multiply(self._bird_colors[self._winner_safe, self.color_choice], brightness_map[:, None], out=self._pixel_color)
+            np.clip(self._pixel_color, 0, 255, out=self._pixel_color)
+        self._pixel_color[~self._pixel_lit] = 0.0
+        self.final_pixel_colors[...] = self._pixel_color
 
     def get_final_colors(self):
         """Returns the latest calculated pixel colors."""
@@ -217,48 +271,74 @@ class Renderer:
         debug_surface = self.font.render(debug_text, True, (255, 255, 0))
         surface.blit(debug_surface, (10, 10))
 
-    def render(self, screen, world):
+    def _draw_overlay(self, surface, lines):
+        """右上に等幅の表 (フレームタイミングなど) を半透明の背景つきで描く"""
+        if self.overlay_font is None:
+            self.overlay_font = pygame.font.SysFont('Courier New, monospace', 14)
+        line_height = self.overlay_font.get_linesize()
+        text_surfaces = [self.overlay_font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(t.get_width() for t in text_surfaces) + 10
+        background = pygame.Surface((width, line_height * len(lines) + 10), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 160))
+        x = self.view_width - width - 10
+        surface.blit(background, (x, 10))
+        for i, text_surface in enumerate(text_surfaces):
+            surface.blit(text_surface, (x + 5, 15 + i * line_height))
+
+    def render(self, screen, world, overlay_lines=None):
         """
         Calculates all colors and draws the full scene to the provided screen.
         """
         # 1. Calculate the light/color values for this frame (This updates self.final_pixel_colors, self.brightness_map, etc.)
         self.calculate_pixel_colors(world)
+        self.draw(screen, world, overlay_lines)
 
+    def draw(self, screen, world, overlay_lines=None):
+        """
+        Draws a WorldSnapshot (or a World's latest snapshot) using the colors from the last
+        calculate_pixel_colors() call. overlay_lines (e.g. frame timing) are drawn in the corner of the debug view.
+        """
+        snapshot = getattr(world, 'snapshot', world)
+        profiles = snapshot.profiles
         # 2. Draw the Debug View (Using Simulator Colors)
         self.debug_surface.blit(self.static_debug_bg, (0, 0))
 
         # --- LiDAR姿勢の描画 (三角形として) ---
         self._draw_lidar_pose(self.debug_surface)
 
-        for bird in world.birds:
+        for bird, position in zip(profiles, snapshot.bird_position):
             # --- ▼ここから修正 ▼ ---
             # シミュレーター用の色を取得。なければ物理色をフォールバックとして使用。
             sim_colors = self.simulator_colors.get(bird.id, {})
             base_color = sim_colors.get('base_color', bird.base_color)
             accent_color = sim_colors.get('accent_color', bird.accent_color)
             
-            pos_px = self.coord_system.model_to_view(bird.position)
-            size_px = max(bird.params['size'] * 2.5, self.debug_min_bird_size_px)
+            pos_px = self.coord_system.model_to_view(position)
+            size_px = max(bird.size * 2.5, self.debug_min_bird_size_px)
             pygame.draw.circle(self.debug_surface, base_color, pos_px, size_px)
             pygame.draw.circle(self.debug_surface, accent_color, pos_px, size_px * 0.4)
             # --- ▲ここまで修正 ▲ ---
 
-        for human in world.humans:
-            pos_px = self.coord_system.model_to_view(human.position)
+        for i in range(snapshot.num_humans):
+            position = snapshot.human_position[i]
+            pos_px = self.coord_system.model_to_view(position)
             pygame.draw.circle(self.debug_surface, (255, 255, 255), pos_px, 10)
 
             # --- 人間の詳細情報を描画 ---
             info_text = (
-                f"Pos: ({human.position[0]:.2f}, {human.position[1]:.2f}) | "
-                f"Size: {human.size:.2f} | "
-                f"Vel: {np.linalg.norm(human.velocity):.2f} | "
-                f"SizeΔ: {human.size_change:.2f}"
+                f"Pos: ({position[0]:.2f}, {position[1]:.2f}) | "
+                f"Size: {snapshot.human_size[i]:.2f} | "
+                f"Vel: {np.linalg.norm(snapshot.human_velocity[i]):.2f} | "
+                f"SizeΔ: {snapshot.human_size_change[i]:.2f}"
             )
             text_surface = self.font.render(info_text, True, (255, 255, 255))
             # テキストを円の少し下に表示
             text_rect = text_surface.get_rect(center=(pos_px[0], pos_px[1] + 20))
             self.debug_surface.blit(text_surface, text_rect)
 
+        if overlay_lines:
+            self._draw_overlay(self.debug_surface, overlay_lines)
+
         # 3. Draw the Artistic View (Translating physical brightness to simulator colors)
         self.art_surface.blit(self.static_art_bg, (0, 0))
         # --- ▼ここから全面修正 ▼ ---
@@ -267,30 +347,16 @@ class Renderer:
             brightness = self.brightness_map[i]
 
             # ピクセルが光っている場合のみ描画
-            if bird_idx != -1 and bird_idx < len(world.birds) and brightness > 0.01:
-                bird = world.birds[bird_idx]
+            if bird_idx != -1 and bird_idx < len(profiles) and brightness > 0.01:
+                bird = profiles[bird_idx]
                 
                 # シミュレーター用の色を取得
                 sim_colors = self.simulator_colors.get(bird.id, {})
                 sim_base_color = np.array(sim_colors.get('base_color', bird.base_color))
                 sim_accent_color = np.array(sim_colors.get('accent_color', bird.accent_color))
 
-                # 物理LED側で計算された「どの色が使われるべきか」のロジックを再利用
-                pixel_offset = i - np.argmin(np.linalg.norm(self.pixel_model_positions - bird.position, axis=1))
-                pattern, total_pixels = bird.get_current_light_pattern()
-                total_pixels = sum(p[1] for p in pattern)
-
-                color_type_to_use = 'b' # デフォルトはbase_color
-                if total_pixels > 0:
-                    start_pixel = -total_pixels // 2
-                    for p_type, p_count in pattern:
-                        if start_pixel <= pixel_offset < start_pixel + p_count:
-                            color_type_to_use = p_type
-                            break
-                        start_pixel += p_count
-                
-                # 最終的なシミュレーター用の色を決定
-                color_to_use = sim_accent_color if color_type_to_use == 'a' else sim_base_color
+                # 物理LED側で計算された「どの色が使われるべきか」(color_choice) をそのまま使う
+                color_to_use = sim_accent_color if self.color_choice[i] == 1 else sim_base_color + (sim_accent_color - sim_base_color) * self.accent_mix[bird_idx]
                 final_sim_color = np.clip(color_to_use * brightness, 0, 255)
 
                 pygame.draw.circle(self.art_surface, final_sim_color, pos_px, 4)
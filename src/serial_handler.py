@@ -1,9 +1,14 @@
 # src/serial_handler.py
+import asyncio
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 import serial
 import time
 import numpy as np
+from src.startup import startup_report
+
+ARDUINO_RESET_SECONDS = 2.0 # ポートを開くとArduinoがリセットされる (スケッチの setup() も delay(2000) で待つ)
 
 class SerialWriterThread(threading.Thread):
     """
@@ -20,11 +25,23 @@ class SerialWriterThread(threading.Thread):
         self.running = False
         self.ser = None
 
+        # パケットは使い回す: [マジックバイト] + [R,G,B, R,G,B, ...]
+        self.packet = bytearray(1 + pixel_count * 3)
+        self.packet[0] = magic_byte
+        self._packet_pixels = np.frombuffer(self.packet, dtype=np.uint8, offset=1).reshape(pixel_count, 3)
+
+        # send() は色をここへ写してから渡す。呼び出し側は次のフレームで同じ配列を書き換えるので、
+        # キューの2枚 + 送信中の1枚より多く用意しておく
+        self._frames = np.zeros((4, pixel_count, 3), dtype=np.uint8)
+        self._next_frame = 0
+        self._idle_frame = None # set_idle_frame() のフレーム (キューとは別に持ち、接続したらすぐ書く)
+
     def connect(self):
         try:
             self.ser = serial.Serial(self.port, self.baudrate, timeout=1, write_timeout=1)
             print(f"Successfully connected to Arduino on {self.port}")
-            time.sleep(2) # Arduinoのリセット待機
+            startup_report.mark("serial port open")
+            time.sleep(ARDUINO_RESET_SECONDS) # Arduinoのリセット待機 (この間に届いたフレームはキューに残る)
             return True
         except serial.SerialException as e:
             print(f"FATAL: Could not connect to Arduino: {e}")
@@ -35,17 +52,28 @@ class SerialWriterThread(threading.Thread):
         if not self.connect():
             self.running = False
             return
-            
+
+        first_frame = True
+        simulation_started = False
         while self.running:
             try:
-                # キューから色データを取得（タイムアウト付き）
-                colors = self.queue.get(timeout=1)
+                # 最初のシミュレーションのフレームまでは、待機中の色が届き次第それを書く (接続の後に届いても)。
+                # シミュレーションのフレームを書いた後に届いた待機中の色は捨てる
+                idle_frame, self._idle_frame = self._idle_frame, None
+                if idle_frame is not None and not simulation_started:
+                    colors = idle_frame
+                else:
+                    # 待機中の色がまだ届いていなければ、それに早く気付けるよう短い間隔で見直す
+                    colors = self.queue.get(timeout=1 if simulation_started else 0.05)
+                    simulation_started = True
                 
-                # パケットを構築: [マジックバイト] + [R,G,B, R,G,B, ...]
-                packet = bytearray([self.magic_byte]) + colors.astype(np.uint8).tobytes()
+                packet = self.build_packet(colors)
 
                 if self.ser and self.ser.is_open:
                     self.ser.write(packet)
+                    if first_frame:
+                        startup_report.mark("first LED frame")
+                        first_frame = False
             except queue.Empty:
                 continue # データがなければループを続ける
             except Exception as e:
@@ -56,9 +84,17 @@ class SerialWriterThread(threading.Thread):
             self.ser.close()
         print("Serial thread stopped.")
 
+    def build_packet(self, colors):
+        """Writes colors into the preallocated packet (no new buffers) and returns it."""
+        np.copyto(self._packet_pixels, colors, casting='unsafe')
+        return self.packet
+
     def send(self, data):
-        """メインスレッドから描画データをこのスレッドに渡す"""
+        """出力段 (メインスレッドまたは出力スレッド) から描画データをこのスレッドに渡す"""
         if not self.running: return
+        frame = self._frames[self._next_frame]
+        self._next_frame = (self._next_frame + 1) % len(self._frames)
+        np.copyto(frame, data, casting='unsafe')
         
         # キューが満杯なら、古いデータを捨てて新しいデータを入れる（最新の描画を優先）
         if self.queue.full():
@@ -66,9 +102,124 @@ class SerialWriterThread(threading.Thread):
                 self.queue.get_nowait()
             except queue.Empty:
                 pass
-        self.queue.put(data)
+        self.queue.put(frame)
+
+    def set_idle_frame(self, colors):
+        """
+        Holds a frame that run() writes as soon as the port is ready (right after connect(), or when this is called
+        later), before any queued simulation frame. Can be called before the thread has started; ignored once a
+        simulation frame has been written.
+        """
+        self._idle_frame = np.array(colors, dtype=np.uint8)
 
     def close(self):
         """スレッドを安全に停止させる"""
         print("Stopping serial thread...")
-        self.running = False
\ No newline at end of file
+        self.running = False
+
+class AsyncSerialWriter:
+    """
+    asyncio ランタイム用のシリアル出力 (SerialWriterThread と同じパケット)。
+    pyserial の書き込みはブロッキングなので専用の1スレッドで行う。書き込み中に届いたフレームは
+    最新の1枚だけを残し (バックプレッシャー)、シミュレーションのループは待たない。
+    """
+    def __init__(self, port, baudrate, magic_byte, pixel_count):
+        self.port = port
+        self.baudrate = baudrate
+        self.magic_byte = magic_byte
+        self.pixel_count = pixel_count
+        self.running = False
+        self.ser = None
+        self.dropped_frames = 0 # 書き込みが追いつかず捨てたフレーム数
+
+        self.packet = bytearray(1 + pixel_count * 3)
+        self.packet[0] = magic_byte
+        self._packet_pixels = np.frombuffer(self.packet, dtype=np.uint8, offset=1).reshape(pixel_count, 3)
+        self._pending = np.zeros((pixel_count, 3), dtype=np.uint8)
+        self._has_pending = False
+        self._wakeup = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serial")
+        self._opening = None # begin_connect() で開き始めたポート (concurrent.futures.Future)
+
+    def begin_connect(self):
+        """Starts opening the port now, before the event loop exists, so the Arduino resets while the rest starts up."""
+        if self._opening is None:
+            self._opening = self._executor.submit(self._open)
+
+    def _open(self):
+        ser = serial.Serial(self.port, self.baudrate, timeout=1, write_timeout=1)
+        startup_report.mark("serial port open")
+        return ser, time.monotonic()
+
+    async def connect(self):
+        self.begin_connect()
+        try:
+            self.ser, opened_at = await asyncio.wrap_future(self._opening)
+        except serial.SerialException as e:
+            print(f"FATAL: Could not connect to Arduino: {e}")
+            return False
+        print(f"Successfully connected to Arduino on {self.port}")
+        # Arduinoのリセット待機 (他のタスクは動き続ける)。起動中に過ぎた分は待たない
+        await asyncio.sleep(max(ARDUINO_RESET_SECONDS - (time.monotonic() - opened_at), 0.0))
+        return True
+
+    async def run(self):
+        """Task body: connects, then writes the newest pending frame whenever one arrives."""
+        self._wakeup = asyncio.Event()
+        if not await self.connect():
+            return
+        self.running = True
+        if self._has_pending:
+            self._wakeup.set() # set_idle_frame() のフレーム
+        loop = asyncio.get_running_loop()
+        first_frame = True
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if not self._has_pending:
+                    continue
+                packet = self.build_packet(self._pending)
+                self._has_pending = False
+                try:
+                    await loop.run_in_executor(self._executor, self.ser.write, packet)
+                except serial.SerialException as e:
+                    print(f"Serial writer error: {e}")
+                    break
+                if first_frame:
+                    startup_report.mark("first LED frame")
+                    first_frame = False
+        finally:
+            self.running = False
+            print("Serial writer stopped.")
+
+    def build_packet(self, colors):
+        """Writes colors into the preallocated packet (no new buffers) and returns it."""
+        np.copyto(self._packet_pixels, colors, casting='unsafe')
+        return self.packet
+
+    def send(self, data):
+        """Hands a frame to the writer task. Never blocks; replaces a frame that is still waiting."""
+        if not self.running: return
+        if self._has_pending:
+            self.dropped_frames += 1
+        np.copyto(self._pending, data, casting='unsafe')
+        self._has_pending = True
+        self._wakeup.set()
+
+    def set_idle_frame(self, colors):
+        """Holds a frame to write as soon as the port is ready, unless the simulation has already sent one."""
+        if not self.running and not self._has_pending:
+            np.copyto(self._pending, colors, casting='unsafe')
+            self._has_pending = True
+
+    def close(self):
+        """Closes the port after any write in progress (call once the run() task has ended)."""
+        if self.ser is None and self._opening is not None and not self._opening.cancel():
+            try:
+                self.ser = self._opening.result()[0] # ランタイムが始まる前に止めた場合も、開いたポートは閉じる
+            except serial.SerialException:
+                pass
+        if self.ser is not None:
+            self._executor.submit(self.ser.close)
+        self._executor.shutdown(wait=True)
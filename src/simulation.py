@@ -1,95 +1,211 @@
+import math
 import numpy as np
-import random
+import time
 from src.objects import Human
+from src.pixel_lookup import PixelLookup
+from src import kernels
+from src.snapshot import BirdProfile, WorldSnapshot
+
+# World が使い回すスナップショットの数。受け取ったスナップショットは、
+# この数 - 1 回先の update までは書き換えられない (出力段を1フレーム遅らせて重ねても安全)
+SNAPSHOT_POOL_SIZE = 4
+
+class MonotonicClock:
+    """Wall clock for live runs. Chirp lights follow real elapsed time, whatever the frame rate."""
+    def advance(self):
+        pass
+
+    def now(self):
+        return time.monotonic()
+
+class FrameClock:
+    """
+    Simulated clock that advances by a fixed step on every World.update.
+    Used for seeded, replayed and offline runs so that the output does not depend on timing.
+    """
+    def __init__(self, fps=60.0):
+        self.step = 1.0 / fps
+        self.time = 0.0
+
+    def advance(self):
+        self.time += self.step
+
+    def now(self):
+        return self.time
 
 class World:
     """
     Manages all simulation objects, tracks them over time, and enforces world rules.
     This is the "environment" or "stage" where the actors live.
     """
-    def __init__(self, model_size, birds):
+    def __init__(self, model_size, birds, rng=None, audio_scheduler=None, clock=None, flocking=None, strip_avoidance=None):
         self.model_width, self.model_height = model_size
         self.model_radius_x = self.model_width / 2.0
         self.model_radius_y = self.model_height / 2.0
         self.birds = birds
         self.humans = []
+        # シミュレーション全体で共有する乱数ジェネレーター (シード固定で再現可能)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # 鳴き声の光の再生位置はこの時計で決まる
+        self.clock = clock if clock is not None else MonotonicClock()
+        self.now = self.clock.now()
         
         # For tracking objects over time
-        self.previous_humans = {} # Stores {id: Human} from the last frame
+        # Human オブジェクトは使い回す (毎フレーム作り直すとGCが走り、長時間運転でカクつく)
+        self.humans = []           # 今フレームの来場者 (追跡IDは human.id)
+        self._next_humans = []     # 次フレーム用 (self.humans と交互に使う)
+        self._human_pool = []      # 見失った来場者のオブジェクト置き場
         self.next_human_id = 0
 
+        # 鳥ごとの位置・最寄りピクセル・縄張りの反発 (配列を使い回す)
+        self._resize_bird_buffers(len(self.birds))
+        self._pixel_lookup = None
+        # 鳥どうしの2Dの群れの動き (src/flocking.py)。None か enabled: false なら使わない
+        self.flocking = flocking
+        # テープ上の光の重なりの予測と回避 (src/strip_avoidance.py)。None か enabled: false なら使わない
+        self.strip_avoidance = strip_avoidance
+
         # The World is responsible for setting the initial positions of the actors.
+        self.audio_scheduler = audio_scheduler
         for bird in self.birds:
-            bird.position = self._get_random_position()
-            bird.target_position = bird.position
+            self._place_new_bird(bird)
+
+        # 描画や出力に渡すスナップショット (update の最後に作る)
+        self.frame = 0
+        self._profiles = None
+        self._snapshots = []
+        self.snapshot = None
+        self.capture_snapshot()
+
+    def _resize_bird_buffers(self, num_birds):
+        self._bird_positions = np.zeros((num_birds, 2))
+        self._personal_space = np.zeros(num_birds)
+        self.pixel_centers = np.zeros(num_birds, dtype=np.int64)
+        self._repulsion = np.zeros((num_birds, 2))
+        self._no_reach = np.zeros(num_birds)
+        self._half_spans = np.zeros(num_birds)
+        self._avoidance = np.zeros((num_birds, 2))
+        self._velocities = np.zeros((num_birds, 2))
+        self._speeds = np.zeros(num_birds)
+        self._steering = np.zeros((num_birds, 2))
+
+    def _place_new_bird(self, bird):
+        bird.position = self._get_random_position()
+        bird.target_position = bird.position
+        bird.audio_scheduler = self.audio_scheduler
+
+    def set_birds(self, birds):
+        """
+        Replaces the cast while running (hot reload). Birds already in the world keep their state;
+        new birds are placed at random positions, and removed birds give back their voice.
+        """
+        for bird in self.birds:
+            if not any(bird is kept for kept in birds) and bird.state == "CHIRPING":
+                bird.end_chirp()
+        for bird in birds:
+            if not any(bird is current for current in self.birds):
+                self._place_new_bird(bird)
+        self.birds = birds
+        self.refresh_profiles()
+
+    def refresh_profiles(self):
+        """Rebuilds the per-bird profiles (call after changing bird params) and re-captures the snapshot."""
+        self._profiles = None
+        self.capture_snapshot()
+
+    def _acquire_human(self):
+        if self._human_pool:
+            return self._human_pool.pop()
+        return Human((0.0, 0.0), (0.0, 0.0), 0.0, 0.0)
+
+    def restore_humans(self, tracks, next_human_id):
+        """Replaces the tracked visitors with (id, position, velocity, smooth_velocity, size, size_change) tuples (checkpoint)."""
+        self._human_pool.extend(self.humans)
+        self.humans.clear()
+        for human_id, position, velocity, smooth_velocity, size, size_change in tracks:
+            human = self._acquire_human()
+            human.reset(float(position[0]), float(position[1]), float(size))
+            human.velocity[:] = velocity
+            human.smooth_velocity[:] = smooth_velocity
+            human.size_change = float(size_change)
+            human.id = int(human_id)
+            self.humans.append(human)
+        self.next_human_id = next_human_id
 
     def update_humans(self, detected_objects: np.ndarray):
-        
-        current_humans_by_id = {}
-        matched_ids = set()
+        previous = self.humans
+        current = self._next_humans
+        current.clear()
+        for human in previous:
+            human.matched = False
 
         # 1. 前フレームのHumanと、現在の検出物体をマッチング
         for obj_data in detected_objects:
-            current_pos = obj_data[0:2]
-            current_size = obj_data[2]
+            x, y, current_size = float(obj_data[0]), float(obj_data[1]), float(obj_data[2])
             
-            best_match_id = None
+            best_match = None
             min_dist = 0.5 # マッチングする最大距離
 
-            for human_id, human in self.previous_humans.items():
-                if human_id in matched_ids: continue
+            for human in previous:
+                if human.matched: continue
                 
-                dist = np.linalg.norm(current_pos - human.position)
+                dx, dy = x - human.position[0], y - human.position[1]
+                dist = math.sqrt(dx * dx + dy * dy)
                 if dist < min_dist:
                     min_dist = dist
-                    best_match_id = human_id
+                    best_match = human
             
-            # 2. マッチしたら、情報更新 & 速度などを計算
-            if best_match_id is not None:
-                matched_ids.add(best_match_id)
-                last_human = self.previous_humans[best_match_id]
+            # 2. マッチしたら、情報更新 & 速度などを計算 (オブジェクトはそのまま更新する)
+            if best_match is not None:
+                best_match.matched = True
 
                 # 速度とサイズの変化を計算 (60.0はフレームレート)
-                velocity = (current_pos - last_human.position) * 60.0
-                size_change = current_size - last_human.size
-
-                # 前フレームの滑らかな速度を使って、新しい速度を平滑化する
-                last_smooth_velocity = last_human.smooth_velocity
-                smooth_vel = last_smooth_velocity * 0.9 + velocity * 0.1 # 90%は過去を維持、10%だけ新しい情報を反映
-                
-                # 新しいHumanオブジェクトを作成
-                new_human = Human(current_pos, smooth_vel, current_size, size_change)
-                # 計算したばかりの生の速度も保持しておく（次回の平滑化計算のため）
-                new_human.smooth_velocity = smooth_vel
-
-                current_humans_by_id[best_match_id] = new_human
+                # 前フレームの滑らかな速度を使って、新しい速度を平滑化する (90%は過去を維持、10%だけ新しい情報を反映)
+                smooth = best_match.smooth_velocity
+                smooth[0] = smooth[0] * 0.9 + (x - best_match.position[0]) * 60.0 * 0.1
+                smooth[1] = smooth[1] * 0.9 + (y - best_match.position[1]) * 60.0 * 0.1
+                best_match.velocity[:] = smooth
+                best_match.size_change = current_size - best_match.size
+                best_match.size = current_size
+                best_match.position[0], best_match.position[1] = x, y
+                current.append(best_match)
 
             # 3. マッチしなかったら、新規Humanとして登録
             else:
                 # 新規オブジェクトの速度は0, size_changeも0
-                new_human = Human(current_pos, np.array([0.0, 0.0]), current_size, 0.0)
-                current_humans_by_id[self.next_human_id] = new_human
+                new_human = self._acquire_human()
+                new_human.reset(x, y, current_size)
+                new_human.id = self.next_human_id
+                new_human.matched = True
                 self.next_human_id += 1
+                current.append(new_human)
 
-        # 4. self.humansリストを更新し、前フレーム情報を保存
-        self.humans = list(current_humans_by_id.values())
-        self.previous_humans = current_humans_by_id
+        # 4. 見失った来場者のオブジェクトはプールに戻し、リストを入れ替える
+        for human in previous:
+            if not human.matched:
+                self._human_pool.append(human)
+        previous.clear()
+        self.humans, self._next_humans = current, previous
 
     def _get_random_position(self):
         """Returns a random position within the world's elliptical boundary."""
         # Generate a random point within a unit circle, then scale to the ellipse
-        r = np.sqrt(random.random())
-        theta = random.random() * 2 * np.pi
+        r = np.sqrt(self.rng.random())
+        theta = self.rng.random() * 2 * np.pi
         x = r * np.cos(theta) * self.model_radius_x
         y = r * np.sin(theta) * self.model_radius_y
         return np.array([x, y])
 
-    def _apply_physics_and_constraints(self, bird):
-        """Applies world rules (boundaries, physics) to a single bird."""
+    def _apply_physics_and_constraints(self, bird, steering=None):
+        """Applies world rules (flocking, boundaries, physics) to a single bird."""
         # If the bird is chirping, it should be completely stationary. No physics apply.
         if bird.state == "CHIRPING":
             return
 
+        # 0. Flocking (separation, alignment, cohesion), computed for all birds at once in update()
+        if steering is not None:
+            bird.velocity += steering
+
         # 1. Apply soft boundary repulsion for an inner ellipse
         soft_boundary_scale = 0.8
         rx_soft = self.model_radius_x * soft_boundary_scale
@@ -101,13 +217,14 @@ class World:
         
         if check_soft > 1.0:
             # The repulsion force should be normal to the ellipse surface
-            grad = np.array([2 * bird.position[0] / (rx_soft**2 + 1e-6), 
-                             2 * bird.position[1] / (ry_soft**2 + 1e-6)])
-            repulsion_direction = -grad / (np.linalg.norm(grad) + 1e-6) # Normalize, avoid division by zero
+            grad_x = 2 * bird.position[0] / (rx_soft**2 + 1e-6)
+            grad_y = 2 * bird.position[1] / (ry_soft**2 + 1e-6)
+            grad_norm = math.sqrt(grad_x * grad_x + grad_y * grad_y) + 1e-6 # Normalize, avoid division by zero
             
             # Strength increases the further the bird is outside
-            repulsion_strength = (np.sqrt(check_soft) - 1.0) * 0.5 # Adjust the multiplier for desired strength
-            bird.velocity += repulsion_direction * repulsion_strength * 0.01
+            repulsion_strength = (math.sqrt(check_soft) - 1.0) * 0.5 # Adjust the multiplier for desired strength
+            bird.velocity[0] += -grad_x / grad_norm * repulsion_strength * 0.01
+            bird.velocity[1] += -grad_y / grad_norm * repulsion_strength * 0.01
 
         # 2. Update position based on velocity
         bird.position += bird.velocity
@@ -116,18 +233,62 @@ class World:
         check_hard = (bird.position[0] / (self.model_radius_x + 1e-6))**2 + (bird.position[1] / (self.model_radius_y + 1e-6))**2
         if check_hard > 1.0:
             # Bring the bird back to the boundary along the vector from the center
-            scale_factor = np.sqrt(check_hard)
-            bird.position = bird.position / scale_factor
+            bird.position /= math.sqrt(check_hard)
             bird.velocity *= -0.5 # Lose energy on impact
 
     def update(self, pixel_model_positions):
         """The main update loop for the entire simulation."""
-        pixel_centers = [np.argmin(np.linalg.norm(pixel_model_positions - bird.position, axis=1)) for bird in self.birds]
+        self.clock.advance()
+        self.now = self.clock.now()
+        if self._pixel_lookup is None or self._pixel_lookup.source is not pixel_model_positions:
+            self._pixel_lookup = PixelLookup(pixel_model_positions)
+        if len(self.pixel_centers) != len(self.birds):
+            self._resize_bird_buffers(len(self.birds))
+        positions, personal_space = self._bird_positions, self._personal_space
+        for i, bird in enumerate(self.birds):
+            positions[i] = bird.position
+            personal_space[i] = bird.pixel_personal_space
+        pixel_centers = self._pixel_lookup.nearest_for_positions(positions, self.pixel_centers)
+        # 縄張りの反発は、全ての鳥が動く前の位置から一度にまとめて計算する (鳥の AI は位置を変えない)
+        repulsion = kernels.strip_repulsion(positions, pixel_centers, personal_space, self._no_reach, self._repulsion)
+        if self.strip_avoidance is not None and self.strip_avoidance.enabled:
+            # 光が重なりそうな鳥からも離れる (縄張りの反発と同じように Bird.update で速度に加わる)
+            velocities, half_spans = self._velocities, self._half_spans
+            for i, bird in enumerate(self.birds):
+                velocities[i] = 0.0 if bird.state == "CHIRPING" else bird.velocity # 鳴いている鳥は止まっている
+                half_spans[i] = bird.lit_half_span()
+            repulsion += self.strip_avoidance.steer(positions, velocities, half_spans, self._pixel_lookup, self._avoidance)
 
         # 1. First, update the AI of all birds to determine their intentions.
         for i, bird in enumerate(self.birds):
-            bird.update(self.humans, self.birds, i, pixel_centers)
+            bird.update(self.humans, repulsion[i], self.now)
         
         # 2. Then, apply the world's physics and rules to each bird.
-        for bird in self.birds:
-            self._apply_physics_and_constraints(bird)
\ No newline at end of file
+        if self.flocking is not None and self.flocking.enabled:
+            velocities, speeds = self._velocities, self._speeds
+            for i, bird in enumerate(self.birds):
+                velocities[i] = 0.0 if bird.state == "CHIRPING" else bird.velocity # 鳴いている鳥は止まっている
+                speeds[i] = bird.speed
+            steering = self.flocking.steer(self.birds, positions, velocities, speeds, self._steering)
+            for i, bird in enumerate(self.birds):
+                self._apply_physics_and_constraints(bird, steering[i])
+        else:
+            for bird in self.birds:
+                self._apply_physics_and_constraints(bird)
+
+        # 3. Publish this frame's state for the color calculation and outputs.
+        self.frame += 1
+        self.capture_snapshot()
+
+    def capture_snapshot(self):
+        """
+        Copies the current state into the next pooled WorldSnapshot and sets self.snapshot.
+        Called at the end of update(); call it directly after changing birds outside update().
+        """
+        if self._profiles is None or len(self._profiles) != len(self.birds):
+            self._profiles = tuple(BirdProfile(bird.id, bird.params) for bird in self.birds)
+            self._snapshots = [WorldSnapshot(self._profiles) for _ in range(SNAPSHOT_POOL_SIZE)]
+        snapshot = self._snapshots[self.frame % SNAPSHOT_POOL_SIZE]
+        snapshot.capture(self, self.frame)
+        self.snapshot = snapshot
+        return snapshot
\ No newline at end of file
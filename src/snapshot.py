@@ -0,0 +1,138 @@
+# src/snapshot.py
+import numpy as np
+from src.objects import BIRD_STATE_CODES
+
+# スナップショットでは鳴き声のパターン名もこの番号で表す (-1 = なし)
+PATTERN_KEYS = ("default", "drumming")
+PATTERN_CODES = {key: code for code, key in enumerate(PATTERN_KEYS)}
+CHIRPING = BIRD_STATE_CODES["CHIRPING"]
+
+class BirdProfile:
+    """Per-bird data that never changes during a run (colours, light patterns, chirp tracks)."""
+    def __init__(self, bird_id, params):
+        self.id = bird_id
+        self.params = params
+        self.size = params['size']
+        self.base_color = np.array(params['base_color'])
+        self.accent_color = np.array(params['accent_color'])
+        self.base_pixel_count = params['base_pixel_count']
+        self.color_pattern = params['color_pattern']
+        self.chirp_color_pattern = params.get('chirp_color_pattern', self.color_pattern)
+        self.chirp_patterns = params.get('chirp_pattern', {})
+        self.chirp_envelopes = params.get('chirp_envelope', {})
+        self.chirp_centroids = params.get('chirp_centroid', {})
+        # パターンを1ピクセルずつに展開したもの (1 = 'a' アクセント色, 0 = 'b' ベース色)。[通常時, 鳴いている時]
+        self.pattern_masks = (self._pattern_mask(self.color_pattern), self._pattern_mask(self.chirp_color_pattern))
+
+    @staticmethod
+    def _pattern_mask(pattern):
+        return np.array([1 if p_type == 'a' else 0 for p_type, p_count in pattern for _ in range(p_count)], dtype=np.uint8)
+
+    def light_pattern(self, state):
+        """Same as Bird.get_current_light_pattern, from a state code."""
+        if state == CHIRPING:
+            return self.chirp_color_pattern, self.base_pixel_count
+        return self.color_pattern, self.base_pixel_count
+
+class WorldSnapshot:
+    """
+    World の1フレーム分の状態を配列にまとめたもの。色の計算や出力はこれだけを読むので、
+    次のフレームの World.update と並行して実行できる。
+    World は決まった数のスナップショットを順番に使い回す (毎フレーム配列を作らない)。
+    渡された配列は書き込み禁止になっている。
+    """
+    def __init__(self, profiles, human_capacity=16):
+        self.profiles = profiles
+        self.frame = 0
+        self.time = 0.0
+        num_birds = len(profiles)
+        self.bird_position = np.zeros((num_birds, 2))
+        self.bird_state = np.zeros(num_birds, dtype=np.uint8)
+        self.chirp_start_time = np.zeros(num_birds)
+        self.chirp_pattern = np.full(num_birds, -1, dtype=np.int8)
+        self.num_humans = 0
+        self._allocate_humans(human_capacity)
+        self._set_writeable(False)
+
+    def _allocate_humans(self, capacity):
+        self._human_position = np.zeros((capacity, 2))
+        self._human_velocity = np.zeros((capacity, 2))
+        self._human_size = np.zeros(capacity)
+        self._human_size_change = np.zeros(capacity)
+        self._human_id = np.zeros(capacity, dtype=np.int64)
+
+    def _arrays(self):
+        return (self.bird_position, self.bird_state, self.chirp_start_time, self.chirp_pattern,
+                self._human_position, self._human_velocity, self._human_size, self._human_size_change, self._human_id)
+
+    def _set_writeable(self, writeable):
+        for array in self._arrays():
+            array.flags.writeable = writeable
+
+    @property
+    def num_birds(self):
+        return len(self.profiles)
+
+    @property
+    def human_position(self):
+        return self._human_position[:self.num_humans]
+
+    @property
+    def human_velocity(self):
+        return self._human_velocity[:self.num_humans]
+
+    @property
+    def human_size(self):
+        return self._human_size[:self.num_humans]
+
+    @property
+    def human_size_change(self):
+        return self._human_size_change[:self.num_humans]
+
+    @property
+    def human_id(self):
+        return self._human_id[:self.num_humans]
+
+    def capture(self, world, frame):
+        """Overwrites this snapshot with the current state of world (called by World only)."""
+        self._set_writeable(True)
+        self.frame = frame
+        self.time = world.now
+        for i, bird in enumerate(world.birds):
+            self.bird_position[i] = bird.position
+            self.bird_state[i] = BIRD_STATE_CODES.get(bird.state, 0)
+            self.chirp_start_time[i] = bird.chirp_start_time
+            self.chirp_pattern[i] = PATTERN_CODES.get(bird.active_pattern_key, -1)
+
+        humans = world.humans
+        if len(humans) > len(self._human_id):
+            self._allocate_humans(max(len(humans), 2 * len(self._human_id)))
+        self.num_humans = len(humans)
+        for i, human in enumerate(humans):
+            self._human_position[i] = human.position
+            self._human_velocity[i] = human.velocity
+            self._human_size[i] = human.size
+            self._human_size_change[i] = human.size_change
+            self._human_id[i] = human.id if human.id is not None else -1
+        self._set_writeable(False)
+
+    def load(self, frame, time, bird_position, bird_state, human_position, human_velocity,
+             human_size, human_size_change, human_id, chirp_start_time=None, chirp_pattern=None):
+        """Fills this snapshot from plain arrays (e.g. read back from shared memory)."""
+        self._set_writeable(True)
+        self.frame, self.time = frame, time
+        self.bird_position[:] = bird_position
+        self.bird_state[:] = bird_state
+        if chirp_start_time is not None:
+            self.chirp_start_time[:] = chirp_start_time
+        if chirp_pattern is not None:
+            self.chirp_pattern[:] = chirp_pattern
+        if len(human_id) > len(self._human_id):
+            self._allocate_humans(len(human_id))
+        self.num_humans = len(human_id)
+        self._human_position[:self.num_humans] = human_position
+        self._human_velocity[:self.num_humans] = human_velocity
+        self._human_size[:self.num_humans] = human_size
+        self._human_size_change[:self.num_humans] = human_size_change
+        self._human_id[:self.num_humans] = human_id
+        self._set_writeable(False)
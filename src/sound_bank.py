@@ -0,0 +1,65 @@
+# src/sound_bank.py
+import queue
+import threading
+import pygame
+from src.audio_cache import load_sound
+from src.startup import startup_report
+
+class SoundBank:
+    """
+    プロセス全体で共有するサウンドのキャッシュ。
+    同じファイルは一度だけデコードし、全ての鳥に同じ pygame.mixer.Sound を渡す。
+    デコード済みPCMのキャッシュ (audio_cache.py) があれば、そちらから直接読み込む。
+    デコードはバックグラウンドスレッドで行うので、最初のフレームを待たせない。
+    """
+    def __init__(self):
+        self._sounds = {}        # {path: pygame.mixer.Sound}
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def request(self, path):
+        """Schedules a sound for background loading. Repeated requests for the same path are free."""
+        if not pygame.mixer.get_init():
+            return # 音声なしで動作中 (ヘッドレスなど)。鳴き声は無効のまま
+        with self._lock:
+            if path in self._requested:
+                return
+            self._requested.add(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load_worker, daemon=True)
+                self._thread.start()
+        self._queue.put(path)
+
+    def get(self, path):
+        """Returns the loaded Sound for path, or None if it is not ready (yet)."""
+        return self._sounds.get(path)
+
+    def is_ready(self, path):
+        return path in self._sounds
+
+    def wait_until_loaded(self):
+        """Blocks until every requested sound has been processed."""
+        self._queue.join()
+
+    def _load_worker(self):
+        while True:
+            path = self._queue.get()
+            try:
+                self._sounds[path] = load_sound(path)
+            except Exception as e:
+                print(f"ERROR loading sound '{path}': {e}")
+            finally:
+                self._queue.task_done()
+            if self._queue.empty():
+                startup_report.mark("sounds loaded") # 2回目以降 (ホットリロードで増えた音) は記録しない
+
+_sound_bank = None
+
+def get_sound_bank():
+    """Returns the process-wide SoundBank."""
+    global _sound_bank
+    if _sound_bank is None:
+        _sound_bank = SoundBank()
+    return _sound_bank
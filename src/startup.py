@@ -0,0 +1,52 @@
+# src/startup.py
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupReport:
+    """
+    起動の各段階の開始時刻・所要時間と、節目 (シリアル接続、最初のLEDフレーム、全ての鳴き声の読み込み完了) を記録する。
+    段階は複数のスレッドから同時に記録できる。print_report() の後に来た節目は、その都度1行で表示する。
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.steps = []  # (name, start [s], duration [s], thread)
+        self.marks = {}  # {name: time [s]}
+        self.reported = False
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @contextmanager
+    def step(self, name):
+        begin = self.elapsed()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((name, begin, self.elapsed() - begin, threading.current_thread().name))
+
+    def mark(self, name):
+        """Records a milestone once; later calls with the same name are ignored."""
+        with self._lock:
+            if name in self.marks:
+                return
+            self.marks[name] = self.elapsed()
+            late = self.reported
+        if late:
+            print(f"[startup] {name} at +{self.marks[name]:.2f}s")
+
+    def print_report(self):
+        with self._lock:
+            steps = sorted(self.steps, key=lambda step: step[1])
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+            self.reported = True
+        print("[startup] step                       start    duration  thread")
+        for name, begin, duration, thread in steps:
+            print(f"[startup] {name:<24} {begin * 1000:7.0f}ms {duration * 1000:8.0f}ms  {thread}")
+        for name, at in marks:
+            print(f"[startup] {name} at +{at:.2f}s")
+
+# モジュールを最初に読み込んだ時刻を起点にする (main_real.py は最初にこれを読み込む)
+startup_report = StartupReport()
@@ -0,0 +1,65 @@
+# src/strip_avoidance.py
+import numpy as np
+from src import kernels
+
+class StripAvoidance:
+    """
+    LEDテープ上の光の重なりを予測して避ける。全ての鳥の今の速度で lookahead_frames 先の位置を予測し、
+    その位置の最寄りピクセルを一度にまとめて引き、光る幅 (Bird.lit_half_span) が重なりそうな鳥から
+    テープに沿って離れる向き (予測位置のピクセルでのテープの向き) に押す。
+    重なりの判定は kernels.strip_repulsion で、テープ上の位置の順に並べて近くの鳥どうしだけを比べる (鳥の数 N に対して O(N log N))。
+    設定は settings.yaml の strip_avoidance。
+    """
+    def __init__(self, settings=None):
+        self._pixel_lookup = None
+        self._resize(0)
+        self.apply_settings(settings)
+
+    def apply_settings(self, settings):
+        """Sets (or, on a hot reload, replaces) the lookahead from the 'strip_avoidance' section of settings.yaml."""
+        settings = settings or {}
+        self.enabled = settings.get('enabled', False)
+        self.lookahead_frames = settings.get('lookahead_frames', 30)
+        self.margin_pixels = settings.get('margin_pixels', 1)
+        self.weight = settings.get('weight', 1.0)
+
+    def _resize(self, num_birds):
+        self._predicted = np.zeros((num_birds, 2))
+        self._predicted_centers = np.zeros(num_birds, dtype=np.int64)
+        self._strip_positions = np.zeros((num_birds, 2)) # テープ上の位置 (ピクセル番号, 0)
+        self._reach = np.zeros(num_birds)
+        self._push = np.zeros((num_birds, 2))
+        # 同じピクセルに予測された鳥どうしは、鳥の番号で押す向きを決める (1 ピクセルより十分小さいずれ)
+        self._tie_break = np.arange(num_birds) * (1e-3 / max(num_birds, 1))
+
+    def _strip_directions(self, pixel_lookup):
+        # 各ピクセルでのテープの向き (番号が増える向きの単位ベクトル)。レイアウトが変わった時だけ作る
+        if self._pixel_lookup is not pixel_lookup:
+            tangents = np.gradient(pixel_lookup.pixel_model_positions, axis=0) if pixel_lookup.num_pixels > 1 \
+                else np.zeros((pixel_lookup.num_pixels, 2))
+            norms = np.linalg.norm(tangents, axis=1, keepdims=True)
+            self._tangents = np.divide(tangents, norms, out=np.zeros_like(tangents), where=norms > 0)
+            self._pixel_lookup = pixel_lookup
+        return self._tangents
+
+    def steer(self, positions, velocities, half_spans, pixel_lookup, out):
+        """
+        out[i] = push (same units as the strip repulsion of Bird.update) along the strip, away from every bird whose
+        lit span is predicted to touch bird i's in lookahead_frames, positions moving at velocities. Returns out.
+        """
+        if len(self._predicted) != len(positions):
+            self._resize(len(positions))
+        predicted = self._predicted
+        np.multiply(velocities, self.lookahead_frames, out=predicted)
+        predicted += positions
+        predicted_centers = pixel_lookup.nearest_for_positions(predicted, self._predicted_centers)
+
+        # テープ上 (1次元) の縄張りの反発と同じ計算: 2羽の中心の間が、お互いの光る幅の合計 + 余白より近ければ重なる
+        np.add(predicted_centers, self._tie_break, out=self._strip_positions[:, 0])
+        np.add(half_spans, self.margin_pixels, out=self._reach)
+        push = kernels.strip_repulsion(self._strip_positions, predicted_centers, self._reach, half_spans, self._push)
+
+        # テープに沿った押し (+ = 番号が増える向き) を、予測位置でのテープの向きの 2D の押しにする
+        np.multiply(self._strip_directions(pixel_lookup)[predicted_centers], push[:, :1], out=out)
+        out *= self.weight
+        return out